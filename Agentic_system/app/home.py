@@ -50,6 +50,10 @@ with col_text:
     **3. Resources**
     * **Focus**: Database Management.
     * View status of Ingested Dictionaries (Monier-Williams), Glossaries (PDF/CSV), and Parallel Corpora.
+
+    **4. Compare**
+    * **Focus**: Stored evaluation runs.
+    * Item-by-item diffs of two runs with significance tests and stage timings, ablation tables across datasets and the chrF++ waterfall.
     """)
 
     st.markdown("---")
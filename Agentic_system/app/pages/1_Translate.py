@@ -9,45 +9,23 @@ sys.path.append(str(PROJECT_ROOT))
 from src.llm.qwen_local import QwenLocalLLM
 from src.agent.orchestrator import SanskritAgent
 from src.db.duckdb_conn import get_db_connection
+from src.db.translation_log import get_translation_log
+from src.config import LLM_N_PARALLEL, RAG_ENGINE
+from src.retrieval.examples import ENGINES, missing_dense_indexes, retrieve_examples, format_examples
 
 @st.cache_resource
 def load_engine():
-    llm = QwenLocalLLM()
+    llm = QwenLocalLLM(n_parallel=LLM_N_PARALLEL)
     agent = SanskritAgent(llm)
     return agent
 
 # RAG 
-def get_inference_rag_context(src_text: str, dataset_scope: str = "All", k: int = 3) -> str:
-    con = get_db_connection()
+def get_inference_rag_context(src_text: str, dataset_scope: str = "All", k: int = 3, engine: str = RAG_ENGINE) -> str:
     try:
-        scope_clause = "1=1" if dataset_scope == "All" else f"dataset_name = '{dataset_scope}'"
-        
-        query = f"""
-            SELECT src_text, tgt_text, jaccard(src_text, ?) as similarity
-            FROM dataset_items
-            WHERE {scope_clause}
-            ORDER BY similarity DESC
-            LIMIT ?
-        """
-        results = con.execute(query, [src_text, k]).fetchall()
-        
-        if not results: return None
-        
-        valid_examples = [r for r in results if r[2] > 0.1]
-        if not valid_examples: return None
-            
-        builder = []
-        for row in valid_examples:
-            s_clean = row[0].replace('\n', ' ').strip()
-            t_clean = row[1].replace('\n', ' ').strip()
-            builder.append(f"Source: {s_clean}\nTarget: {t_clean}")
-            
-        return "\n\n".join(builder)
+        return format_examples(retrieve_examples(src_text, dataset_scope, k, engine=engine))
     except Exception as e:
         print(f"RAG Inference Error: {e}")
         return None
-    finally:
-        con.close()
 
 try:
     agent = load_engine()
@@ -71,6 +49,7 @@ with st.sidebar:
     use_rag = st.toggle("🧠 Enable Dynamic RAG", value=True, help="Retrieve similar examples from database to guide style.")
     
     rag_dataset = "All"
+    rag_engine = RAG_ENGINE
     if use_rag:
         con = get_db_connection()
         datasets = [r[0] for r in con.execute("SELECT DISTINCT dataset_name FROM dataset_items").fetchall()]
@@ -79,6 +58,12 @@ with st.sidebar:
         if datasets:
             rag_dataset = st.selectbox("RAG Knowledge Base", ["All"] + datasets, index=0, 
                                      help="Which dataset to search for similar examples?")
+            rag_engine = st.selectbox("Retrieval Engine", list(ENGINES), index=list(ENGINES).index(RAG_ENGINE),
+                                      help="bm25/minhash: n-gram overlap. dense: embedding similarity (finds paraphrases; needs scripts/build_embeddings.py).")
+            if rag_engine == "dense":
+                missing = missing_dense_indexes(rag_dataset)
+                if missing:
+                    st.warning(f"No prebuilt embeddings for {', '.join(missing)}: searched with bm25. Run scripts/build_embeddings.py.")
         else:
             st.warning("No datasets found for RAG.")
             use_rag = False
@@ -100,7 +85,7 @@ if st.button("🚀 Translate", type="primary"):
             rag_context = None
             if use_rag:
                 st.write("🔍 Searching for similar examples (RAG)...")
-                rag_context = get_inference_rag_context(src_text, rag_dataset, k=3)
+                rag_context = get_inference_rag_context(src_text, rag_dataset, k=3, engine=rag_engine)
                 if rag_context:
                     st.success(f"Found related examples from '{rag_dataset}'")
                     with st.expander("View RAG Context"):
@@ -136,6 +121,8 @@ if st.button("🚀 Translate", type="primary"):
             
             with t1:
                 st.code("\n".join(state.logs))
+                if state.timings:
+                    st.caption(" | ".join(f"{k}: {v:.2f}s" for k, v in state.timings.items()))
                 
             with t2:
                 # Evidence Parsing
@@ -164,6 +151,10 @@ if st.button("🚀 Translate", type="primary"):
 # =========================================================
 st.markdown("---")
 st.subheader("🕒 Recent Translations")
+# Results are written in the background; make sure the latest run is visible
+translation_log = get_translation_log()
+if translation_log is not None:
+    translation_log.flush(timeout=5)
 con = get_db_connection()
 try:
     history = con.execute("SELECT src_text, final_text, mode, timestamp FROM translations ORDER BY timestamp DESC LIMIT 5").fetchall()
@@ -1,74 +1,35 @@
 import streamlit as st
 import pandas as pd
 import sys
-import re
 import os
 import random
 import io
 import zipfile
 from pathlib import Path
-import sacrebleu
 
 
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.append(str(PROJECT_ROOT))
 DATA_DIR = PROJECT_ROOT / "data"
 
-from src.db.duckdb_conn import get_db_connection
+from src.config import LLM_N_PARALLEL, RAG_ENGINE
+from src.db.duckdb_conn import get_db_connection, db_writer
+from src.db.manifest import check_files, record_files
+from src.retrieval.examples import ENGINES, index_dataset, invalidate_indexes
+from src.eval.runner import MODES, EvalConfig, EvalRunner, corpus_scores
+from src.eval.sweep import SweepRunner
+from src.eval.metrics import compare_runs
 from src.llm.qwen_local import QwenLocalLLM
 from src.agent.orchestrator import SanskritAgent
-from src.llm.prompts import BASELINE_SYSTEM, GLOSSARY_SYSTEM_ADDENDUM
-from src.tools.glossary_lookup import GlossaryLookupTool
+from src.tools.glossary_lookup import GlossaryLookupTool, glossary_term_key, invalidate_glossary_matcher
+from src.db.schema import GLOSSARY_SQL
 
 @st.cache_resource
 def load_engine():
-    llm = QwenLocalLLM()
+    llm = QwenLocalLLM(n_parallel=LLM_N_PARALLEL)
     agent = SanskritAgent(llm)
     return llm, agent
 
-def clean_baseline_output(text: str) -> str:
-
-    if not text: return ""
-    patterns = [r'^(Here is|The translation|The meaning|Output).*?:', r'^Translation:', r'^Answer:']
-    cleaned = text
-    for p in patterns:
-        cleaned = re.sub(p, '', cleaned, flags=re.IGNORECASE | re.MULTILINE)
-    return cleaned.strip().strip('"').strip("'").strip()
-
-def get_similar_examples(src_text: str, dataset_name: str, exclude_id: int, k: int = 3, search_min_id: int = -1, search_max_id: int = 999999999) -> str:
-    
-    con = get_db_connection()
-    try:
-        query = """
-            SELECT src_text, tgt_text, jaccard(src_text, ?) as similarity
-            FROM dataset_items
-            WHERE dataset_name = ? 
-              AND item_id != ?        
-              AND src_text != ?       
-              AND item_id >= ?        
-              AND item_id <= ?        
-            ORDER BY similarity DESC
-            LIMIT ?
-        """
-        results = con.execute(query, [src_text, dataset_name, exclude_id, src_text, search_min_id, search_max_id, k]).fetchall()
-        
-        if not results: return None
-        valid_examples = [r for r in results if r[2] > 0.1] 
-        if not valid_examples: return None
-            
-        builder = []
-        for row in valid_examples:
-            s_clean = row[0].replace('\n', ' ').strip()
-            t_clean = row[1].replace('\n', ' ').strip()
-            builder.append(f"Source: {s_clean}\nTarget: {t_clean}")
-            
-        return "\n\n".join(builder)
-    except Exception as e:
-        print(f"RAG Error: {e}")
-        return None
-    finally:
-        con.close()
-
 def create_pair_zip(data_items):
     """
     data_items: list of (id, src, tgt) tuples
@@ -96,7 +57,7 @@ st.title("📊Ablation & Evaluation")
 # =========================================================
 # Tab 1: Upload / Ingest Data
 # =========================================================
-tab1, tab2 = st.tabs(["📤 Ingest Data (Dataset & Glossary)", "🚀 Run Evaluation"])
+tab1, tab2, tab3 = st.tabs(["📤 Ingest Data (Dataset & Glossary)", "🚀 Run Evaluation", "🧪 Ablation Sweep"])
 
 with tab1:
     st.header("1. Ingest Test Dataset (Parallel Corpus)")
@@ -107,7 +68,6 @@ with tab1:
     with col_up1:
         st.subheader("Option A: Scan Local Folders")
         if st.button("🔄 Scan & Ingest Local Datasets"):
-            con = get_db_connection()
             base_path = DATA_DIR / "testsets"
             
             if not base_path.exists():
@@ -116,6 +76,7 @@ with tab1:
                 
             subdirs = [x for x in base_path.iterdir() if x.is_dir()]
             ingested_count = 0
+            unchanged_count = 0
             
             for subdir in subdirs:
                 dataset_name = subdir.name
@@ -123,6 +84,12 @@ with tab1:
                 en_file = subdir / f"{dataset_name}.en"
                 
                 if sa_file.exists() and en_file.exists():
+                    # Skip datasets whose files match the ingest manifest
+                    file_states = check_files([sa_file, en_file])
+                    if not any(s.changed for s in file_states):
+                        unchanged_count += 1
+                        continue
+
                     with st.spinner(f"Ingesting {dataset_name}..."):
                         with open(sa_file, 'r', encoding='utf-8') as f:
                             sa_lines = [l.strip() for l in f.readlines() if l.strip()]
@@ -137,16 +104,21 @@ with tab1:
                         for i in range(len(sa_lines)):
                             data_to_insert.append((dataset_name, i + 1, sa_lines[i], en_lines[i]))
                         
-                        con.execute("DELETE FROM dataset_items WHERE dataset_name = ?", [dataset_name])
-                        con.executemany("INSERT INTO dataset_items (dataset_name, item_id, src_text, tgt_text) VALUES (?, ?, ?, ?)", data_to_insert)
+                        with db_writer() as con:
+                            con.execute("DELETE FROM dataset_items WHERE dataset_name = ?", [dataset_name])
+                            con.executemany("INSERT INTO dataset_items (dataset_name, item_id, src_text, tgt_text) VALUES (?, ?, ?, ?)", data_to_insert)
+                            record_files(con, file_states, "dataset_items", len(data_to_insert))
+                            index_dataset(con, dataset_name)
+                        invalidate_indexes(dataset_name)
                         
                         st.success(f"✅ Ingested **{dataset_name}** ({len(data_to_insert)} pairs)")
                         ingested_count += 1
             
-            con.close()
-            if ingested_count == 0:
+            if unchanged_count:
+                st.info(f"⏭️ {unchanged_count} datasets unchanged since last ingest.")
+            if ingested_count == 0 and unchanged_count == 0:
                 st.warning("No valid datasets found.")
-            else:
+            elif ingested_count:
                 st.success(f"🎉 Processed {ingested_count} datasets.")
 
     with col_up2:
@@ -162,13 +134,14 @@ with tab1:
                     if "source" not in df.columns or "target" not in df.columns:
                         st.error("CSV must contain 'source' and 'target' columns.")
                     else:
-                        con = get_db_connection()
                         data_to_insert = []
                         for idx, row in df.iterrows():
                             data_to_insert.append((csv_name, idx + 1, row['source'], row['target']))
-                        con.execute("DELETE FROM dataset_items WHERE dataset_name = ?", [csv_name])
-                        con.executemany("INSERT INTO dataset_items (dataset_name, item_id, src_text, tgt_text) VALUES (?, ?, ?, ?)", data_to_insert)
-                        con.close()
+                        with db_writer() as con:
+                            con.execute("DELETE FROM dataset_items WHERE dataset_name = ?", [csv_name])
+                            con.executemany("INSERT INTO dataset_items (dataset_name, item_id, src_text, tgt_text) VALUES (?, ?, ?, ?)", data_to_insert)
+                            index_dataset(con, csv_name)
+                        invalidate_indexes(csv_name)
                         st.success(f"✅ Uploaded {len(data_to_insert)} items.")
                 except Exception as e:
                     st.error(f"Error: {e}")
@@ -202,24 +175,25 @@ with tab1:
                     if not required_cols.issubset(df.columns):
                         st.error(f"File missing required columns: {required_cols}. Found: {df.columns.tolist()}")
                     else:
-                        con = get_db_connection()
-                        con.execute("CREATE TABLE IF NOT EXISTS glossary (term VARCHAR, definition VARCHAR, source VARCHAR, page INTEGER)")
-                        con.execute("DELETE FROM glossary") 
-                        
                         if "source" not in df.columns: df["source"] = "Unknown"
                         if "page" not in df.columns: df["page"] = 0
                         
                         data_to_insert = []
                         for _, row in df.iterrows():
+                            term = str(row['term']).strip()
                             data_to_insert.append((
-                                str(row['term']).strip(), 
+                                term, 
                                 str(row['definition']).strip(), 
                                 str(row['source']), 
-                                int(row['page']) if pd.notnull(row['page']) else 0
+                                int(row['page']) if pd.notnull(row['page']) else 0,
+                                glossary_term_key(term)
                             ))
                             
-                        con.executemany("INSERT INTO glossary VALUES (?, ?, ?, ?)", data_to_insert)
-                        con.close()
+                        with db_writer() as con:
+                            con.execute(GLOSSARY_SQL)
+                            con.execute("DELETE FROM glossary")
+                            con.executemany("INSERT INTO glossary (term, definition, source, page, term_key) VALUES (?, ?, ?, ?, ?)", data_to_insert)
+                        invalidate_glossary_matcher()
                         
                         st.success(f"✅ Successfully loaded {len(data_to_insert)} terms from {source_type}.")
                         with st.expander("View Loaded Terms"):
@@ -241,19 +215,6 @@ with tab2:
     con.close()
     
     # === 1. Mode Selection ===
-    # Tuple: (UseAgentClass, UseGrammar, UseDict, UseFewShot, UseGlossary)
-    MODES = {
-        "A: Baseline (No Tools)":    (False, False, False, False, False),
-        "B: Dict Only (MW)":         (True,  False, True,  False, False),
-        "C: Grammar Only":           (True,  True,  False, False, False),
-        "D: Full Agent (MW+Gram)":   (True,  True,  True,  False, False),
-        "E: Static Few-Shot":        (True,  True,  True,  True,  False),
-        "F: Dynamic Top-k RAG":      (True,  True,  True,  True,  False),
-        "G: Baseline + Glossary":    (False, False, False, False, True),
-        "H: Full Agent + Glossary":  (True,  True,  True,  False, True),
-        "I: Dynamic RAG + Glossary": (True,  True,  True,  True,  True)
-    }
-    
     col_mode, col_data = st.columns([2, 1])
     with col_mode:
         mode_selection = st.selectbox("1. Select Translation Mode", list(MODES.keys()))
@@ -304,6 +265,7 @@ with tab2:
         # Partition / Few-Shot Settings (Conditional)
         split_strategy = "Global Random (Leave-One-Out)" # Default
         n_examples = 0
+        rag_engine = RAG_ENGINE
         
         if use_few_shot:
             st.subheader("Few-Shot / RAG Config")
@@ -313,6 +275,9 @@ with tab2:
                 help="Sequential: Test 1st Half / Search 2nd Half"
             )
             n_examples = st.slider("Num Examples (k)", 1, 10, 3)
+            if is_dynamic_rag:
+                rag_engine = st.selectbox("Retrieval Engine", list(ENGINES), index=list(ENGINES).index(RAG_ENGINE),
+                                          help="bm25/minhash: n-gram overlap. dense: embedding similarity (needs scripts/build_embeddings.py; bm25 otherwise).")
         elif use_glossary:
             st.subheader("Glossary Config")
             st.info("Glossary Constraint: ON")
@@ -321,165 +286,95 @@ with tab2:
             st.info(f"Mode: {mode_selection.split(':')[0]}")
 
     # === Start Button ===
+    resume_run = st.checkbox("♻️ Resume stored results of an identical run", value=True,
+                             help="Results are saved per item; an interrupted run with the same settings continues where it stopped. Also available headless: scripts/run_eval.py")
     if st.button("Start Evaluation", type="primary"):
         if not selected_dataset: st.warning("Please select a dataset."); st.stop()
-        
-        con = get_db_connection()
-        all_items = con.execute("SELECT item_id, src_text, tgt_text FROM dataset_items WHERE dataset_name = ? ORDER BY item_id", [selected_dataset]).fetchall()
-        con.close()
-        
-        total_count = len(all_items)
-        mid_point = total_count // 2
-        
-        # === Step 1: Define Pools (The Critical Consistency Logic) ===
-        test_universe, search_universe = [], []
-        search_min_id, search_max_id = -1, 999999999
-        
-        should_use_half_pool = restrict_pool_to_half or (use_few_shot and split_strategy.startswith("Sequential"))
-        
-        if should_use_half_pool:
-            test_universe = all_items[:mid_point]
-            search_universe = all_items[mid_point:] 
-            if search_universe:
-                search_min_id = search_universe[0][0]
-                search_max_id = search_universe[-1][0]
-            
-            if use_few_shot and split_strategy.startswith("Sequential"):
-                st.info(f"📚 Sequential Split Active: Testing indices 0-{mid_point} (1st Half)")
-            else:
-                st.info(f"🔒 Consistency Lock: Testing Restricted to indices 0-{mid_point} (1st Half)")
-        else:
-            test_universe = all_items
-            search_universe = all_items
-            st.info("🌍 Global Pool: Testing on entire dataset range.")
 
-        if not test_universe: st.error("Test Universe is empty!"); st.stop()
+        config = EvalConfig(
+            dataset=selected_dataset,
+            mode=mode_selection,
+            run_all=run_all,
+            sampling="random" if sampling_method == "Random N Items" else "first",
+            limit=limit or 0,
+            seed=st.session_state.get("random_seed", 42),
+            restrict_pool_to_half=restrict_pool_to_half,
+            split_strategy="half" if split_strategy.startswith("Sequential") else "loo",
+            n_examples=n_examples,
+            engine=rag_engine,
+        )
+        runner = EvalRunner(config, llm, agent, glossary_tool)
 
-        # === Step 2: Select Items (Apply Random Seed Lock) ===
-        final_test_items = []
-        if run_all:
-            final_test_items = test_universe
-        else:
-            if len(test_universe) <= limit:
-                st.warning("Universe smaller than requested limit. Using all available.")
-                final_test_items = test_universe
-            else:
-                if sampling_method == "First N Items":
-                    final_test_items = test_universe[:limit]
-                else:
-                    random.seed(st.session_state.random_seed)
-                    final_test_items = random.sample(test_universe, limit)
-        
-        st.session_state['last_test_set'] = final_test_items
-        st.session_state['last_test_seed'] = st.session_state.random_seed if sampling_method == "Random N Items" else "FirstN"
-
-        # === Step 3: Prepare Static Context (Only Mode E) ===
-        static_few_shot_text = None
-        if is_static_few_shot:
-            test_ids = {item[0] for item in final_test_items}
-            candidates = [item for item in search_universe if item[0] not in test_ids]
-            if len(candidates) >= n_examples:
-                random.seed(st.session_state.random_seed) 
-                chosen = random.sample(candidates, n_examples)
-                static_few_shot_text = "\n\n".join([f"Source: {ex[1].strip()}\nTarget: {ex[2].strip()}" for ex in chosen])
-            else:
-                st.warning("Not enough static examples available.")
+        # === Step 1-3: Pools, Seed-Locked Selection, Static Context ===
+        plan = runner.prepare()
+        for note in plan.notes:
+            st.info(note)
+        if not plan.test_items: st.error("Test Universe is empty!"); st.stop()
+
+        st.session_state['last_test_set'] = plan.test_items
+        st.session_state['last_test_seed'] = config.seed if config.sampling == "random" else "FirstN"
 
         # === Step 4: Run Loop ===
-        st.write(f"Running **{mode_selection}** on **{len(final_test_items)}** items...")
-        results = []
-        all_refs, all_hyps = [], []
+        st.write(f"Running **{mode_selection}** on **{len(plan.test_items)}** items... (run `{runner.run_id}`)")
         progress_bar = st.progress(0)
         
         # Live Display Placeholder (Conditional)
+        running_placeholder = st.empty()
         context_placeholder = st.empty()
-        
-        for i, item in enumerate(final_test_items):
-            item_id, src, ref = item
-            
-            # Context
-            current_context = None
-            display_ctx = "None"
-            if is_dynamic_rag:
-                current_context = get_similar_examples(src, selected_dataset, item_id, n_examples, search_min_id, search_max_id)
-                display_ctx = current_context if current_context else "No matches."
-            elif is_static_few_shot:
-                current_context = static_few_shot_text
-                display_ctx = static_few_shot_text
-            
-            # Glossary Display
-            glossary_text_display = "None"
-            
-            # Execution
-            hyp = ""
-            try:
-                if not is_agent_class: 
-                    if not use_glossary:
-                        messages = [{"role": "system", "content": BASELINE_SYSTEM}, {"role": "user", "content": f"Translate this Sanskrit text to English:\n{src}"}]
-                        hyp = clean_baseline_output(llm.generate(messages))
-                    else:
-                        g_hits = glossary_tool.run(src)
-                        g_str = ""
-                        if g_hits:
-                            entries = [f"- {t}: {d}" for t, d in g_hits.items()]
-                            g_str = GLOSSARY_SYSTEM_ADDENDUM.format(glossary_content="\n".join(entries))
-                            glossary_text_display = str(g_hits)
-                        messages = [{"role": "system", "content": BASELINE_SYSTEM + g_str}, {"role": "user", "content": f"Translate this Sanskrit text to English:\n{src}"}]
-                        hyp = clean_baseline_output(llm.generate(messages))
-                else:
-                    state = agent.run(src, use_grammar=use_grammar, use_dict=use_dict, few_shot_text=current_context, use_glossary=use_glossary)
-                    hyp = state.final_translation
-                    
-                    if use_glossary:
-                        g_hits = glossary_tool.run(src)
-                        if g_hits: glossary_text_display = str(g_hits)
-
-                # Live Display Update (Conditional Visibility)
-                with context_placeholder.container():
-                    st.info(f"Processing ID: {item_id}")
-                    
-                    cols = st.columns(2) if (use_few_shot and use_glossary) else st.columns(1)
-                    
-                    if use_few_shot:
-                        with cols[0]:
-                            with st.expander("🔍 Context (Few-Shot)", expanded=True):
-                                st.text_area("Context", display_ctx, height=150, key=f"ctx_{i}")
-                    
-                    if use_glossary:
-                        target_col = cols[1] if use_few_shot else cols[0]
-                        with target_col:
-                            with st.expander("📖 Glossary Found", expanded=True):
-                                st.text_area("Glossary", glossary_text_display, height=150, key=f"glo_{i}")
-
-                # Metrics
-                bleu = sacrebleu.sentence_bleu(hyp, [ref]).score
-                #chrf = sacrebleu.sentence_chrf(hyp, [ref]).score
-                chrf = sacrebleu.sentence_chrf(hyp, [ref], word_order=2).score
-                all_refs.append(ref)
-                all_hyps.append(hyp)
-                results.append({
-                    "ID": item_id, "Source": src, "Ref": ref, "Hyp": hyp,
-                    "BLEU": round(bleu, 1), "chrF": round(chrf, 1),
-                    "Full Context": display_ctx,
-                    "Glossary Used": glossary_text_display
-                })
-            except Exception as e: st.error(f"Error {item_id}: {e}")
-            progress_bar.progress((i + 1) / len(final_test_items))
-            
+
+        def show_item(done, total, row):
+            progress_bar.progress(done / total)
+            if runner.corpus.n:
+                running_placeholder.caption(
+                    f"Running corpus scores ({runner.corpus.n} items): BLEU {runner.corpus.bleu:.2f} | chrF++ {runner.corpus.chrf:.2f}"
+                )
+            if row is None:
+                return
+            if "error" in row:
+                st.error(f"Error {row['ID']}: {row['error']}")
+                return
+            # Live Display Update (Conditional Visibility)
+            with context_placeholder.container():
+                st.info(f"Processing ID: {row['ID']}")
+                
+                cols = st.columns(2) if (use_few_shot and use_glossary) else st.columns(1)
+                
+                if use_few_shot:
+                    with cols[0]:
+                        with st.expander("🔍 Context (Few-Shot)", expanded=True):
+                            st.text_area("Context", row["Full Context"], height=150, key=f"ctx_{done}")
+                
+                if use_glossary:
+                    target_col = cols[1] if use_few_shot else cols[0]
+                    with target_col:
+                        with st.expander("📖 Glossary Found", expanded=True):
+                            st.text_area("Glossary", row["Glossary Used"], height=150, key=f"glo_{done}")
+
+        res_df = runner.run(on_item=show_item, restart=not resume_run)
         st.success("Complete!")
-        res_df = pd.DataFrame(results)
         
         st.dataframe(res_df[["ID", "Source", "Ref", "Hyp", "BLEU", "chrF"]])
         
-        if all_hyps:
-            c_bleu = sacrebleu.corpus_bleu(all_hyps, [all_refs]).score
-            #c_chrf = sacrebleu.corpus_chrf(all_hyps, [all_refs]).score
-            c_chrf = sacrebleu.corpus_chrf(all_hyps, [all_refs], word_order=2).score
+        if not res_df.empty:
+            c_bleu, c_chrf = corpus_scores(res_df["Hyp"].tolist(), res_df["Ref"].tolist())
             st.markdown("---")
             st.subheader(f"🏁 Results: {mode_selection}")
             c1, c2 = st.columns(2)
             c1.metric("Corpus BLEU", f"{c_bleu:.2f}")
             c2.metric("Corpus chrF", f"{c_chrf:.2f}")
+
+        if llm.response_cache is not None:
+            cache_stats = llm.response_cache.stats()
+            st.caption(
+                f"LLM cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses this session "
+                f"({cache_stats['entries']} entries, {cache_stats['total_bytes'] / 1e6:.1f} MB stored)"
+            )
+        if agent.translation_log is not None:
+            log = agent.translation_log
+            st.caption(
+                f"Translation log: {log.queue_depth} rows waiting to be written, "
+                f"{log.rows_spilled} spilled to {log.spill_path.name}, {log.rows_dropped} dropped"
+            )
             
         st.markdown("---")
         st.subheader("🔍 Detail Inspector")
@@ -500,6 +395,107 @@ with tab2:
                 with ic4: 
                     if use_glossary: st.text_area("Glossary Terms Used", row["Glossary Used"], height=200)
 
+# =========================================================
+# Tab 3: Ablation Sweep (several modes in one pass per item)
+# =========================================================
+with tab3:
+    st.header("Ablation Sweep")
+    st.info("Evaluates several modes in one pass: each item's draft, tool lookups, dictionary summaries and "
+            "few-shot context are computed once and shared; only the revisions differ per mode. "
+            "Every mode is stored as its own run (resumable, same results as a single-mode run).")
+
+    sw_modes = st.multiselect("Modes", list(MODES.keys()), default=list(MODES.keys()))
+    sw_dataset = st.selectbox("Dataset", dataset_options, key="sweep_dataset") if dataset_options else None
+
+    sw_col1, sw_col2 = st.columns(2)
+    with sw_col1:
+        sw_run_all = st.checkbox("🔥 Evaluate ALL items", value=False, key="sweep_all")
+        sw_half = st.checkbox("🔒 Restrict Test Pool to 1st Half", value=False, key="sweep_half")
+        sw_sampling = st.radio("Selection", ["First N Items", "Random N Items"], horizontal=True, key="sweep_sampling")
+        sw_limit = st.slider("Test Sample Size (N)", 1, 200, 5, key="sweep_limit")
+    with sw_col2:
+        sw_split = st.radio("Partition Strategy (few-shot modes)",
+                            ["Global Random (Leave-One-Out)", "Sequential Split (Half/Half)"], key="sweep_split")
+        sw_k = st.slider("Num Examples (k)", 1, 10, 3, key="sweep_k")
+        sw_engine = st.selectbox("Retrieval Engine", list(ENGINES), index=list(ENGINES).index(RAG_ENGINE), key="sweep_engine")
+    sw_resume = st.checkbox("♻️ Resume stored results", value=True, key="sweep_resume")
+
+    if st.button("Start Sweep", type="primary"):
+        if not sw_dataset or not sw_modes: st.warning("Please select a dataset and at least one mode."); st.stop()
+
+        base_config = EvalConfig(
+            dataset=sw_dataset,
+            mode=sw_modes[0],
+            run_all=sw_run_all,
+            sampling="random" if sw_sampling == "Random N Items" else "first",
+            limit=sw_limit,
+            seed=st.session_state.get("random_seed", 42),
+            restrict_pool_to_half=sw_half,
+            split_strategy="half" if sw_split.startswith("Sequential") else "loo",
+            n_examples=sw_k,
+            engine=sw_engine,
+        )
+        sweep = SweepRunner(base_config, sw_modes, llm, agent, glossary_tool)
+        sweep_items = sweep.prepare()
+        for note in sweep.notes:
+            st.info(note)
+
+        st.write(f"Sweeping **{len(sweep.modes)}** modes over **{len(sweep_items)}** items...")
+        sweep_bar = st.progress(0)
+
+        def show_sweep_item(done, total, rows):
+            sweep_bar.progress(done / total)
+            if "error" in rows:
+                st.error(f"Error: {rows['error']}")
+
+        sweep_results = sweep.run(on_item=show_sweep_item, restart=not sw_resume)
+        st.success("Complete!")
+
+        st.subheader("🏁 Ablation Table")
+        st.dataframe(sweep.summary(sweep_results), hide_index=True)
+        st.caption(" | ".join(
+            f"{stage}: {sweep.stats[stage]} computed vs {sweep.stats[f'{stage}_separate']} in separate runs"
+            for stage in ("drafts", "revisions", "tool_stages") if sweep.stats[f"{stage}_separate"]
+        ) + f" | p-values: paired bootstrap vs {sweep.modes[0].split(':')[0]}")
+
+    st.markdown("---")
+    st.header("📐 Significance Test Between Stored Runs")
+    st.caption("Paired bootstrap resampling on the items both runs translated, from stored n-gram statistics.")
+    cmp_con = get_db_connection()
+    try:
+        stored_runs = cmp_con.execute(
+            "SELECT run_id, dataset_name, mode, n_items FROM eval_runs ORDER BY created_at DESC"
+        ).fetchall()
+    except Exception:
+        stored_runs = []
+    cmp_con.close()
+
+    if len(stored_runs) < 2:
+        st.info("At least two stored runs are needed.")
+    else:
+        run_labels = {r[0]: f"{r[2]} | {r[1]} | {r[3]} items | {r[0]}" for r in stored_runs}
+        cmp_col1, cmp_col2, cmp_col3 = st.columns([2, 2, 1])
+        with cmp_col1:
+            run_a = st.selectbox("Run A (baseline)", list(run_labels), format_func=run_labels.get, key="cmp_a")
+        with cmp_col2:
+            run_b = st.selectbox("Run B", list(run_labels), index=1, format_func=run_labels.get, key="cmp_b")
+        with cmp_col3:
+            n_resamples = st.select_slider("Resamples", [1000, 2000, 5000, 10000], value=1000)
+
+        if st.button("Compare Runs"):
+            try:
+                tests = compare_runs(run_a, run_b, n_resamples)
+                st.dataframe(pd.DataFrame([
+                    {
+                        "Metric": t.metric, "Items": t.n_items,
+                        "A": f"{t.score_a:.2f} ± {t.ci_a:.2f}", "B": f"{t.score_b:.2f} ± {t.ci_b:.2f}",
+                        "Δ (B - A)": round(t.delta, 2), "p-value": round(t.p_value, 4),
+                    }
+                    for t in tests.values()
+                ]), hide_index=True)
+            except ValueError as e:
+                st.error(str(e))
+
 # =========================================================
 # Step 5: Download Selected Test Set (Always Visible after run)
 # =========================================================
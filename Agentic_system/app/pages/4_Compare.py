@@ -0,0 +1,164 @@
+import streamlit as st
+import pandas as pd
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.eval.metrics import compare_runs
+from src.eval.run_store import (
+    WATERFALL_STEPS,
+    aggregate_modes,
+    diff_runs,
+    list_runs,
+    run_settings,
+    stage_timings,
+    waterfall,
+)
+
+st.set_page_config(page_title="Compare Runs", layout="wide")
+st.title("🔬 Evaluation Run Store")
+
+try:
+    runs = list_runs()
+except Exception as e:
+    st.error(f"❌ Could not read the evaluation runs: {e}")
+    st.stop()
+
+if runs.empty:
+    st.info("No stored evaluation runs yet. Run an evaluation on the Evaluate page or with scripts/run_eval.py.")
+    st.stop()
+
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    st.metric("🧪 Runs", f"{len(runs):,}")
+with col2:
+    st.metric("✅ Finished", f"{runs['finished_at'].notna().sum():,}")
+with col3:
+    st.metric("📂 Datasets", f"{runs['dataset_name'].nunique():,}")
+with col4:
+    st.metric("📝 Scored Items", f"{int(runs['n_done'].sum()):,}")
+
+st.markdown("---")
+
+tab1, tab2, tab3 = st.tabs(["📋 Runs", "🆚 Run vs Run", "📊 Ablation Across Datasets"])
+
+# === Tab 1: Runs ===
+with tab1:
+    st.header("Stored Runs")
+    datasets = ["All"] + sorted(runs["dataset_name"].unique())
+    selected_ds = st.selectbox("Dataset", datasets)
+    shown = runs if selected_ds == "All" else runs[runs["dataset_name"] == selected_ds]
+    st.dataframe(shown, use_container_width=True, hide_index=True)
+
+# === Tab 2: Run vs Run ===
+with tab2:
+    st.header("Item-by-Item Comparison")
+    if len(runs) < 2:
+        st.info("At least two stored runs are needed.")
+    else:
+        run_labels = {
+            r.run_id: f"{r.mode} | {r.dataset_name} | seed {r.seed} | {r.model_name or 'unknown model'} | {r.run_id}"
+            for r in runs.itertuples()
+        }
+        cmp_col1, cmp_col2 = st.columns(2)
+        with cmp_col1:
+            run_a = st.selectbox("Run A (baseline)", list(run_labels), format_func=run_labels.get, key="diff_a")
+        with cmp_col2:
+            run_b = st.selectbox("Run B", list(run_labels), index=1, format_func=run_labels.get, key="diff_b")
+
+        info = runs.set_index("run_id")
+        if info.loc[run_a, "dataset_name"] != info.loc[run_b, "dataset_name"]:
+            st.warning("⚠️ The runs are on different datasets: only shared item ids are paired.")
+        if info.loc[run_a, "model_hash"] != info.loc[run_b, "model_hash"]:
+            st.caption("The runs used different (or unrecorded) model files.")
+
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Corpus BLEU (B)", f"{info.loc[run_b, 'corpus_bleu']:.2f}",
+                  f"{info.loc[run_b, 'corpus_bleu'] - info.loc[run_a, 'corpus_bleu']:+.2f}")
+        m2.metric("Corpus chrF++ (B)", f"{info.loc[run_b, 'corpus_chrf']:.2f}",
+                  f"{info.loc[run_b, 'corpus_chrf'] - info.loc[run_a, 'corpus_chrf']:+.2f}")
+        if pd.notna(info.loc[run_a, "mean_seconds"]) and pd.notna(info.loc[run_b, "mean_seconds"]):
+            m3.metric("Seconds / Item (B)", f"{info.loc[run_b, 'mean_seconds']:.2f}",
+                      f"{info.loc[run_b, 'mean_seconds'] - info.loc[run_a, 'mean_seconds']:+.2f}", delta_color="inverse")
+
+        if st.button("Paired Bootstrap Test"):
+            try:
+                tests = compare_runs(run_a, run_b)
+                st.dataframe(pd.DataFrame([
+                    {
+                        "Metric": t.metric, "Items": t.n_items,
+                        "A": f"{t.score_a:.2f} ± {t.ci_a:.2f}", "B": f"{t.score_b:.2f} ± {t.ci_b:.2f}",
+                        "Δ (B - A)": round(t.delta, 2), "p-value": round(t.p_value, 4),
+                    }
+                    for t in tests.values()
+                ]), hide_index=True)
+            except ValueError as e:
+                st.error(str(e))
+
+        diff = diff_runs(run_a, run_b)
+        only_changed = st.checkbox("Only items whose chrF++ changed", value=True)
+        if only_changed:
+            diff = diff[diff["delta_chrf"].fillna(1) != 0]
+        st.dataframe(diff, use_container_width=True, hide_index=True)
+
+        st.subheader("⏱️ Stage Timings")
+        t_col1, t_col2 = st.columns(2)
+        for col, name, run in ((t_col1, "A", run_a), (t_col2, "B", run_b)):
+            with col:
+                st.caption(f"Run {name}: {run_labels[run]}")
+                if info.loc[run, "sweep"]:
+                    st.caption("Ablation sweep run: its stage timings are shared by all the sweep's modes, so none are shown.")
+                else:
+                    st.dataframe(stage_timings(run), hide_index=True)
+
+# === Tab 3: Ablation across datasets ===
+with tab3:
+    st.header("Ablation Table")
+    st.caption("Corpus chrF++ of the latest run of each mode on each dataset, among runs of one setting "
+               "(same test items and model; few-shot options apply to the modes that use them).")
+    ab_col1, ab_col2 = st.columns([1, 3])
+    with ab_col1:
+        finished_only = st.checkbox("Finished runs only", value=True)
+    settings = run_settings(finished_only)
+    if settings.empty:
+        st.info("No runs match these filters.")
+        st.stop()
+
+    def setting_label(i: int) -> str:
+        r = settings.iloc[i]
+        items = "all items" if r["sampling"] == "all" else f"{r['sampling']} {r['limit']}"
+        parts = [items]
+        if r["seed"] is not None: parts.append(f"seed {r['seed']}")
+        if r["pool_half"] == "true": parts.append("1st half")
+        if r["split_strategy"] is not None: parts.append(f"split {r['split_strategy']}, k={r['n_examples']}")
+        if r["engine"] is not None: parts.append(r["engine"])
+        parts.append(r["model_name"] or "unknown model")
+        return f"{' | '.join(parts)} ({r['pairs']} dataset/mode runs)"
+
+    with ab_col2:
+        setting_idx = st.selectbox("Setting", range(len(settings)), format_func=setting_label)
+    setting = settings.iloc[setting_idx].to_dict()
+
+    table = aggregate_modes(finished_only, setting)
+    if table.empty:
+        st.info("No runs match these filters.")
+    else:
+        st.dataframe(table, use_container_width=True, hide_index=True)
+
+    st.subheader("🌊 chrF++ Waterfall")
+    steps = st.text_input("Steps (mode letters, in order)", ",".join(WATERFALL_STEPS))
+    steps = tuple(s for s in steps.replace(" ", "").split(",") if s)
+    wf = waterfall(steps, finished_only, setting) if steps else pd.DataFrame()
+    if wf.empty:
+        st.info("No dataset has a run of every step (on the same items) in this setting yet.")
+    else:
+        st.dataframe(wf, use_container_width=True, hide_index=True)
+        average = wf[wf["dataset_name"] == "Average"].set_index("mode")
+        # The first step is the baseline (absolute chrF++), the others are gains over the previous step
+        chart = pd.DataFrame({
+            "Baseline chrF++": average["chrf"].where(average["delta"].isna()),
+            "Δ chrF++ over previous step": average["delta"],
+        })
+        st.bar_chart(chart)
@@ -0,0 +1,41 @@
+# scripts/build_embeddings.py
+#
+# Offline job: embed dataset sources for the "dense" retrieval engine. The
+# Translate/Evaluate pages never embed a dataset: without up-to-date embeddings
+# they search it with bm25. Only new or changed items are embedded on re-runs.
+#
+# Usage:
+#   python scripts/build_embeddings.py                  # every dataset
+#   python scripts/build_embeddings.py --dataset bible
+#   EMBED_MODEL_PATH=models/bge-m3-Q8_0.gguf python scripts/build_embeddings.py
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.llm.embedder import LocalEmbedder
+from src.retrieval.dense import update_dense_index
+from src.retrieval.examples import list_datasets
+
+
+def build_embeddings(datasets: list[str], n_threads: int | None) -> None:
+    embedder = LocalEmbedder(n_threads=n_threads)
+    print(f"--> Model: {embedder.model_tag} ({embedder.dim} dims)")
+
+    for dataset_name in datasets:
+        t0 = time.time()
+        n = update_dense_index(dataset_name, embedder, show_progress=True)
+        print(f"✅ {dataset_name}: embedded {n} new/changed items in {time.time() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute dense retrieval embeddings.")
+    parser.add_argument("--dataset", action="append", help="Dataset name (repeatable; default: all)")
+    parser.add_argument("--threads", type=int, default=None, help="llama.cpp CPU threads")
+    args = parser.parse_args()
+
+    build_embeddings(args.dataset or list_datasets(), args.threads)
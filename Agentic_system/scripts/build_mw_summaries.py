@@ -0,0 +1,89 @@
+# scripts/build_mw_summaries.py
+#
+# Offline job: summarize the most frequent Monier-Williams headwords once with
+# DICT_SUMMARY_SYSTEM and store them in `mw_summary`, so the agent does not need
+# an LLM call per matched lemma at translation time.
+#
+# Usage:
+#   python scripts/build_mw_summaries.py --top 5000 --batch-size 16
+
+import sys
+import argparse
+from pathlib import Path
+from tqdm import tqdm
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.config import LLM_N_PARALLEL
+from src.db.duckdb_conn import get_db_connection
+from src.llm.qwen_local import QwenLocalLLM
+from src.agent.orchestrator import SanskritAgent
+
+
+def select_frequent_lemmas(top_n: int) -> list[tuple[str, str, str]]:
+    """
+    Return (lemma, gloss, raw_xml) for the `top_n` MW headwords that occur most often
+    as lemmas in the Ambuda corpus and do not have a stored summary yet.
+    """
+    con = get_db_connection()
+    try:
+        rows = con.execute(
+            """
+            WITH freq AS (
+                SELECT lemma, count(*) AS n
+                FROM morph_analysis
+                GROUP BY lemma
+            ),
+            first_entry AS (
+                -- MW has several H1 records for homonyms; keep the first one, as a lookup would
+                SELECT lemma, gloss, raw_xml,
+                       row_number() OVER (PARTITION BY lemma ORDER BY rowid) AS rn
+                FROM mw_lexicon
+            )
+            SELECT e.lemma, e.gloss, e.raw_xml
+            FROM first_entry e
+            JOIN freq f ON f.lemma = e.lemma
+            LEFT JOIN mw_summary s ON s.lemma = e.lemma
+            WHERE e.rn = 1 AND s.lemma IS NULL
+            ORDER BY f.n DESC, e.lemma
+            LIMIT ?
+            """,
+            [top_n],
+        ).fetchall()
+    finally:
+        con.close()
+    return rows
+
+
+def build_summaries(top_n: int, batch_size: int) -> None:
+    llm = QwenLocalLLM(n_parallel=LLM_N_PARALLEL)
+    agent = SanskritAgent(llm)
+
+    rows = select_frequent_lemmas(top_n)
+    if not rows:
+        print("✅ Nothing to do: all selected headwords already have summaries.")
+        return
+
+    print(f"--> Summarizing {len(rows)} MW headwords (batch size {batch_size})...")
+    written = 0
+    for start in tqdm(range(0, len(rows), batch_size), desc="Summarizing MW"):
+        chunk = rows[start : start + batch_size]
+        raw_entries = {lemma: agent.dict_tool.format_entry(lemma, gloss, raw) for lemma, gloss, raw in chunk}
+        summaries = agent.summarize_dictionary_entries(raw_entries, source="offline")
+
+        # Short entries are used verbatim by the agent; store them too so they count as covered
+        passthrough = {l: s for l, s in summaries.items() if not agent._needs_summary(raw_entries[l])}
+        agent.summary_store.put_many(passthrough, source="offline")
+        written += len(summaries)
+
+    print(f"✅ Stored summaries for {written} headwords in mw_summary.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute MW dictionary summaries.")
+    parser.add_argument("--top", type=int, default=5000, help="Number of most frequent headwords to summarize.")
+    parser.add_argument("--batch-size", type=int, default=16, help="Entries per generate_batch call.")
+    args = parser.parse_args()
+
+    build_summaries(args.top, args.batch_size)
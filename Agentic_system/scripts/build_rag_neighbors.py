@@ -0,0 +1,40 @@
+# scripts/build_rag_neighbors.py
+#
+# Offline job: precompute the few-shot neighbours of every dataset item under
+# both evaluation split strategies (leave-one-out and sequential half-split) and
+# store them in `rag_neighbors`. The Dynamic RAG modes (F, I) of the evaluation
+# page then read the stored neighbours instead of searching per item.
+#
+# Usage:
+#   python scripts/build_rag_neighbors.py                       # every dataset, default engine
+#   python scripts/build_rag_neighbors.py --dataset bible --engine bm25 --engine minhash
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.config import RAG_ENGINE
+from src.retrieval.examples import ENGINES, list_datasets
+from src.retrieval.neighbors import NEIGHBORS_K, build_neighbors
+
+
+def build_all(datasets: list[str], engines: list[str], k: int) -> None:
+    for engine in engines:
+        for dataset_name in datasets:
+            t0 = time.time()
+            n = build_neighbors(dataset_name, engine, k)
+            print(f"✅ {dataset_name} [{engine}]: {n} neighbour rows in {time.time() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute few-shot neighbours for evaluation.")
+    parser.add_argument("--dataset", action="append", help="Dataset name (repeatable; default: all)")
+    parser.add_argument("--engine", action="append", choices=list(ENGINES), help=f"Retrieval engine (repeatable; default: {RAG_ENGINE})")
+    parser.add_argument("--k", type=int, default=NEIGHBORS_K, help="Neighbours stored per item.")
+    args = parser.parse_args()
+
+    build_all(args.dataset or list_datasets(), args.engine or [RAG_ENGINE], args.k)
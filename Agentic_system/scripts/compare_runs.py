@@ -0,0 +1,41 @@
+# scripts/compare_runs.py
+#
+# Paired bootstrap significance test between two stored evaluation runs
+# (run ids as printed by scripts/run_eval.py or shown on the Evaluate page).
+# Scores are computed from the per-item n-gram statistics in `eval_item_stats`,
+# so thousands of resamples take well under a second.
+#
+# Usage:
+#   python scripts/compare_runs.py 5f6cc4b0edd3f2c3 f048d21309ee3767
+#   python scripts/compare_runs.py RUN_A RUN_B --resamples 10000 --seed 1
+
+import sys
+import argparse
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.eval.metrics import compare_runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paired bootstrap test between two evaluation runs.")
+    parser.add_argument("run_a", help="Baseline run id.")
+    parser.add_argument("run_b", help="Compared run id.")
+    parser.add_argument("--resamples", type=int, default=1000, help="Bootstrap resamples.")
+    parser.add_argument("--seed", type=int, default=12345, help="Resampling seed.")
+    args = parser.parse_args()
+
+    try:
+        tests = compare_runs(args.run_a, args.run_b, args.resamples, args.seed)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    for t in tests.values():
+        verdict = "significant" if t.p_value < 0.05 else "not significant"
+        print(
+            f"{t.metric:7s} A {t.score_a:6.2f} ± {t.ci_a:.2f} | B {t.score_b:6.2f} ± {t.ci_b:.2f} | "
+            f"Δ {t.delta:+.2f} | p = {t.p_value:.4f} ({verdict}, {t.n_items} items, {t.n_resamples} resamples)"
+        )
@@ -3,16 +3,34 @@
 import sys
 import os
 import glob
+import multiprocessing as mp
+import mmap
+import time
+import argparse
 import xml.etree.ElementTree as ET
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+import pandas as pd
 from tqdm import tqdm 
 
+try:
+    from lxml import etree as LET
+except ImportError:
+    LET = None
+
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.append(str(PROJECT_ROOT))
 DATA_DIR = PROJECT_ROOT / "data"
 
-from src.db.duckdb_conn import get_db_connection
-from src.db.schema import INIT_SQL
+from src.db.duckdb_conn import get_db_connection, db_writer
+from src.db.schema import INIT_SQL, MORPH_INDEX_SQL
+from src.db.manifest import check_files, record_files, manifest_paths, forget_files
+from src.retrieval.examples import index_dataset
+from src.tools.lemma_index import get_lemma_index, invalidate_lemma_index
+from src.tools.morph_lookup import invalidate_morph_index
+from src.tools.transliteration import to_slp1_key
+from indic_transliteration import sanscript
 
 def init_db_tables():
     con = get_db_connection()
@@ -22,103 +40,260 @@ def init_db_tables():
 # ---------------------------------------------------------
 # 1. Parsing MW Dict(mw.xml)
 # ---------------------------------------------------------
-def ingest_mw_dict():
+MW_SOURCE = "mw.xml"
+MW_COLUMNS = ["lemma", "gloss", "raw_xml", "lemma_key"]
+MW_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Record elements (H1, H1A, ..., HPW) are the only tags starting with an upper-case "H"
+MW_RECORD_START = b"<H"
+
+
+def plan_mw_chunks(xml_path, chunk_bytes: int = MW_CHUNK_BYTES) -> list[tuple[int, int]]:
+    """
+    Split mw.xml into byte ranges that start and end on record boundaries.
+    The XML prolog and the closing </mw> are left out of every range.
+    """
+    with open(xml_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        first = data.find(MW_RECORD_START)
+        last = data.rfind(b"</mw>")
+        if first < 0:
+            return []
+        if last < 0:
+            last = len(data)
+
+        chunks = []
+        start = first
+        while start < last:
+            end = data.find(MW_RECORD_START, min(start + chunk_bytes, last))
+            if end < 0 or end > last:
+                end = last
+            chunks.append((start, end))
+            start = end
+        return chunks
+
+
+def parse_mw_chunk(xml_path: str, start: int, end: int) -> dict[str, list]:
+    """
+    Parse the H1 records in one byte range of mw.xml into columns
+    (runs in a worker process; uses lxml when it is installed).
+    """
+    with open(xml_path, "rb") as f:
+        f.seek(start)
+        body = f.read(end - start)
+    xml = b"<mw>" + body + b"</mw>"
+
+    if LET is not None:
+        root = LET.fromstring(xml, parser=LET.XMLParser(huge_tree=True))
+        to_xml = lambda elem: LET.tostring(elem, encoding="unicode")
+    else:
+        root = ET.fromstring(xml)
+        to_xml = lambda elem: ET.tostring(elem, encoding="unicode")
+
+    columns = {name: [] for name in MW_COLUMNS}
+    for elem in root:
+        if elem.tag != 'H1':
+            continue
+        h_tag = elem.find('h')
+        if h_tag is None:
+            continue
+        key1 = h_tag.find('key1')
+        lemma = key1.text if key1 is not None else None
+        if not lemma:
+            continue
+
+        body_tag = elem.find('body')
+        columns["lemma"].append(lemma)
+        columns["gloss"].append("".join(body_tag.itertext()) if body_tag is not None else "")
+        columns["raw_xml"].append(to_xml(elem))
+        columns["lemma_key"].append(to_slp1_key(lemma, sanscript.SLP1))
+
+    return columns
+
+
+def ingest_mw_dict(max_workers: int | None = None, chunk_bytes: int = MW_CHUNK_BYTES, restart: bool = False):
     xml_path = DATA_DIR / "mw_dict" / "mw.xml"
     if not xml_path.exists():
         print(f"❌ MW XML not found at {xml_path}")
         return
 
     print(f"--> Parsing MW Dictionary: {xml_path}")
+    (file_state,) = check_files([xml_path])
+    if not file_state.changed and not restart:
+        print("✅ mw.xml unchanged since the last complete load, skipping.")
+        return
+
+    stat = xml_path.stat()
+    chunks = plan_mw_chunks(xml_path, chunk_bytes)
+
+    # Resume only if every finished chunk belongs to this exact file and chunk plan
     con = get_db_connection()
-    con.execute("DELETE FROM mw_lexicon")
+    done = {
+        chunk_id: (start, end, size, mtime)
+        for chunk_id, start, end, size, mtime in con.execute(
+            "SELECT chunk_id, start_offset, end_offset, file_size, file_mtime FROM ingest_checkpoint WHERE source = ?",
+            [MW_SOURCE],
+        ).fetchall()
+    }
+    con.close()
+    resumable = all(
+        chunk_id < len(chunks)
+        and (start, end) == chunks[chunk_id]
+        and (size, mtime) == (stat.st_size, stat.st_mtime)
+        for chunk_id, (start, end, size, mtime) in done.items()
+    )
+    if restart or not done or not resumable:
+        with db_writer() as con:
+            con.execute("DELETE FROM mw_lexicon")
+            con.execute("DELETE FROM ingest_checkpoint WHERE source = ?", [MW_SOURCE])
+        done = {}
+    elif len(done) < len(chunks):
+        print(f"↪️ Resuming: {len(done)}/{len(chunks)} chunks already loaded.")
+
+    todo = [(chunk_id, start, end) for chunk_id, (start, end) in enumerate(chunks) if chunk_id not in done]
+    if not todo:
+        print("✅ MW dictionary already fully ingested.")
 
-    context = ET.iterparse(xml_path, events=("end",))
-    
-    batch_data = []
-    batch_size = 5000
-    
     count = 0
-    for event, elem in tqdm(context, desc="Ingesting MW"):
-        if elem.tag == 'H1':
-            h_tag = elem.find('h')
-            if h_tag is not None:
-                key1 = h_tag.find('key1')
-                lemma = key1.text if key1 is not None else None
-                
-                body_tag = elem.find('body')
-                gloss = "".join(body_tag.itertext()) if body_tag is not None else ""
-                
-                raw_xml = ET.tostring(elem, encoding='unicode')
-
-                if lemma:
-                    batch_data.append((lemma, gloss, raw_xml))
-            
-            elem.clear()
-
-        if len(batch_data) >= batch_size:
-            con.executemany("INSERT INTO mw_lexicon (lemma, gloss, raw_xml) VALUES (?, ?, ?)", batch_data)
-            count += len(batch_data)
-            batch_data = []
-
-    if batch_data:
-        con.executemany("INSERT INTO mw_lexicon (lemma, gloss, raw_xml) VALUES (?, ?, ?)", batch_data)
-        count += len(batch_data)
-
-    print(f"✅ Inserted {count} dictionary entries.")
-    con.close()
+    start_time = time.perf_counter()
+    # Spawned, not forked: the parent holds an open DuckDB connection and threads
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("spawn")) as pool:
+        # map() yields in chunk order, so rowids keep the dictionary's record order
+        results = pool.map(parse_mw_chunk, [str(xml_path)] * len(todo), [s for _, s, _ in todo], [e for _, _, e in todo])
+        for (chunk_id, start, end), columns in tqdm(zip(todo, results), total=len(todo), desc="Ingesting MW"):
+            df = pd.DataFrame(columns, columns=MW_COLUMNS)
+            # Rows and checkpoint commit together: a chunk is either fully loaded or not at all
+            with db_writer() as con:
+                con.register("mw_batch", df)
+                con.execute(
+                    f"INSERT INTO mw_lexicon ({', '.join(MW_COLUMNS)}) SELECT {', '.join(MW_COLUMNS)} FROM mw_batch"
+                )
+                con.unregister("mw_batch")
+                con.execute(
+                    "INSERT INTO ingest_checkpoint VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [MW_SOURCE, chunk_id, start, end, stat.st_size, stat.st_mtime, len(df), datetime.now()],
+                )
+            count += len(df)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"✅ Inserted {count} dictionary entries in {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s).")
+
+    with db_writer() as con:
+        n_rows = con.execute("SELECT count(*) FROM mw_lexicon").fetchone()[0]
+        record_files(con, [file_state], "mw_lexicon", n_rows)
+
+    # Pre-build the in-memory lemma index snapshot used by DictionaryLookupTool
+    invalidate_lemma_index()
+    print(f"✅ Lemma index ready ({len(get_lemma_index())} headwords).")
 
 # ---------------------------------------------------------
 # 2. Parsing Ambuda (CoNLL-like txt)
 # ---------------------------------------------------------
-def ingest_ambuda():
-    txt_files = glob.glob(str(DATA_DIR / "ambuda-dcs" / "*.txt"))
+AMBUDA_COLUMNS = ["word", "lemma", "pos_tag", "sent_id", "word_key", "text_name"]
+
+
+def parse_ambuda_file(file_path: str) -> dict[str, list]:
+    """
+    Parse one Ambuda/DCS file into columns (runs in a worker process).
+    `sent_id` is carried forward from the last '# id = ...' comment; `text_name`
+    is the file stem, so a changed file can replace just its own rows.
+    """
+    columns = {name: [] for name in AMBUDA_COLUMNS}
+    word_col, lemma_col, pos_col = columns["word"], columns["lemma"], columns["pos_tag"]
+    sent_col, key_col = columns["sent_id"], columns["word_key"]
+    text_name = Path(file_path).stem
+
+    current_sent_id = "unknown"
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+
+            if line.startswith("# id"):
+                parts = line.split("=")
+                if len(parts) > 1:
+                    current_sent_id = parts[1].strip()
+                continue
+
+            parts = line.split('\t')
+            if len(parts) < 3:
+                parts = line.split()
+
+            if len(parts) >= 3:
+                word = parts[0].strip()
+                word_col.append(word)
+                lemma_col.append(parts[1].strip())
+                pos_col.append(parts[2].strip())
+                sent_col.append(current_sent_id)
+                key_col.append(to_slp1_key(word, sanscript.SLP1))
+
+    columns["text_name"] = [text_name] * len(word_col)
+    return columns
+
+
+def ingest_ambuda(max_workers: int | None = None):
+    txt_files = sorted(glob.glob(str(DATA_DIR / "ambuda-dcs" / "*.txt")))
     if not txt_files:
         print("❌ No Ambuda .txt files found.")
         return
 
     print(f"--> Parsing Ambuda Grammar Files: {len(txt_files)} files found.")
     con = get_db_connection()
-    con.execute("DELETE FROM morph_analysis")
+    # Rows loaded before per-text tracking cannot be replaced selectively: rebuild once
+    legacy_rows = con.execute("SELECT count(*) FROM morph_analysis WHERE text_name IS NULL").fetchone()[0]
+    con.close()
+
+    states = check_files(txt_files)
+    present = {s.key for s in states}
+    removed = [key for key in manifest_paths("morph_analysis") if key not in present]
+    if legacy_rows:
+        changed = states
+        with db_writer() as con:
+            con.execute("DELETE FROM morph_analysis")
+    else:
+        changed = [s for s in states if s.changed]
+
+    if removed:
+        with db_writer() as con:
+            for key in removed:
+                con.execute("DELETE FROM morph_analysis WHERE text_name = ?", [Path(key).stem])
+            forget_files(con, removed)
+        print(f"🗑️ Removed rows of {len(removed)} deleted files.")
+
+    if not changed and not removed:
+        print("✅ Ambuda files unchanged, nothing to ingest.")
+        return
+    print(f"--> {len(changed)} new or changed files ({len(states) - len(changed)} unchanged).")
 
-    batch_data = []
     total_lines = 0
+    start = time.perf_counter()
 
-    for file_path in txt_files:
-        current_sent_id = "unknown"
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line: 
-                    continue
-                
-                if line.startswith("# id"):
-                    parts = line.split("=")
-                    if len(parts) > 1:
-                        current_sent_id = parts[1].strip()
-                    continue
-                
-                parts = line.split('\t')
-                if len(parts) < 3:
-                    parts = line.split()
-                
-                if len(parts) >= 3:
-                    word = parts[0].strip()
-                    lemma = parts[1].strip()
-                    pos_tag = parts[2].strip()
-                    
-                    batch_data.append((word, lemma, pos_tag, current_sent_id))
-
-                if len(batch_data) >= 10000:
-                    con.executemany("INSERT INTO morph_analysis (word, lemma, pos_tag, sent_id) VALUES (?, ?, ?, ?)", batch_data)
-                    total_lines += len(batch_data)
-                    batch_data = []
-
-    if batch_data:
-        con.executemany("INSERT INTO morph_analysis (word, lemma, pos_tag, sent_id) VALUES (?, ?, ?, ?)", batch_data)
-        total_lines += len(batch_data)
-
-    print(f"✅ Inserted {total_lines} morph analysis records.")
+    # Files are parsed in parallel; each one replaces its own rows with a single DataFrame insert
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("spawn")) as pool:
+        futures = {pool.submit(parse_ambuda_file, str(state.path)): state for state in changed}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Ingesting Ambuda"):
+            state = futures[future]
+            df = pd.DataFrame(future.result(), columns=AMBUDA_COLUMNS)
+            with db_writer() as con:
+                con.execute("DELETE FROM morph_analysis WHERE text_name = ?", [state.path.stem])
+                con.register("ambuda_batch", df)
+                con.execute(
+                    f"INSERT INTO morph_analysis ({', '.join(AMBUDA_COLUMNS)}) "
+                    f"SELECT {', '.join(AMBUDA_COLUMNS)} FROM ambuda_batch"
+                )
+                con.unregister("ambuda_batch")
+                record_files(con, [state], "morph_analysis", len(df))
+            total_lines += len(df)
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Inserted {total_lines} morph analysis records in {elapsed:.1f}s ({total_lines / max(elapsed, 1e-9):,.0f} rows/s).")
+
+    con = get_db_connection()
+    con.execute(MORPH_INDEX_SQL)
+    n_index = con.execute("SELECT count(*) FROM morph_index").fetchone()[0]
+    print(f"✅ Built morph_index ({n_index} distinct analyses).")
     con.close()
+    invalidate_morph_index()
 
 # ---------------------------------------------------------
 # 3. Parsing Testsets (MKB Parallel)
@@ -133,8 +308,10 @@ def ingest_mkb_testset():
         return
 
     print(f"--> Parsing MKB Testset...")
-    con = get_db_connection()
-    con.execute("DELETE FROM dataset_items WHERE dataset_name='mkb'")
+    file_states = check_files([sa_path, en_path])
+    if not any(s.changed for s in file_states):
+        print("✅ MKB files unchanged, skipping.")
+        return
 
     with open(sa_path, 'r', encoding='utf-8') as f_sa, \
          open(en_path, 'r', encoding='utf-8') as f_en:
@@ -154,14 +331,21 @@ def ingest_mkb_testset():
             if src: 
                 batch_data.append(('mkb', i+1, src, tgt))
 
-        con.executemany("INSERT INTO dataset_items (dataset_name, item_id, src_text, tgt_text) VALUES (?, ?, ?, ?)", batch_data)
-        print(f"✅ Inserted {len(batch_data)} test pairs from MKB.")
-
-    con.close()
+        with db_writer() as con:
+            con.execute("DELETE FROM dataset_items WHERE dataset_name='mkb'")
+            con.executemany("INSERT INTO dataset_items (dataset_name, item_id, src_text, tgt_text) VALUES (?, ?, ?, ?)", batch_data)
+            record_files(con, file_states, "dataset_items", len(batch_data))
+            index_dataset(con, 'mkb')
+        print(f"✅ Inserted {len(batch_data)} test pairs from MKB (retrieval indexes updated).")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest MW, Ambuda and MKB data into DuckDB.")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count).")
+    parser.add_argument("--restart-mw", action="store_true", help="Reload mw.xml from scratch instead of resuming.")
+    args = parser.parse_args()
+
     init_db_tables()
-    ingest_mw_dict()
-    ingest_ambuda()
+    ingest_mw_dict(max_workers=args.workers, restart=args.restart_mw)
+    ingest_ambuda(max_workers=args.workers)
     ingest_mkb_testset()
     print("\n🎉 All Data Ingestion Complete!")
@@ -0,0 +1,147 @@
+# scripts/run_eval.py
+#
+# Headless evaluation (same modes, sampling and split options as the Evaluate page).
+# Each item's result is written to `eval_results` as soon as it is translated;
+# re-running the same command resumes an interrupted run.
+#
+# Usage:
+#   python scripts/run_eval.py --dataset Itihasa --mode F --all --split half
+#   python scripts/run_eval.py --dataset bible --mode A --sampling random --limit 200 --seed 42
+#
+# Parallel mode: N worker processes, each with its own llama.cpp instance pinned to
+# its own cores, share the test items through a work queue (see src/eval/parallel.py).
+# The workers open the database read-only, so no other process may hold it writable.
+#   python scripts/run_eval.py --dataset Itihasa --mode F --all --workers 8 --threads 8
+#
+# Ablation sweep: several modes in one pass per item, sharing drafts, tool lookups,
+# summaries and few-shot contexts (see src/eval/sweep.py). Each mode is stored as its own run.
+#   python scripts/run_eval.py --dataset bible --mode all --sampling random --limit 200
+#   python scripts/run_eval.py --dataset bible --mode A,D,F,I --split half
+#
+# Batched prompts (sweep drafts/revisions, dictionary summaries) are decoded on
+# --n-parallel llama.cpp contexts (default LLM_N_PARALLEL), which split --threads.
+
+import sys
+import argparse
+from pathlib import Path
+from tqdm import tqdm
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.config import LLM_N_PARALLEL, RAG_ENGINE
+from src.eval.runner import MODES, EvalConfig, EvalRunner, corpus_scores
+from src.eval.parallel import UNIT_SIZE, ParallelEvalRunner
+from src.eval.sweep import SweepRunner
+from src.llm.qwen_local import QwenLocalLLM
+from src.agent.orchestrator import SanskritAgent
+from src.retrieval.examples import ENGINES
+
+
+def run(
+    config: EvalConfig,
+    restart: bool,
+    workers: int = 1,
+    threads: int | None = None,
+    unit_size: int = UNIT_SIZE,
+    n_parallel: int = LLM_N_PARALLEL,
+) -> None:
+    if workers > 1:
+        runner = ParallelEvalRunner(config, workers, threads_per_worker=threads, unit_size=unit_size)
+    else:
+        llm = QwenLocalLLM(n_parallel=n_parallel, n_threads=threads)
+        agent = SanskritAgent(llm)
+        runner = EvalRunner(config, llm, agent)
+
+    plan = runner.prepare()
+    for note in plan.notes:
+        print(note)
+    pending = len(plan.test_items) - (0 if restart else len(runner.completed_ids()))
+    print(f"--> Run {runner.run_id}: {config.mode} on {len(plan.test_items)} items of '{config.dataset}' ({pending} pending)")
+
+    with tqdm(total=len(plan.test_items), desc="Evaluating") as bar:
+        def on_item(done, total, row):
+            if row is not None and "error" in row:
+                tqdm.write(f"❌ Error {row['ID']}: {row['error']}")
+            if runner.corpus.n:
+                bar.set_postfix(BLEU=f"{runner.corpus.bleu:.2f}", chrF=f"{runner.corpus.chrf:.2f}")
+            bar.update(1)
+
+        results = runner.run(on_item=on_item, restart=restart)
+
+    if results.empty:
+        print("❌ No results.")
+        return
+    bleu, chrf = corpus_scores(results["Hyp"].tolist(), results["Ref"].tolist())
+    print(f"✅ {len(results)} items | Corpus BLEU {bleu:.2f} | Corpus chrF++ {chrf:.2f}")
+    if runner.errors:
+        print(f"⚠️ {len(runner.errors)} items failed; run again to retry them.")
+
+
+def run_sweep(
+    config: EvalConfig, modes: list[str], restart: bool, threads: int | None = None, n_parallel: int = LLM_N_PARALLEL
+) -> None:
+    llm = QwenLocalLLM(n_parallel=n_parallel, n_threads=threads)
+    agent = SanskritAgent(llm)
+    sweep = SweepRunner(config, modes, llm, agent)
+
+    items = sweep.prepare()
+    for note in sweep.notes:
+        print(note)
+    print(f"--> Sweep of {len(sweep.modes)} modes on {len(items)} items of '{config.dataset}'")
+
+    with tqdm(total=len(items), desc="Sweeping") as bar:
+        def on_item(done, total, rows):
+            if "error" in rows:
+                tqdm.write(f"❌ Error: {rows['error']}")
+            bar.update(1)
+
+        results = sweep.run(on_item=on_item, restart=restart)
+
+    print(sweep.summary(results).to_string(index=False))
+    for stage in ("drafts", "revisions", "tool_stages"):
+        if sweep.stats[f"{stage}_separate"]:
+            print(f"   {stage}: {sweep.stats[stage]} computed ({sweep.stats[f'{stage}_separate']} with separate runs)")
+    if sweep.errors:
+        print(f"⚠️ {len(sweep.errors)} items failed; run again to retry them.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an evaluation without the Streamlit UI.")
+    parser.add_argument("--dataset", required=True, help="Dataset name in dataset_items.")
+    parser.add_argument("--mode", required=True, help=f"Mode letter ({', '.join(k.split(':')[0] for k in MODES)}); several (A,D,F) or 'all' run a sweep.")
+    parser.add_argument("--all", action="store_true", help="Evaluate every item of the test pool.")
+    parser.add_argument("--sampling", choices=["first", "random"], default="first", help="First N or random N items.")
+    parser.add_argument("--limit", type=int, default=5, help="Test sample size N.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of random sampling and the static few-shot draw.")
+    parser.add_argument("--half-pool", action="store_true", help="Restrict the test pool to the 1st half (comparable to --split half).")
+    parser.add_argument("--split", choices=["loo", "half"], default="loo", help="Few-shot modes: leave-one-out or sequential half split.")
+    parser.add_argument("--k", type=int, default=3, help="Few-shot examples.")
+    parser.add_argument("--engine", choices=list(ENGINES), default=RAG_ENGINE, help="Retrieval engine of modes F/I.")
+    parser.add_argument("--restart", action="store_true", help="Discard stored results of this run and start over.")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, each with its own model instance.")
+    parser.add_argument("--threads", type=int, default=None, help="llama.cpp threads per worker, shared by its contexts (default: cores / workers).")
+    parser.add_argument("--n-parallel", type=int, default=LLM_N_PARALLEL, help="llama.cpp contexts decoding batched prompts at once (single-process runs and sweeps).")
+    parser.add_argument("--unit-size", type=int, default=UNIT_SIZE, help="Test items per work unit of the parallel queue.")
+    args = parser.parse_args()
+
+    modes = list(MODES) if args.mode.lower() == "all" else [m for m in args.mode.split(",") if m.strip()]
+    if len(modes) > 1 and args.workers > 1:
+        parser.error("--workers runs a single mode; sweeps run in one process.")
+
+    config = EvalConfig(
+        dataset=args.dataset,
+        mode=modes[0],
+        run_all=args.all,
+        sampling=args.sampling,
+        limit=args.limit,
+        seed=args.seed,
+        restrict_pool_to_half=args.half_pool,
+        split_strategy=args.split,
+        n_examples=args.k,
+        engine=args.engine,
+    )
+    if len(modes) > 1:
+        run_sweep(config, modes, args.restart, args.threads, args.n_parallel)
+    else:
+        run(config, args.restart, args.workers, args.threads, args.unit_size, args.n_parallel)
@@ -1,5 +1,8 @@
 import json
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from uuid import uuid4
 
@@ -9,21 +12,50 @@ from src.llm.prompts import (
     BASELINE_SYSTEM,
     AGENT_REVISION_SYSTEM,
     DICT_SUMMARY_SYSTEM,
+    DICT_SUMMARY_BATCH_SYSTEM,
     FEW_SHOT_SYSTEM,
     GLOSSARY_SYSTEM_ADDENDUM,
 )
 from src.tools.dict_lookup import DictionaryLookupTool
 from src.tools.morph_lookup import MorphAnalysisTool
 from src.tools.glossary_lookup import GlossaryLookupTool
-from src.db.duckdb_conn import get_db_connection
+from src.tools.dict_summary_store import DictSummaryStore
+from src.db.translation_log import get_translation_log
+from indic_transliteration import sanscript
+
+# Background workers for the DuckDB tool stage (see `SanskritAgent._run_tool_stage`),
+# shared by every agent of the process so constructing agents does not leak threads
+TOOL_POOL_WORKERS = 4
+_tool_pool: ThreadPoolExecutor | None = None
+_tool_pool_lock = threading.Lock()
+
+
+def get_tool_pool() -> ThreadPoolExecutor:
+    """
+    Process-wide executor for tool stages (created on first use).
+    """
+    global _tool_pool
+    with _tool_pool_lock:
+        if _tool_pool is None:
+            _tool_pool = ThreadPoolExecutor(max_workers=TOOL_POOL_WORKERS, thread_name_prefix="agent-tools")
+        return _tool_pool
 
 
 class SanskritAgent:
-    def __init__(self, llm):
+    # Raw-entry characters per batched summarization call (~4k tokens, well inside n_ctx)
+    BATCH_SUMMARY_CHAR_BUDGET = 12000
+    BATCH_SUMMARY_MAX_ENTRIES = 20
+
+    def __init__(self, llm, batch_summaries: bool = True):
         self.llm = llm
+        self.batch_summaries = batch_summaries
         self.dict_tool = DictionaryLookupTool()
         self.morph_tool = MorphAnalysisTool()
         self.glossary_tool = GlossaryLookupTool()
+        self.summary_store = DictSummaryStore()
+        # Write-behind logger for `translations` (None when the DB is read-only)
+        self.translation_log = get_translation_log()
+        self._tool_pool = get_tool_pool()
 
     def _clean_response(self, text: str) -> str:
         """
@@ -46,188 +78,273 @@ class SanskritAgent:
 
         return cleaned.strip().strip('"').strip("'").strip()
 
+    def _needs_summary(self, raw_entry: str) -> bool:
+        return len(raw_entry) >= 50 and "No entry found" not in raw_entry
+
+    def _summary_messages(self, word: str, raw_entry: str) -> list:
+        return [
+            {"role": "system", "content": DICT_SUMMARY_SYSTEM},
+            {"role": "user", "content": f"Word: {word}\nRaw Entry: {raw_entry}"},
+        ]
+
     def _summarize_dictionary_entry(self, word: str, raw_entry: str) -> str:
         """
         Use the LLM to compress a long dictionary entry into a structured summary.
         """
-        if len(raw_entry) < 50 or "No entry found" in raw_entry:
+        if not self._needs_summary(raw_entry):
             return raw_entry
 
-        messages = [
-            {"role": "system", "content": DICT_SUMMARY_SYSTEM},
-            {"role": "user", "content": f"Word: {word}\nRaw Entry: {raw_entry}"},
-        ]
-
         # Limit tokens to encourage concise summaries
-        summary = self.llm.generate(messages, max_new_tokens=100)
+        summary = self.llm.generate(self._summary_messages(word, raw_entry), max_new_tokens=100)
         return self._clean_response(summary)
 
-    def run(
-        self,
-        src_text: str,
-        use_grammar: bool = True,
-        use_dict: bool = True,
-        few_shot_text: str | None = None,
-        use_glossary: bool = False,
-    ) -> AgentState:
+    def _chunk_entries(self, entries: dict[str, str]) -> list[dict[str, str]]:
         """
-        Run the translation pipeline.
-
-        Args:
-            src_text: Sanskrit input text.
-            use_grammar: Enable morphology/grammar lookup.
-            use_dict: Enable dictionary lookup.
-            few_shot_text: Optional few-shot examples to guide style.
-            use_glossary: Enable glossary constraints (terminology enforcement).
-
-        Returns:
-            AgentState with draft/final translations and logs.
+        Split {lemma: raw_entry} into chunks that fit one batched summarization prompt.
         """
-        run_id = str(uuid4())
-        state = AgentState(src_text=src_text)
+        chunks: list[dict[str, str]] = []
+        current: dict[str, str] = {}
+        size = 0
+        for lemma, raw in entries.items():
+            if current and (
+                size + len(raw) > self.BATCH_SUMMARY_CHAR_BUDGET
+                or len(current) >= self.BATCH_SUMMARY_MAX_ENTRIES
+            ):
+                chunks.append(current)
+                current, size = {}, 0
+            current[lemma] = raw
+            size += len(raw)
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _summarize_batched(self, entries: dict[str, str]) -> dict[str, str]:
+        """
+        Summarize several entries in one JSON-constrained LLM call per chunk.
 
-        # ----------------------------------------------------
-        # Step 0: Glossary Lookup (Global Constraint)
-        # ----------------------------------------------------
-        glossary_text = ""
-        glossary_matches: dict[str, str] = {}
+        The output is grammar-constrained to an object keyed by lemma. Only the
+        lemmas whose value parsed as a non-empty string are returned.
+        """
+        parsed: dict[str, str] = {}
 
-        if use_glossary:
-            glossary_matches = self.glossary_tool.run(src_text)
-            if glossary_matches:
-                entries = [f"- {term}: {defn}" for term, defn in glossary_matches.items()]
-                glossary_text = GLOSSARY_SYSTEM_ADDENDUM.format(
-                    glossary_content="\n".join(entries)
-                )
-                state.logs.append(f"Step 0: Glossary applied for {len(glossary_matches)} terms.")
-            else:
-                state.logs.append("Step 0: Glossary enabled but no terms found.")
+        for chunk in self._chunk_entries(entries):
+            # A single entry is cheaper with the plain prompt (handled by the fallback)
+            if len(chunk) < 2:
+                continue
 
-        # ----------------------------------------------------
-        # Step 1: Draft Translation
-        # ----------------------------------------------------
-        state.logs.append("Step 1: Generating draft translation...")
+            schema = {
+                "type": "object",
+                "properties": {lemma: {"type": "string"} for lemma in chunk},
+                "required": list(chunk),
+            }
+            user_content = "\n\n".join(f"Word: {lemma}\nRaw Entry: {raw}" for lemma, raw in chunk.items())
+            messages = [
+                {"role": "system", "content": DICT_SUMMARY_BATCH_SYSTEM},
+                {"role": "user", "content": user_content},
+            ]
 
-        # Build system prompt
-        base_system = BASELINE_SYSTEM
-        if few_shot_text:
-            base_system = (
-                FEW_SHOT_SYSTEM
-                + "\n\n=== REFERENCE EXAMPLES (STYLE GUIDE) ===\n"
-                + few_shot_text
+            raw_output = self.llm.generate(
+                messages,
+                max_new_tokens=min(120 * len(chunk), 2048),
+                response_format={"type": "json_object", "schema": schema},
             )
-            state.logs.append("Step 1: Using few-shot context.")
+            try:
+                data = json.loads(raw_output)
+            except (json.JSONDecodeError, TypeError):
+                continue
+            if not isinstance(data, dict):
+                continue
 
-        # Inject glossary constraints at the end to increase weight
-        full_system_prompt = base_system + glossary_text
+            for lemma in chunk:
+                value = data.get(lemma)
+                if isinstance(value, str) and value.strip():
+                    parsed[lemma] = self._clean_response(value)
 
-        draft_messages = [
-            {"role": "system", "content": full_system_prompt},
-            {"role": "user", "content": f"Translate this Sanskrit text to English:\n{src_text}"},
-        ]
+        return parsed
 
-        raw_draft = self.llm.generate(draft_messages)
-        state.draft_translation = self._clean_response(raw_draft)
+    def summarize_dictionary_entries(self, raw_entries: dict[str, str], source: str = "online") -> dict[str, str]:
+        """
+        Summarize dictionary evidence {word: raw_entry}.
+
+        Summaries are per MW headword, so they are read from `mw_summary` first;
+        only headwords without a stored summary go to the LLM and the new
+        summaries are written back. Missing headwords are summarized together in
+        one JSON-constrained call (see `_summarize_batched`); entries that fail to
+        parse fall back to one plain call each.
+        Short entries and misses are passed through unchanged.
+        """
+        summaries = dict(raw_entries)
+        to_summarize = {
+            w: (self.dict_tool.matched_lemma(raw) or w, raw)
+            for w, raw in raw_entries.items()
+            if self._needs_summary(raw)
+        }
+        if not to_summarize:
+            return summaries
+
+        by_lemma = self.summary_store.get_many([lemma for lemma, _ in to_summarize.values()])
+
+        missing: dict[str, str] = {}
+        for lemma, raw in to_summarize.values():
+            if lemma not in by_lemma and lemma not in missing:
+                missing[lemma] = raw
+
+        if missing:
+            fresh = self._summarize_batched(missing) if self.batch_summaries else {}
+
+            # Per-entry fallback for everything the batched call did not return cleanly
+            remaining = {lemma: raw for lemma, raw in missing.items() if lemma not in fresh}
+            if remaining:
+                outputs = self.llm.generate_batch(
+                    [self._summary_messages(lemma, raw) for lemma, raw in remaining.items()],
+                    max_new_tokens=100,
+                )
+                fresh.update({lemma: self._clean_response(out) for lemma, out in zip(remaining, outputs)})
+
+            self.summary_store.put_many(fresh, source=source)
+            by_lemma.update(fresh)
+
+        for w, (lemma, _) in to_summarize.items():
+            summaries[w] = by_lemma.get(lemma, raw_entries[w])
+        return summaries
+
+    def _run_tool_stage(self, src_text: str, use_grammar: bool, use_dict: bool) -> tuple:
+        """
+        Steps 2-3: morphology and dictionary lookup (DuckDB only, no LLM).
+
+        Runs on the agent's tool thread pool while the draft is decoded.
+        Returns (morph_evidence, raw_dict_evidence, logs, timings).
+        """
+        logs: list[str] = []
+        timings: dict[str, float] = {}
 
         # ----------------------------------------------------
         # Step 2: Grammar / Morphology
         # ----------------------------------------------------
         raw_words = [w.strip("|,.;-") for w in src_text.split() if len(w) > 1]
         morph_evidence: dict[str, str] = {}
-        lemmas_to_lookup: set[str] = set()
+        # {term: scheme}, insertion-ordered so evidence (and the revision prompt) is stable
+        # across runs. Morph lemmas are SLP1 keys; unanalyzed words are in the input's script.
+        lemmas_to_lookup: dict[str, str | None] = {}
 
+        t0 = time.perf_counter()
         if use_grammar:
-            state.logs.append("Step 2: Analyzing morphology (Ambuda)...")
+            logs.append("Step 2: Analyzing morphology (Ambuda)...")
+            morph_results = self.morph_tool.run_many(raw_words)
             for w in raw_words:
-                res = self.morph_tool.run(w)
+                res = morph_results.get(w.strip(), {})
                 if res.get("found"):
                     best_analysis = res["analyses"][0]
                     lemma = best_analysis["lemma"]
                     morph_evidence[w] = f"Lemma: {lemma} | Tags: {best_analysis['tags']}"
-                    lemmas_to_lookup.add(lemma)
+                    lemmas_to_lookup.setdefault(lemma, sanscript.SLP1)
                 else:
-                    lemmas_to_lookup.add(w)
+                    lemmas_to_lookup.setdefault(w, None)
+            timings["morphology"] = time.perf_counter() - t0
         else:
-            state.logs.append("Step 2: Morphology analysis skipped.")
+            logs.append("Step 2: Morphology analysis skipped.")
             for w in raw_words:
-                lemmas_to_lookup.add(w)
+                lemmas_to_lookup.setdefault(w, None)
 
         # ----------------------------------------------------
         # Step 3: Dictionary Lookup
         # ----------------------------------------------------
         raw_dict_evidence: dict[str, str] = {}
 
+        t0 = time.perf_counter()
         if use_dict:
-            state.logs.append("Step 3: Looking up dictionary entries...")
+            logs.append("Step 3: Looking up dictionary entries...")
             if lemmas_to_lookup:
-                raw_dict_evidence = self.dict_tool.run(list(lemmas_to_lookup))
+                entries: dict[str, str] = {}
+                for scheme in set(lemmas_to_lookup.values()):
+                    entries.update(self.dict_tool.run(
+                        [t for t, s in lemmas_to_lookup.items() if s == scheme], scheme
+                    ))
                 # Filter invalid results
                 raw_dict_evidence = {
-                    k: v for k, v in raw_dict_evidence.items() if "No entry found" not in v
+                    t: entries[t] for t in lemmas_to_lookup
+                    if t in entries and "No entry found" not in entries[t]
                 }
             else:
-                state.logs.append("Step 3: No terms to look up.")
+                logs.append("Step 3: No terms to look up.")
+            timings["dictionary"] = time.perf_counter() - t0
         else:
-            state.logs.append("Step 3: Dictionary lookup skipped.")
+            logs.append("Step 3: Dictionary lookup skipped.")
 
-        # ----------------------------------------------------
-        # Step 3.5: Summarization
-        # ----------------------------------------------------
-        state.dict_evidence = {}
+        return morph_evidence, raw_dict_evidence, logs, timings
 
-        if use_dict and raw_dict_evidence:
-            state.logs.append("Step 3.5: Summarizing dictionary evidence...")
-            for w, raw_content in raw_dict_evidence.items():
-                state.dict_evidence[w] = self._summarize_dictionary_entry(w, raw_content)
+    def glossary_addendum(self, glossary_matches: dict[str, str]) -> str:
+        """
+        System-prompt addendum enforcing glossary terms ("" without matches).
+        """
+        if not glossary_matches:
+            return ""
+        entries = [f"- {term}: {defn}" for term, defn in glossary_matches.items()]
+        return GLOSSARY_SYSTEM_ADDENDUM.format(glossary_content="\n".join(entries))
 
-        # ----------------------------------------------------
-        # Step 4: Revision
-        # ----------------------------------------------------
-        state.logs.append("Step 4: Revising translation...")
+    def draft_messages(self, src_text: str, few_shot_text: str | None = None, glossary_text: str = "") -> list:
+        """
+        Step 1 prompt. Without few-shot examples it is the plain baseline prompt.
+        """
+        base_system = BASELINE_SYSTEM
+        if few_shot_text:
+            base_system = (
+                FEW_SHOT_SYSTEM
+                + "\n\n=== REFERENCE EXAMPLES (STYLE GUIDE) ===\n"
+                + few_shot_text
+            )
+
+        # Inject glossary constraints at the end to increase weight
+        return [
+            {"role": "system", "content": base_system + glossary_text},
+            {"role": "user", "content": f"Translate this Sanskrit text to English:\n{src_text}"},
+        ]
 
+    def evidence_text(self, morph_evidence: dict[str, str], dict_evidence: dict[str, str]) -> str:
+        """
+        STRUCTURED EVIDENCE block of the revision prompt ("" when there is none).
+        """
         evidence_lines: list[str] = []
 
-        if use_grammar and morph_evidence:
+        if morph_evidence:
             evidence_lines.append("--- Morphological Analysis ---")
             for w, info in morph_evidence.items():
                 evidence_lines.append(f"Token '{w}': {info}")
 
-        if use_dict and state.dict_evidence:
+        if dict_evidence:
             evidence_lines.append("\n--- Dictionary Definitions ---")
-            for w, summary in state.dict_evidence.items():
+            for w, summary in dict_evidence.items():
                 evidence_lines.append(f"Term '{w}':\n{summary}")
 
-        full_evidence_text = "\n".join(evidence_lines)
+        return "\n".join(evidence_lines)
 
-        # If no evidence collected, return draft as final
-        if not full_evidence_text.strip():
-            state.logs.append("No evidence collected. Skipping revision.")
-            state.final_translation = state.draft_translation
-        else:
-            revision_prompt = f"""
+    def revision_messages(self, src_text: str, draft: str, evidence_text: str, glossary_text: str = "") -> list:
+        """
+        Step 4 prompt: correct the draft with the evidence.
+        """
+        revision_prompt = f"""
 Original Text: {src_text}
-Draft Translation: {state.draft_translation}
+Draft Translation: {draft}
 
 STRUCTURED EVIDENCE:
-{full_evidence_text}
+{evidence_text}
 
 Task:
 1) Use the STRUCTURED EVIDENCE to correct the draft.
 2) Output ONLY the REVISED English translation.
 """.strip()
 
-            # Re-emphasize glossary during revision to prevent overwriting required terms
-            rev_msgs = [
-                {"role": "system", "content": AGENT_REVISION_SYSTEM + glossary_text},
-                {"role": "user", "content": revision_prompt},
-            ]
-
-            raw_final = self.llm.generate(rev_msgs)
-            state.final_translation = self._clean_response(raw_final)
+        # Re-emphasize glossary during revision to prevent overwriting required terms
+        return [
+            {"role": "system", "content": AGENT_REVISION_SYSTEM + glossary_text},
+            {"role": "user", "content": revision_prompt},
+        ]
 
-        # ----------------------------------------------------
-        # Save Result
-        # ----------------------------------------------------
+    @staticmethod
+    def mode_name(use_grammar: bool, use_dict: bool, few_shot: bool, use_glossary: bool) -> str:
+        """
+        `translations.mode` label of a pipeline configuration.
+        """
         if use_dict and use_grammar:
             mode_str = "agent_full"
         elif use_dict:
@@ -237,34 +354,138 @@ Task:
         else:
             mode_str = "agent_baseline_fallback"
 
-        if few_shot_text:
+        if few_shot:
             mode_str += "_fewshot"
         if use_glossary:
             mode_str += "_glossary"
+        return mode_str
+
+    def run(
+        self,
+        src_text: str,
+        use_grammar: bool = True,
+        use_dict: bool = True,
+        few_shot_text: str | None = None,
+        use_glossary: bool = False,
+    ) -> AgentState:
+        """
+        Run the translation pipeline.
+
+        Args:
+            src_text: Sanskrit input text.
+            use_grammar: Enable morphology/grammar lookup.
+            use_dict: Enable dictionary lookup.
+            few_shot_text: Optional few-shot examples to guide style.
+            use_glossary: Enable glossary constraints (terminology enforcement).
+
+        Returns:
+            AgentState with draft/final translations, logs and per-stage timings (seconds).
+        """
+        run_id = str(uuid4())
+        state = AgentState(src_text=src_text)
+        run_start = time.perf_counter()
+
+        # ----------------------------------------------------
+        # Tool stage (Steps 2-3) runs in the background: morphology and dictionary
+        # lookups only depend on the source text, not on the draft.
+        # ----------------------------------------------------
+        tool_future = self._tool_pool.submit(self._run_tool_stage, src_text, use_grammar, use_dict)
+
+        # ----------------------------------------------------
+        # Step 0: Glossary Lookup (Global Constraint)
+        # ----------------------------------------------------
+        glossary_text = ""
+        glossary_matches: dict[str, str] = {}
+
+        if use_glossary:
+            t0 = time.perf_counter()
+            glossary_matches = self.glossary_tool.run(src_text)
+            state.timings["glossary"] = time.perf_counter() - t0
+            if glossary_matches:
+                glossary_text = self.glossary_addendum(glossary_matches)
+                state.logs.append(f"Step 0: Glossary applied for {len(glossary_matches)} terms.")
+            else:
+                state.logs.append("Step 0: Glossary enabled but no terms found.")
+
+        # ----------------------------------------------------
+        # Step 1: Draft Translation (decoded while the tool stage runs)
+        # ----------------------------------------------------
+        state.logs.append("Step 1: Generating draft translation...")
+
+        if few_shot_text:
+            state.logs.append("Step 1: Using few-shot context.")
+        draft_messages = self.draft_messages(src_text, few_shot_text, glossary_text)
+
+        t0 = time.perf_counter()
+        raw_draft = self.llm.generate(draft_messages)
+        state.draft_translation = self._clean_response(raw_draft)
+        state.timings["draft"] = time.perf_counter() - t0
+
+        # ----------------------------------------------------
+        # Join the tool stage before revision
+        # ----------------------------------------------------
+        t0 = time.perf_counter()
+        morph_evidence, raw_dict_evidence, tool_logs, tool_timings = tool_future.result()
+        state.timings["tools_wait"] = time.perf_counter() - t0
+        state.timings.update(tool_timings)
+        state.logs.extend(tool_logs)
 
+        # ----------------------------------------------------
+        # Step 3.5: Summarization
+        # ----------------------------------------------------
+        state.dict_evidence = {}
+
+        if use_dict and raw_dict_evidence:
+            state.logs.append("Step 3.5: Summarizing dictionary evidence...")
+            t0 = time.perf_counter()
+            state.dict_evidence = self.summarize_dictionary_entries(raw_dict_evidence)
+            state.timings["summaries"] = time.perf_counter() - t0
+
+        # ----------------------------------------------------
+        # Step 4: Revision
+        # ----------------------------------------------------
+        state.logs.append("Step 4: Revising translation...")
+
+        full_evidence_text = self.evidence_text(
+            morph_evidence if use_grammar else {},
+            state.dict_evidence if use_dict else {},
+        )
+
+        # If no evidence collected, return draft as final
+        if not full_evidence_text.strip():
+            state.logs.append("No evidence collected. Skipping revision.")
+            state.final_translation = state.draft_translation
+        else:
+            rev_msgs = self.revision_messages(src_text, state.draft_translation, full_evidence_text, glossary_text)
+
+            t0 = time.perf_counter()
+            raw_final = self.llm.generate(rev_msgs)
+            state.final_translation = self._clean_response(raw_final)
+            state.timings["revision"] = time.perf_counter() - t0
+
+        state.timings["total"] = time.perf_counter() - run_start
+
+        # ----------------------------------------------------
+        # Save Result
+        # ----------------------------------------------------
+        mode_str = self.mode_name(use_grammar, use_dict, bool(few_shot_text), use_glossary)
         self._save_result(run_id, state, morph_evidence, mode_str)
         return state
 
     def _save_result(self, run_id: str, state: AgentState, morph_evidence: dict, mode_str: str) -> None:
         """
-        Persist the run result into DuckDB.
+        Queue the run result for the background `translations` writer.
         """
-        try:
-            con = get_db_connection()
+        if self.translation_log is None:
+            return
 
-            combined_evidence = {
-                "morphology": morph_evidence,
-                "dictionary_summary": state.dict_evidence,
-            }
+        combined_evidence = {
+            "morphology": morph_evidence,
+            "dictionary_summary": state.dict_evidence,
+        }
 
-            con.execute(
-                """
-                INSERT INTO translations (
-                    run_id, timestamp, mode, src_text, final_text,
-                    tool_calls_json, step_summaries_json
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
+        try:
+            self.translation_log.submit(
                 (
                     run_id,
                     datetime.now(),
@@ -273,10 +494,7 @@ Task:
                     state.final_translation,
                     json.dumps(combined_evidence),
                     json.dumps(state.logs),
-                ),
+                )
             )
-
-            con.close()
-
         except Exception as e:
             print(f"Error saving to DB: {e}")
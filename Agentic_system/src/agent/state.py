@@ -8,4 +8,5 @@ class AgentState:
     uncertain_words: List[str] = field(default_factory=list)
     dict_evidence: Dict[str, str] = field(default_factory=dict)
     final_translation: str = ""
-    logs: List[str] = field(default_factory=list)
\ No newline at end of file
+    logs: List[str] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
@@ -2,7 +2,32 @@ import os
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).parent.parent
-DB_PATH = os.path.join(PROJECT_ROOT, "translation.duckdb")
+# Overridable so spawned processes (evaluation workers, tests) can open another database
+DB_PATH = os.environ.get("DB_PATH", os.path.join(PROJECT_ROOT, "translation.duckdb"))
+# Open the database read-only (several processes can then read it at once, e.g. extra
+# Streamlit servers or evaluation workers). Caches and result logs are not written.
+DB_READ_ONLY = os.environ.get("DB_READ_ONLY", "0") == "1"
 MODEL_PATH = os.path.join(PROJECT_ROOT, "models/Qwen2.5-7B-Instruct/")
+# GGUF chat model loaded by QwenLocalLLM (its hash is recorded with every evaluation run)
+GGUF_MODEL_PATH = os.path.join(PROJECT_ROOT, "models/Qwen2.5-7B-GGUF", "Qwen2.5-7B-Instruct-Q4_K_M.gguf")
+
+# Number of llama.cpp contexts used for batched generation (QwenLocalLLM.generate_batch).
+# Each extra context costs its own KV cache (~0.5GB) and gets an equal share of the
+# CPU threads; set LLM_N_PARALLEL=1 on laptops short of memory.
+LLM_N_PARALLEL = int(os.environ.get("LLM_N_PARALLEL", "2"))
+
+# Size limit of the persistent LLM response cache (llm_cache table), in MB.
+LLM_CACHE_MAX_MB = int(os.environ.get("LLM_CACHE_MAX_MB", "512"))
+
+# Default few-shot retrieval index: "bm25", "minhash" or "dense" (see src/retrieval/examples.py)
+RAG_ENGINE = os.environ.get("RAG_ENGINE", "bm25")
+
+# GGUF model for the "dense" retrieval engine. Defaults to the Qwen chat model in
+# embedding mode; a dedicated multilingual embedding model (e.g. bge-m3) is smaller,
+# faster and usually retrieves better.
+EMBED_MODEL_PATH = os.environ.get(
+    "EMBED_MODEL_PATH",
+    GGUF_MODEL_PATH,
+)
 
 os.makedirs(os.path.join(PROJECT_ROOT, "outputs"), exist_ok=True)
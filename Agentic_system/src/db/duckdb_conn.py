@@ -1,10 +1,104 @@
+import os
+import threading
+from contextlib import contextmanager
+
 import duckdb
-from src.config import DB_PATH
+from src.config import DB_PATH, DB_READ_ONLY
+
+# One DuckDB database instance per process; callers get cursors on it.
+# Opening the file is the expensive part (and takes the file lock), a cursor is cheap
+# and safe to use from its own thread.
+_db: duckdb.DuckDBPyConnection | None = None
+_db_pid: int | None = None
+# Bumped whenever the instance is (re)opened, so thread-local cursors on an old one are dropped
+_db_generation = 0
+_db_lock = threading.Lock()
+
+# Single writer per process: concurrent write transactions from several Streamlit
+# sessions would otherwise abort each other with DuckDB write-write conflicts.
+_write_lock = threading.RLock()
+
+_local = threading.local()
+
+
+def _get_db() -> duckdb.DuckDBPyConnection:
+    global _db, _db_pid, _db_generation
+    with _db_lock:
+        # A forked child must not reuse the parent's handle
+        if _db is None or _db_pid != os.getpid():
+            _db = duckdb.connect(DB_PATH, read_only=DB_READ_ONLY)
+            _db_pid = os.getpid()
+            _db_generation += 1
+        return _db
+
+
+def is_read_only() -> bool:
+    """
+    True when the process opened the database read-only (DB_READ_ONLY=1).
+    Optional writes (caches, result logs) are skipped in that mode.
+    """
+    return DB_READ_ONLY
 
 
 def get_db_connection():
     """
-    Get a DuckDB database connection.
+    Get a DuckDB cursor on the process-wide database instance.
+
+    The cursor is owned by the caller; `close()` only closes the cursor,
+    not the database.
+    """
+    return _get_db().cursor()
+
+
+def get_read_cursor():
+    """
+    Get this thread's cached cursor for read queries (tool lookups).
+
+    Do not close it; it is reused by later calls on the same thread.
+    """
+    db = _get_db()
+    cursor = getattr(_local, "cursor", None)
+    if cursor is None or getattr(_local, "generation", None) != _db_generation:
+        cursor = db.cursor()
+        _local.cursor = cursor
+        _local.generation = _db_generation
+    return cursor
+
+
+@contextmanager
+def db_writer():
+    """
+    Context manager yielding a cursor for writes, serialized across threads.
+
+        with db_writer() as con:
+            con.execute("INSERT ...")
+
+    Statements run inside one transaction, committed on exit (rolled back on error).
+    """
+    if DB_READ_ONLY:
+        raise RuntimeError(f"Database {DB_PATH} is opened read-only (DB_READ_ONLY=1).")
+
+    with _write_lock:
+        con = _get_db().cursor()
+        try:
+            con.begin()
+            yield con
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        finally:
+            con.close()
+
+
+def close_db() -> None:
+    """
+    Close the process-wide instance and release the file lock
+    (e.g. at the end of an ingestion script).
     """
-    con = duckdb.connect(DB_PATH)
-    return con
+    global _db, _db_pid
+    with _db_lock:
+        if _db is not None and _db_pid == os.getpid():
+            _db.close()
+        _db = None
+        _db_pid = None
@@ -0,0 +1,122 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+
+from src.config import PROJECT_ROOT
+from src.db.duckdb_conn import get_db_connection, db_writer, is_read_only
+from src.db.schema import INGEST_MANIFEST_SQL
+
+
+def manifest_key(path) -> str:
+    """
+    Manifest path: relative to the project root when possible, so the table
+    survives moving the checkout.
+    """
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(Path(PROJECT_ROOT).resolve()).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def file_sha256(path, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class FileState:
+    """
+    Fingerprint of one source file and whether it differs from the manifest.
+    """
+    path: Path
+    key: str
+    size: int
+    mtime: float
+    sha256: str | None
+    changed: bool
+
+
+def check_files(paths) -> list[FileState]:
+    """
+    Compare files against `ingest_manifest`.
+
+    Size + mtime equal to the manifest -> unchanged without reading the file.
+    Otherwise the content hash decides (a `touch` or re-copy is not a change).
+    """
+    paths = [Path(p) for p in paths]
+    keys = [manifest_key(p) for p in paths]
+
+    known: dict[str, tuple] = {}
+    if keys:
+        con = get_db_connection()
+        try:
+            placeholders = ",".join(["?"] * len(keys))
+            rows = con.execute(
+                f"SELECT path, size, mtime, sha256 FROM ingest_manifest WHERE path IN ({placeholders})",
+                keys,
+            ).fetchall()
+            known = {row[0]: row[1:] for row in rows}
+        except duckdb.CatalogException:
+            # Database created before the manifest existed: every file counts as new
+            known = {}
+        finally:
+            con.close()
+
+    states, touched = [], []
+    for path, key in zip(paths, keys):
+        stat = os.stat(path)
+        previous = known.get(key)
+        if previous is not None and (previous[0], previous[1]) == (stat.st_size, stat.st_mtime):
+            states.append(FileState(path, key, stat.st_size, stat.st_mtime, previous[2], changed=False))
+            continue
+
+        sha256 = file_sha256(path)
+        changed = previous is None or previous[2] != sha256
+        states.append(FileState(path, key, stat.st_size, stat.st_mtime, sha256, changed=changed))
+        if not changed:
+            touched.append((stat.st_size, stat.st_mtime, key))
+
+    # Same content, new mtime: remember it so the next check skips hashing again
+    if touched and not is_read_only():
+        with db_writer() as con:
+            con.executemany("UPDATE ingest_manifest SET size = ?, mtime = ? WHERE path = ?", touched)
+    return states
+
+
+def record_files(con, states: list[FileState], target: str, n_rows: int | None = None) -> None:
+    """
+    Store the fingerprints after a successful load. Pass the writer cursor used
+    for the load so rows and manifest commit together.
+    """
+    now = datetime.now()
+    con.execute(INGEST_MANIFEST_SQL)
+    con.executemany(
+        "INSERT OR REPLACE INTO ingest_manifest (path, target, size, mtime, sha256, n_rows, ingested_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(s.key, target, s.size, s.mtime, s.sha256, n_rows, now) for s in states],
+    )
+
+
+def manifest_paths(target: str) -> list[str]:
+    """
+    Manifest paths recorded for one target table.
+    """
+    con = get_db_connection()
+    try:
+        return [r[0] for r in con.execute("SELECT path FROM ingest_manifest WHERE target = ?", [target]).fetchall()]
+    finally:
+        con.close()
+
+
+def forget_files(con, keys: list[str]) -> None:
+    if keys:
+        placeholders = ",".join(["?"] * len(keys))
+        con.execute(f"DELETE FROM ingest_manifest WHERE path IN ({placeholders})", keys)
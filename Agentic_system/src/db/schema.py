@@ -8,8 +8,12 @@ CREATE TABLE IF NOT EXISTS mw_lexicon (
     lemma VARCHAR,       -- Headword (e.g., dharma)
     gloss VARCHAR,       -- Definition / gloss text
     raw_xml VARCHAR,     -- Original XML (preserved formatting)
-    source VARCHAR DEFAULT 'MW'
+    source VARCHAR DEFAULT 'MW',
+    lemma_key VARCHAR    -- Canonical SLP1 lookup key (src/tools/transliteration.py)
 );
+-- Older databases: MW key1 is already SLP1, so the key equals the headword
+ALTER TABLE mw_lexicon ADD COLUMN IF NOT EXISTS lemma_key VARCHAR;
+UPDATE mw_lexicon SET lemma_key = lemma WHERE lemma_key IS NULL;
 
 -- 2. Morphological / grammatical analysis table (Ambuda)
 -- Used to map inflected forms back to their base lemma.
@@ -17,8 +21,15 @@ CREATE TABLE IF NOT EXISTS morph_analysis (
     word VARCHAR,        -- Inflected form (e.g., sPuratu)
     lemma VARCHAR,       -- Base form / lemma (e.g., sPur)
     pos_tag VARCHAR,     -- POS / morphological tags (e.g., pos=v,p=3...)
-    sent_id VARCHAR      -- Source sentence ID
+    sent_id VARCHAR,     -- Source sentence ID
+    word_key VARCHAR,    -- Canonical SLP1 lookup key, built at ingest time
+    text_name VARCHAR    -- Source file (e.g., 'amarushatakam'), for per-text re-ingestion
 );
+-- Older databases: Ambuda forms are already SLP1, so the key equals the word
+ALTER TABLE morph_analysis ADD COLUMN IF NOT EXISTS word_key VARCHAR;
+UPDATE morph_analysis SET word_key = word WHERE word_key IS NULL;
+ALTER TABLE morph_analysis ADD COLUMN IF NOT EXISTS text_name VARCHAR;
+CREATE INDEX IF NOT EXISTS idx_morph_word_key ON morph_analysis (word_key);
 
 -- 3. Dataset table (e.g., MKB Testset)
 CREATE TABLE IF NOT EXISTS dataset_items (
@@ -38,4 +49,325 @@ CREATE TABLE IF NOT EXISTS translations (
     tool_calls_json JSON,
     step_summaries_json JSON
 );
+
+"""
+
+LLM_CACHE_SQL = """
+-- 5. LLM response cache (content-addressed, see src/llm/response_cache.py)
+CREATE TABLE IF NOT EXISTS llm_cache (
+    cache_key VARCHAR PRIMARY KEY, -- sha256(model, messages, sampling params)
+    model_id VARCHAR,
+    response VARCHAR,
+    size_bytes INTEGER,
+    created_at TIMESTAMP,
+    last_used_at TIMESTAMP,
+    hit_count INTEGER DEFAULT 0
+);
+"""
+
+MW_SUMMARY_SQL = """
+-- 6. Precomputed dictionary summaries (see scripts/build_mw_summaries.py)
+CREATE TABLE IF NOT EXISTS mw_summary (
+    lemma VARCHAR PRIMARY KEY, -- MW headword as matched by DictionaryLookupTool
+    summary VARCHAR,           -- DICT_SUMMARY_SYSTEM output
+    source VARCHAR,            -- 'offline' (batch job) or 'online' (agent fallback)
+    created_at TIMESTAMP
+);
+"""
+
+# Materialized, frequency-ranked morphology index (rebuilt after each Ambuda ingest).
+# One row per distinct (word_key, lemma, pos_tag) with its corpus frequency, stored
+# sorted by word_key so lookups touch a small, clustered table.
+MORPH_INDEX_SQL = """
+CREATE OR REPLACE TABLE morph_index AS
+SELECT
+    word_key,
+    min(word) AS word,   -- representative surface form
+    lemma,
+    pos_tag,
+    count(*) AS freq     -- occurrences across all Ambuda files
+FROM morph_analysis
+WHERE word_key IS NOT NULL
+GROUP BY word_key, lemma, pos_tag
+ORDER BY word_key, freq DESC, lemma, pos_tag;
+
+CREATE INDEX IF NOT EXISTS idx_morph_index_word_key ON morph_index (word_key);
+"""
+
+GLOSSARY_SQL = """
+-- 7. Terminology glossary (loaded from data/glossary on the Evaluate page)
+CREATE TABLE IF NOT EXISTS glossary (
+    term VARCHAR,        -- Display form (e.g., 'Abhava padartha')
+    definition VARCHAR,
+    source VARCHAR,
+    page INTEGER,
+    term_key VARCHAR     -- Diacritic-insensitive key (transliteration.loose_key)
+);
+ALTER TABLE glossary ADD COLUMN IF NOT EXISTS term_key VARCHAR;
+"""
+
+INGEST_CHECKPOINT_SQL = """
+-- 8. Progress of chunked source ingestion (see scripts/ingest_all.py)
+CREATE TABLE IF NOT EXISTS ingest_checkpoint (
+    source VARCHAR,        -- e.g. 'mw.xml'
+    chunk_id INTEGER,
+    start_offset BIGINT,   -- byte range of the chunk in the source file
+    end_offset BIGINT,
+    file_size BIGINT,      -- source file signature the chunk was read from
+    file_mtime DOUBLE,
+    n_rows INTEGER,
+    finished_at TIMESTAMP,
+    PRIMARY KEY (source, chunk_id)
+);
+"""
+
+INGEST_MANIFEST_SQL = """
+-- 9. Source files already ingested (see src/db/manifest.py)
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+    path VARCHAR PRIMARY KEY, -- relative to the project root
+    target VARCHAR,           -- table the file was loaded into
+    size BIGINT,
+    mtime DOUBLE,
+    sha256 VARCHAR,
+    n_rows INTEGER,
+    ingested_at TIMESTAMP
+);
+"""
+
+RAG_INDEX_SQL = """
+-- 10. BM25 retrieval index over dataset_items sources (see src/retrieval/bm25.py)
+CREATE TABLE IF NOT EXISTS rag_datasets (
+    dataset_name VARCHAR PRIMARY KEY,
+    fingerprint VARCHAR, -- dataset_items contents the postings were built from
+    n_docs INTEGER,
+    built_at TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS rag_docs (
+    dataset_name VARCHAR,
+    item_id INTEGER,
+    doc_len INTEGER,     -- number of character n-grams in src_text
+    src_md5 VARCHAR      -- md5 of the normalized source, to skip exact duplicates of a query
+);
+CREATE TABLE IF NOT EXISTS rag_postings (
+    dataset_name VARCHAR,
+    term VARCHAR,        -- character n-gram
+    item_id INTEGER,
+    tf INTEGER           -- occurrences of the n-gram in src_text
+);
+"""
+
+RAG_MINHASH_SQL = """
+-- 11. MinHash LSH buckets over dataset_items sources (see src/retrieval/minhash.py)
+CREATE TABLE IF NOT EXISTS rag_minhash_docs (
+    dataset_name VARCHAR,
+    item_id INTEGER,
+    src_md5 VARCHAR,     -- source the buckets were computed from (incremental updates)
+    signature BLOB       -- NUM_PERM little-endian uint64 minima
+);
+CREATE TABLE IF NOT EXISTS rag_minhash (
+    dataset_name VARCHAR,
+    bucket BIGINT,       -- hash of one band of the signature (band number mixed in)
+    item_id INTEGER
+);
 """
+
+RAG_VECTORS_SQL = """
+-- 12. Dense embedding index over dataset_items sources (see src/retrieval/dense.py)
+CREATE TABLE IF NOT EXISTS rag_vector_sets (
+    dataset_name VARCHAR,
+    model VARCHAR,       -- embedding model tag (vectors of different models are not comparable)
+    path VARCHAR,        -- float16 .npy matrix, memory-mapped at query time (relative to the project root)
+    dim INTEGER,
+    fingerprint VARCHAR, -- dataset_items contents the vectors were built from
+    built_at TIMESTAMP,
+    PRIMARY KEY (dataset_name, model)
+);
+CREATE TABLE IF NOT EXISTS rag_vectors (
+    dataset_name VARCHAR,
+    model VARCHAR,
+    item_id INTEGER,
+    vec_row INTEGER,     -- row of the item in the matrix
+    src_md5 VARCHAR      -- source the vector was computed from (reused when unchanged)
+);
+"""
+
+RAG_NEIGHBORS_SQL = """
+-- 13. Precomputed few-shot neighbours for the evaluation splits (see src/retrieval/neighbors.py)
+CREATE TABLE IF NOT EXISTS rag_neighbor_sets (
+    dataset_name VARCHAR,
+    strategy VARCHAR,    -- 'loo' (leave-one-out) or 'half' (1st half searched in the 2nd)
+    engine VARCHAR,      -- retrieval engine (bm25 / minhash / dense)
+    k INTEGER,           -- neighbours stored per item
+    fingerprint VARCHAR, -- dataset_items contents the neighbours were computed from
+    built_at TIMESTAMP,
+    PRIMARY KEY (dataset_name, strategy, engine)
+);
+CREATE TABLE IF NOT EXISTS rag_neighbors (
+    dataset_name VARCHAR,
+    strategy VARCHAR,
+    engine VARCHAR,
+    item_id INTEGER,     -- query item
+    nb_rank INTEGER,     -- 0 = most similar
+    neighbor_id INTEGER,
+    score DOUBLE
+);
+"""
+
+EVAL_SQL = """
+-- 14. Evaluation runs (see src/eval/runner.py); results are written per item, so runs resume
+CREATE TABLE IF NOT EXISTS eval_runs (
+    run_id VARCHAR PRIMARY KEY, -- hash of the config and the dataset contents
+    dataset_name VARCHAR,
+    mode VARCHAR,
+    config_json VARCHAR,        -- EvalConfig.normalized() (options the run ignores are null)
+    n_items INTEGER,            -- selected test items
+    created_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    seed INTEGER,               -- sampling / static few-shot seed (NULL when unused)
+    model_name VARCHAR,         -- translation model file
+    model_hash VARCHAR,         -- model fingerprint (src/eval/run_store.py)
+    sweep BOOLEAN DEFAULT FALSE -- items translated by an ablation sweep (src/eval/sweep.py), whose
+                                -- stage timings are shared by all its modes: left out of timing views
+);
+CREATE TABLE IF NOT EXISTS eval_results (
+    run_id VARCHAR,
+    item_id INTEGER,
+    seq INTEGER,                -- position in the run's test set
+    src_text VARCHAR,
+    ref_text VARCHAR,
+    hyp_text VARCHAR,
+    bleu DOUBLE,                -- sentence BLEU
+    chrf DOUBLE,                -- sentence chrF++
+    context_text VARCHAR,       -- few-shot context used
+    glossary_text VARCHAR,      -- glossary matches used
+    created_at TIMESTAMP,
+    timings_json VARCHAR,       -- per-stage seconds ({"draft": .., "revision": .., "total": ..})
+    PRIMARY KEY (run_id, item_id)
+);
+-- Per-item sufficient statistics (see src/eval/metrics.py): corpus scores and
+-- bootstrap tests are sums of these rows, without re-tokenizing the hypotheses
+CREATE TABLE IF NOT EXISTS eval_item_stats (
+    run_id VARCHAR,
+    item_id INTEGER,
+    bleu_stats INTEGER[],       -- [hyp_len, ref_len, correct_1..4, total_1..4]
+    chrf_stats INTEGER[],       -- [hyp, ref, match] per chrF++ n-gram order
+    PRIMARY KEY (run_id, item_id)
+);
+-- Older databases
+ALTER TABLE eval_runs ADD COLUMN IF NOT EXISTS seed INTEGER;
+ALTER TABLE eval_runs ADD COLUMN IF NOT EXISTS model_name VARCHAR;
+ALTER TABLE eval_runs ADD COLUMN IF NOT EXISTS model_hash VARCHAR;
+ALTER TABLE eval_runs ADD COLUMN IF NOT EXISTS sweep BOOLEAN DEFAULT FALSE;
+ALTER TABLE eval_results ADD COLUMN IF NOT EXISTS timings_json VARCHAR;
+
+-- One row per evaluated item with its run's settings (the query surface of src/eval/run_store.py)
+CREATE OR REPLACE VIEW eval_items AS
+SELECT
+    r.run_id, r.dataset_name, r.mode, left(r.mode, 1) AS mode_key, r.seed, r.model_name, r.model_hash,
+    coalesce(r.sweep, FALSE) AS sweep,
+    i.item_id, i.seq, i.src_text, i.ref_text, i.hyp_text, i.bleu, i.chrf,
+    i.context_text, i.glossary_text, i.timings_json,
+    CASE WHEN NOT coalesce(r.sweep, FALSE) THEN TRY_CAST(i.timings_json ->> 'total' AS DOUBLE) END AS seconds,
+    s.bleu_stats, s.chrf_stats, i.created_at
+FROM eval_results i
+JOIN eval_runs r ON r.run_id = i.run_id
+LEFT JOIN eval_item_stats s ON s.run_id = i.run_id AND s.item_id = i.item_id;
+
+-- Corpus BLEU / chrF++ of every run from the summed item statistics
+-- (same values as sacrebleu corpus_bleu / corpus_chrf(word_order=2))
+CREATE OR REPLACE VIEW eval_run_scores AS
+WITH bleu_sums AS (
+    SELECT run_id, i, sum(v) AS v
+    FROM (SELECT run_id, unnest(bleu_stats) AS v, generate_subscripts(bleu_stats, 1) AS i FROM eval_item_stats)
+    GROUP BY ALL
+),
+bleu_orders AS (
+    -- stats: 1 hyp_len, 2 ref_len, 3-6 correct n-grams, 7-10 total n-grams
+    SELECT c.run_id, c.i - 2 AS n, c.v AS correct, t.v AS total,
+           bool_and(t.v > 0) OVER w AS active,
+           sum(CASE WHEN c.v = 0 AND t.v > 0 THEN 1 ELSE 0 END) OVER w AS zeros
+    FROM bleu_sums c JOIN bleu_sums t ON t.run_id = c.run_id AND t.i = c.i + 4
+    WHERE c.i BETWEEN 3 AND 6
+    WINDOW w AS (PARTITION BY c.run_id ORDER BY c.i ROWS UNBOUNDED PRECEDING)
+),
+bleu AS (
+    SELECT o.run_id,
+           CASE WHEN max(o.correct) = 0 THEN 0.0 ELSE
+               any_value(CASE WHEN l.sys_len >= l.ref_len THEN 1.0 WHEN l.sys_len > 0 THEN exp(1 - l.ref_len / l.sys_len) ELSE 0.0 END)
+               * exp(sum(CASE
+                   WHEN NOT o.active THEN -9999999999
+                   WHEN o.correct = 0 THEN ln(100.0 / (pow(2, o.zeros) * o.total))  -- "exp" smoothing
+                   ELSE ln(100.0 * o.correct / o.total) END) / 4)
+           END AS corpus_bleu
+    FROM bleu_orders o
+    JOIN (SELECT run_id, max(v) FILTER (i = 1) AS sys_len, max(v) FILTER (i = 2) AS ref_len FROM bleu_sums GROUP BY run_id) l
+      ON l.run_id = o.run_id
+    GROUP BY o.run_id
+),
+chrf_orders AS (
+    -- stats: [hyp, ref, match] per order (6 character + 2 word n-gram orders)
+    SELECT run_id, (i - 1) // 3 AS n,
+           sum(v) FILTER ((i - 1) % 3 = 0) AS n_hyp,
+           sum(v) FILTER ((i - 1) % 3 = 1) AS n_ref,
+           sum(v) FILTER ((i - 1) % 3 = 2) AS n_match
+    FROM (SELECT run_id, unnest(chrf_stats) AS v, generate_subscripts(chrf_stats, 1) AS i FROM eval_item_stats)
+    GROUP BY ALL
+),
+chrf AS (
+    SELECT run_id,
+           coalesce(avg(n_match / n_hyp) FILTER (n_hyp > 0 AND n_ref > 0), 0) AS p,
+           coalesce(avg(n_match / n_ref) FILTER (n_hyp > 0 AND n_ref > 0), 0) AS r
+    FROM chrf_orders GROUP BY run_id
+)
+SELECT
+    r.run_id, r.dataset_name, r.mode, left(r.mode, 1) AS mode_key, r.seed, r.model_name, r.model_hash,
+    coalesce(r.sweep, FALSE) AS sweep,
+    r.n_items, count(i.item_id) AS n_done, r.created_at, r.finished_at,
+    any_value(b.corpus_bleu) AS corpus_bleu,
+    any_value(CASE WHEN c.p + c.r > 0 THEN 100 * 5 * c.p * c.r / (4 * c.p + c.r) ELSE 0.0 END) AS corpus_chrf,
+    avg(i.bleu) AS mean_bleu,
+    avg(i.chrf) AS mean_chrf,
+    CASE WHEN NOT coalesce(r.sweep, FALSE) THEN avg(TRY_CAST(i.timings_json ->> 'total' AS DOUBLE)) END AS mean_seconds
+FROM eval_runs r
+LEFT JOIN eval_results i ON i.run_id = r.run_id
+LEFT JOIN bleu b ON b.run_id = r.run_id
+LEFT JOIN chrf c ON c.run_id = r.run_id
+GROUP BY r.run_id, r.dataset_name, r.mode, r.seed, r.model_name, r.model_hash, r.sweep, r.n_items, r.created_at, r.finished_at;
+"""
+
+# Work queue of parallel evaluation runs (see src/eval/parallel.py). Lives in its own
+# file, outputs/eval_queue.duckdb, owned by the coordinator process while the workers
+# hold the main database open read-only.
+EVAL_QUEUE_SQL = """
+CREATE TABLE IF NOT EXISTS eval_units (
+    run_id VARCHAR,
+    unit_id INTEGER,
+    seqs INTEGER[],             -- positions in the run's test set
+    status VARCHAR,             -- 'pending', 'claimed' or 'done'
+    worker INTEGER,
+    claimed_at TIMESTAMP,
+    done_at TIMESTAMP,
+    PRIMARY KEY (run_id, unit_id)
+);
+CREATE TABLE IF NOT EXISTS eval_unit_results (
+    run_id VARCHAR,
+    item_id INTEGER,
+    seq INTEGER,
+    src_text VARCHAR,
+    ref_text VARCHAR,
+    hyp_text VARCHAR,
+    bleu DOUBLE,
+    chrf DOUBLE,
+    context_text VARCHAR,
+    glossary_text VARCHAR,
+    created_at TIMESTAMP,
+    timings_json VARCHAR,
+    PRIMARY KEY (run_id, item_id)
+);
+ALTER TABLE eval_unit_results ADD COLUMN IF NOT EXISTS timings_json VARCHAR;
+"""
+
+INIT_SQL += (
+    LLM_CACHE_SQL + MW_SUMMARY_SQL + GLOSSARY_SQL + INGEST_CHECKPOINT_SQL + INGEST_MANIFEST_SQL
+    + RAG_INDEX_SQL + RAG_MINHASH_SQL + RAG_VECTORS_SQL + RAG_NEIGHBORS_SQL + EVAL_SQL
+)
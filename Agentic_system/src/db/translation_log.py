@@ -0,0 +1,177 @@
+import atexit
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.config import PROJECT_ROOT
+from src.db.duckdb_conn import db_writer, is_read_only
+
+TRANSLATION_COLUMNS = [
+    "run_id",
+    "timestamp",
+    "mode",
+    "src_text",
+    "final_text",
+    "tool_calls_json",
+    "step_summaries_json",
+]
+
+# Rows of batches that could not be written after all retries (JSON lines, TRANSLATION_COLUMNS keys)
+SPILL_PATH = Path(PROJECT_ROOT) / "outputs" / "translation_log_spill.jsonl"
+# Attempts per batch (e.g. transient write-write conflicts), with doubling waits in between
+WRITE_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 0.5
+
+
+class TranslationLogWriter:
+    """
+    Write-behind logger for the `translations` table.
+
+    `submit()` only enqueues a row; a background thread appends queued rows in
+    batches (every `batch_size` rows or `flush_interval` seconds, whichever comes
+    first) with one DataFrame insert, so persistence is off the translation path
+    and the table gets few, large appends instead of one row group per run.
+    Pending rows are flushed on `close()` and at interpreter exit.
+
+    A failed insert is retried with backoff; a batch that still fails is appended
+    to `spill_path` (`rows_spilled`), and only rows that cannot be spilled either
+    are lost (`rows_dropped`).
+    """
+
+    def __init__(self, batch_size: int = 64, flush_interval: float = 2.0, spill_path: str | Path = SPILL_PATH):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = Path(spill_path)
+        self.rows_written = 0
+        self.rows_spilled = 0
+        self.rows_dropped = 0
+
+        self._queue: queue.Queue = queue.Queue()
+        self._flush_requested = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._worker, name="translation-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Rows submitted but not written yet.
+        """
+        return self._queue.unfinished_tasks
+
+    def submit(self, row: tuple) -> None:
+        """
+        Queue one row (values in TRANSLATION_COLUMNS order).
+        """
+        if self._closed:
+            raise RuntimeError("TranslationLogWriter is closed.")
+        self._queue.put(row)
+        if self._queue.qsize() >= self.batch_size:
+            self._flush_requested.set()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Block until every row submitted so far is written (or `timeout` expires).
+        Returns True if the queue was drained.
+        """
+        self._flush_requested.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._flush_requested.set()
+            time.sleep(0.01)
+        return True
+
+    def close(self) -> None:
+        """
+        Flush pending rows and stop the background thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._flush_requested.set()
+        self._thread.join()
+
+    def _worker(self) -> None:
+        stop = False
+        while not stop:
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+
+            batch = []
+            while True:
+                try:
+                    row = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if row is None:
+                    stop = True
+                    self._queue.task_done()
+                else:
+                    batch.append(row)
+
+            if batch:
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _insert(self, batch: list[tuple]) -> None:
+        df = pd.DataFrame(batch, columns=TRANSLATION_COLUMNS)
+        with db_writer() as con:
+            con.register("translation_batch", df)
+            try:
+                con.execute(
+                    f"""
+                    INSERT INTO translations ({", ".join(TRANSLATION_COLUMNS)})
+                    SELECT {", ".join(TRANSLATION_COLUMNS)} FROM translation_batch
+                    """
+                )
+            finally:
+                con.unregister("translation_batch")
+
+    def _write(self, batch: list[tuple]) -> None:
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                self._insert(batch)
+                self.rows_written += len(batch)
+                return
+            except Exception as e:
+                error = e
+                if attempt + 1 < WRITE_ATTEMPTS:
+                    time.sleep(RETRY_BASE_SECONDS * 2 ** attempt)
+
+        print(f"Error saving {len(batch)} translations to DB after {WRITE_ATTEMPTS} attempts: {error}")
+        try:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for row in batch:
+                    f.write(json.dumps(dict(zip(TRANSLATION_COLUMNS, row)), ensure_ascii=False, default=str) + "\n")
+            self.rows_spilled += len(batch)
+            print(f"--> Saved them to {self.spill_path}")
+        except OSError as e:
+            self.rows_dropped += len(batch)
+            print(f"Error spilling translations to {self.spill_path}: {e}")
+
+
+_log: TranslationLogWriter | None = None
+_log_lock = threading.Lock()
+
+
+def get_translation_log() -> TranslationLogWriter | None:
+    """
+    Process-wide writer (None when the database is opened read-only).
+    """
+    global _log
+    if is_read_only():
+        return None
+    with _log_lock:
+        if _log is None:
+            _log = TranslationLogWriter()
+        return _log
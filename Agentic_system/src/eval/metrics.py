@@ -0,0 +1,298 @@
+from dataclasses import dataclass
+
+import duckdb
+import numpy as np
+import pandas as pd
+from sacrebleu.metrics import BLEU, CHRF
+
+from src.db.duckdb_conn import get_read_cursor, db_writer, is_read_only
+
+# sacrebleu defaults of corpus_bleu / corpus_chrf(word_order=2) (chrF++)
+MAX_NGRAM_ORDER = 4
+CHRF_CHAR_ORDER = 6
+CHRF_WORD_ORDER = 2
+CHRF_BETA = 2
+# Per-item sufficient statistics:
+# BLEU: [hyp_len, ref_len, correct_1..4, total_1..4]; chrF++: [hyp, ref, match] per n-gram order
+BLEU_STATS = 2 + 2 * MAX_NGRAM_ORDER
+CHRF_STATS = 3 * (CHRF_CHAR_ORDER + CHRF_WORD_ORDER)
+# Bootstrap resamples are summed in chunks of at most this many (resample, item) weights
+BOOTSTRAP_CHUNK = 4_000_000
+
+_bleu = BLEU()
+_chrf = CHRF(word_order=CHRF_WORD_ORDER)
+
+
+def item_stats(hyps: list[str], refs: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    BLEU and chrF++ sufficient statistics of each (hypothesis, reference) pair:
+    int64 arrays of shape (n, BLEU_STATS) and (n, CHRF_STATS).
+    This is the only step that tokenizes; every score below is computed from sums of rows.
+    """
+    if not hyps:
+        return np.zeros((0, BLEU_STATS), dtype=np.int64), np.zeros((0, CHRF_STATS), dtype=np.int64)
+    hyps = [h or "" for h in hyps]
+    bleu = np.asarray(_bleu._extract_corpus_statistics(hyps, [refs]), dtype=np.int64)
+    chrf = np.asarray(_chrf._extract_corpus_statistics(hyps, [refs]), dtype=np.int64)
+    return bleu, chrf
+
+
+def bleu_from_stats(stats: np.ndarray, effective_order: bool = False) -> np.ndarray:
+    """
+    BLEU of summed statistics (shape (..., BLEU_STATS)), vectorized over the leading axes.
+    Matches sacrebleu with "exp" smoothing; `effective_order=True` gives sentence BLEU.
+    """
+    stats = np.asarray(stats, dtype=np.float64)
+    sys_len, ref_len = stats[..., 0], stats[..., 1]
+    correct = stats[..., 2 : 2 + MAX_NGRAM_ORDER]
+    total = stats[..., 2 + MAX_NGRAM_ORDER :]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bp = np.where(sys_len < ref_len, np.where(sys_len > 0, np.exp(1 - ref_len / np.maximum(sys_len, 1)), 0.0), 1.0)
+
+        # Orders count until the first one without n-grams (sacrebleu stops there)
+        active = np.cumprod(total > 0, axis=-1).astype(bool)
+        # "exp" smoothing: the k-th zero-match order gets precision 100 / (2^k * total)
+        zero = active & (correct == 0)
+        smooth = np.power(2.0, np.cumsum(zero, axis=-1))
+        precisions = np.where(zero, 100.0 / (smooth * total), 100.0 * correct / total)
+        precisions = np.where(active, precisions, 0.0)
+        log_p = np.where(precisions > 0, np.log(np.where(precisions > 0, precisions, 1.0)), -9999999999.0)
+
+    if effective_order:
+        eff_order = np.maximum(active.sum(axis=-1), 1)
+        log_p = np.where(active, log_p, 0.0)
+    else:
+        eff_order = MAX_NGRAM_ORDER
+    score = bp * np.exp(log_p.sum(axis=-1) / eff_order)
+    return np.where(correct.any(axis=-1), score, 0.0)
+
+
+def chrf_from_stats(stats: np.ndarray) -> np.ndarray:
+    """
+    chrF++ of summed statistics (shape (..., CHRF_STATS)), vectorized over the leading axes.
+    Matches sacrebleu's effective-order averaging (eps_smoothing=False).
+    """
+    stats = np.asarray(stats, dtype=np.float64)
+    shape = stats.shape[:-1] + (CHRF_CHAR_ORDER + CHRF_WORD_ORDER, 3)
+    n_hyp, n_ref, n_match = np.moveaxis(stats.reshape(shape), -1, 0)
+
+    effective = (n_hyp > 0) & (n_ref > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prec = np.where(effective, n_match / n_hyp, 0.0)
+        rec = np.where(effective, n_match / n_ref, 0.0)
+        count = effective.sum(axis=-1)
+        avg_prec = np.where(count > 0, prec.sum(axis=-1) / np.maximum(count, 1), 0.0)
+        avg_rec = np.where(count > 0, rec.sum(axis=-1) / np.maximum(count, 1), 0.0)
+        factor = CHRF_BETA ** 2
+        denom = factor * avg_prec + avg_rec
+        score = np.where(denom > 0, 100 * (1 + factor) * avg_prec * avg_rec / np.where(denom > 0, denom, 1.0), 0.0)
+    return score
+
+
+def sentence_scores_from_stats(bleu_stats: np.ndarray, chrf_stats: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sentence BLEU and chrF++ of every row (same values as sacrebleu.sentence_bleu / sentence_chrf).
+    """
+    return bleu_from_stats(bleu_stats, effective_order=True), chrf_from_stats(chrf_stats)
+
+
+class CorpusStats:
+    """
+    Running corpus BLEU/chrF++: items are added as they finish, the corpus
+    scores are recomputed from the summed statistics in O(1).
+    """
+
+    def __init__(self):
+        self.bleu_sum = np.zeros(BLEU_STATS, dtype=np.int64)
+        self.chrf_sum = np.zeros(CHRF_STATS, dtype=np.int64)
+        self.n = 0
+
+    def add_stats(self, bleu_stats: np.ndarray, chrf_stats: np.ndarray) -> None:
+        bleu_stats = np.atleast_2d(bleu_stats)
+        self.bleu_sum += bleu_stats.sum(axis=0).astype(np.int64)
+        self.chrf_sum += np.atleast_2d(chrf_stats).sum(axis=0).astype(np.int64)
+        self.n += len(bleu_stats)
+
+    @property
+    def bleu(self) -> float:
+        return float(bleu_from_stats(self.bleu_sum))
+
+    @property
+    def chrf(self) -> float:
+        return float(chrf_from_stats(self.chrf_sum))
+
+
+@dataclass
+class RunStats:
+    """
+    Per-item statistics of a stored run, ordered by test-set position.
+    """
+    run_id: str
+    item_ids: np.ndarray
+    bleu: np.ndarray                     # (n, BLEU_STATS)
+    chrf: np.ndarray                     # (n, CHRF_STATS)
+
+    def corpus_scores(self) -> tuple[float, float]:
+        return float(bleu_from_stats(self.bleu.sum(axis=0))), float(chrf_from_stats(self.chrf.sum(axis=0)))
+
+    def aligned(self, other: "RunStats") -> tuple["RunStats", "RunStats"]:
+        """
+        Both runs restricted to their common items, in the same order.
+        """
+        common, a_idx, b_idx = np.intersect1d(self.item_ids, other.item_ids, return_indices=True)
+        return (
+            RunStats(self.run_id, common, self.bleu[a_idx], self.chrf[a_idx]),
+            RunStats(other.run_id, common, other.bleu[b_idx], other.chrf[b_idx]),
+        )
+
+
+def store_item_stats(con, run_id: str, item_ids: list[int], bleu: np.ndarray, chrf: np.ndarray) -> None:
+    """
+    Write per-item statistics of a run (inside a `db_writer` transaction).
+    """
+    if not len(item_ids):
+        return
+    df = pd.DataFrame({
+        "item_id": np.asarray(item_ids, dtype=np.int64),
+        "bleu_stats": [row.tolist() for row in bleu],
+        "chrf_stats": [row.tolist() for row in chrf],
+    })
+    con.register("eval_item_stats_batch", df)
+    try:
+        con.execute(
+            "INSERT OR REPLACE INTO eval_item_stats "
+            "SELECT ?, item_id, bleu_stats::INTEGER[], chrf_stats::INTEGER[] FROM eval_item_stats_batch",
+            [run_id],
+        )
+    finally:
+        con.unregister("eval_item_stats_batch")
+
+
+def load_run_stats(run_id: str) -> RunStats:
+    """
+    Per-item statistics of a stored run. Items stored without statistics (runs
+    from before they were recorded, merged parallel runs) are tokenized once and
+    written back when the database is writable.
+    """
+    con = get_read_cursor()
+    try:
+        rows = con.execute(
+            """
+            SELECT r.item_id, r.hyp_text, r.ref_text, s.bleu_stats, s.chrf_stats
+            FROM eval_results r
+            LEFT JOIN eval_item_stats s ON s.run_id = r.run_id AND s.item_id = r.item_id
+            WHERE r.run_id = ? ORDER BY r.seq
+            """,
+            [run_id],
+        ).fetchall()
+    except duckdb.CatalogException:
+        rows = []
+
+    item_ids = np.array([r[0] for r in rows], dtype=np.int64)
+    bleu = np.zeros((len(rows), BLEU_STATS), dtype=np.int64)
+    chrf = np.zeros((len(rows), CHRF_STATS), dtype=np.int64)
+    missing = [i for i, r in enumerate(rows) if r[3] is None or r[4] is None]
+    for i, r in enumerate(rows):
+        if r[3] is not None and r[4] is not None:
+            bleu[i], chrf[i] = r[3], r[4]
+
+    if missing:
+        m_bleu, m_chrf = item_stats([rows[i][1] for i in missing], [rows[i][2] for i in missing])
+        bleu[missing], chrf[missing] = m_bleu, m_chrf
+        if not is_read_only():
+            with db_writer() as writer:
+                store_item_stats(writer, run_id, item_ids[missing].tolist(), m_bleu, m_chrf)
+    return RunStats(run_id, item_ids, bleu, chrf)
+
+
+@dataclass
+class BootstrapResult:
+    """
+    Paired bootstrap comparison of one metric between runs A and B.
+    """
+    metric: str
+    score_a: float
+    score_b: float
+    mean_a: float                        # bootstrap mean and 95% CI half-width (as sacrebleu reports them)
+    ci_a: float
+    mean_b: float
+    ci_b: float
+    p_value: float                       # chance of a difference at least this large under the null hypothesis
+    n_items: int
+    n_resamples: int
+
+    @property
+    def delta(self) -> float:
+        return self.score_b - self.score_a
+
+
+def _resampled_sums(stats_list: list[np.ndarray], n_resamples: int, seed: int | None) -> list[np.ndarray]:
+    """
+    Statistic sums of `n_resamples` bootstrap resamples of the items; every
+    array of `stats_list` is resampled with the same draws (paired).
+    Each resample is a vector of item counts (one multinomial draw), so a chunk
+    of resamples is one matrix product; draws are made per chunk, so memory
+    stays bounded by BOOTSTRAP_CHUNK whatever the number of resamples.
+    """
+    n = len(stats_list[0])
+    rng = np.random.default_rng(seed)
+    pvals = np.full(n, 1.0 / n)
+    sums = [np.empty((n_resamples, s.shape[1]), dtype=np.float64) for s in stats_list]
+    stats_f = [s.astype(np.float64) for s in stats_list]
+
+    chunk = max(1, BOOTSTRAP_CHUNK // max(1, n))
+    for start in range(0, n_resamples, chunk):
+        size = min(chunk, n_resamples - start)
+        weights = rng.multinomial(n, pvals, size=size).astype(np.float64)
+        for out, s in zip(sums, stats_f):
+            out[start : start + size] = weights @ s
+    return sums
+
+
+def _ci(scores: np.ndarray) -> tuple[float, float]:
+    """
+    Mean and 95% CI half-width of bootstrap scores (sacrebleu's estimate_ci).
+    """
+    scores = np.sort(scores)
+    lower_idx = len(scores) // 40
+    return float(scores.mean()), float(0.5 * (scores[len(scores) - lower_idx - 1] - scores[lower_idx]))
+
+
+def paired_bootstrap(a: RunStats, b: RunStats, n_resamples: int = 1000, seed: int | None = 12345) -> dict[str, BootstrapResult]:
+    """
+    Paired bootstrap resampling test between two runs on their common items
+    (the test of sacrebleu --paired-bs, on stored statistics: nothing is re-tokenized).
+    """
+    a, b = a.aligned(b)
+    if not len(a.item_ids):
+        raise ValueError(f"Runs {a.run_id} and {b.run_id} have no items in common.")
+
+    bleu_a, chrf_a, bleu_b, chrf_b = _resampled_sums([a.bleu, a.chrf, b.bleu, b.chrf], n_resamples, seed)
+    results = {}
+    for metric, score_fn, stats_a, stats_b, sums_a, sums_b in (
+        ("BLEU", bleu_from_stats, a.bleu, b.bleu, bleu_a, bleu_b),
+        ("chrF++", chrf_from_stats, a.chrf, b.chrf, chrf_a, chrf_b),
+    ):
+        score_a = float(score_fn(stats_a.sum(axis=0)))
+        score_b = float(score_fn(stats_b.sum(axis=0)))
+        samples_a, samples_b = score_fn(sums_a), score_fn(sums_b)
+
+        sample_diffs = np.abs(samples_b - samples_a)
+        null = sample_diffs - sample_diffs.mean()
+        p_value = (np.sum(null > abs(score_b - score_a)) + 1) / (n_resamples + 1)
+        if not sample_diffs.any():
+            # Identical on every resample (e.g. both scores 0): no evidence of a difference
+            p_value = 1.0
+
+        mean_a, ci_a = _ci(samples_a)
+        mean_b, ci_b = _ci(samples_b)
+        results[metric] = BootstrapResult(metric, score_a, score_b, mean_a, ci_a, mean_b, ci_b, float(p_value), len(a.item_ids), n_resamples)
+    return results
+
+
+def compare_runs(run_a: str, run_b: str, n_resamples: int = 1000, seed: int | None = 12345) -> dict[str, BootstrapResult]:
+    """
+    Paired bootstrap test between two stored evaluation runs.
+    """
+    return paired_bootstrap(load_run_stats(run_a), load_run_stats(run_b), n_resamples, seed)
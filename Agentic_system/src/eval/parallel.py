@@ -0,0 +1,400 @@
+import json
+import os
+import multiprocessing as mp
+from multiprocessing.connection import wait
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+from src.config import GGUF_MODEL_PATH, PROJECT_ROOT
+from src.db.duckdb_conn import close_db, db_writer
+from src.db.schema import EVAL_QUEUE_SQL
+from src.eval.metrics import CorpusStats, load_run_stats
+from src.eval.runner import EVAL_RESULT_FIELDS, EvalConfig, EvalRunner, load_results
+
+QUEUE_PATH = Path(PROJECT_ROOT) / "outputs" / "eval_queue.duckdb"
+# Test items per work unit: small enough to balance slow (long) verses across
+# workers, large enough that claiming is negligible next to translation
+UNIT_SIZE = 8
+# Longest wait (seconds) for a worker message or exit before handing out units again
+POLL_SECONDS = 1.0
+
+
+def load_translator(n_threads: int):
+    """
+    Default worker translator: its own llama.cpp instance and agent.
+    Imported here so the coordinator never loads the model.
+    """
+    from src.llm.qwen_local import QwenLocalLLM
+    from src.agent.orchestrator import SanskritAgent
+
+    # One context per worker: the workers themselves are the parallelism
+    llm = QwenLocalLLM(n_parallel=1, n_threads=n_threads)
+    return llm, SanskritAgent(llm)
+
+
+def _worker_main(
+    worker_id: int, config: EvalConfig, run_id: str, model_path: str, cpus, n_threads: int, translator_factory, conn
+):
+    """
+    Worker process: load a translator, then translate the units the coordinator
+    sends until it sends None. Every message is (kind, worker_id, unit_id, payload).
+
+    Messages go through a pipe, whose writes are synchronous: everything a worker
+    sent before dying can still be read, so the coordinator knows which item it
+    was translating.
+    """
+    try:
+        if cpus and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+        llm, agent = translator_factory(n_threads)
+        runner = EvalRunner(config, llm, agent, model_path=model_path)
+        runner.prepare()
+        if runner.run_id != run_id:
+            raise RuntimeError("dataset or model changed since the run was planned")
+    except Exception as e:
+        conn.send(("failed", worker_id, None, str(e)))
+        return
+
+    conn.send(("ready", worker_id, None, None))
+    while True:
+        unit = conn.recv()
+        if unit is None:
+            break
+        unit_id, seqs = unit
+        for seq in seqs:
+            item_id, src, ref = runner.plan.test_items[seq]
+            try:
+                row = ("result", worker_id, unit_id, (seq, runner.evaluate_item(item_id, src, ref)))
+            except Exception as e:
+                row = ("error", worker_id, unit_id, (seq, {"ID": item_id, "error": str(e)}))
+            conn.send(row)
+        conn.send(("done", worker_id, unit_id, None))
+
+
+@contextmanager
+def _read_only_children():
+    """
+    Spawned workers read DB_READ_ONLY at import: set it while they are started.
+    """
+    previous = os.environ.get("DB_READ_ONLY")
+    os.environ["DB_READ_ONLY"] = "1"
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop("DB_READ_ONLY", None)
+        else:
+            os.environ["DB_READ_ONLY"] = previous
+
+
+class ParallelEvalRunner:
+    """
+    Evaluation of one EvalConfig by several worker processes.
+
+    The coordinator (this process) plans the run, builds the neighbour tables
+    and registers the run, then releases the database: the workers open it
+    read-only, each with its own llama.cpp instance pinned to its own cores.
+    Pending test items are split into units in a queue database
+    (`QUEUE_PATH`, only touched by the coordinator); workers ask for units,
+    stream back results, and the coordinator records them in the queue.
+    When a worker dies, the item it was on is recorded as an error and the rest
+    of its unit is requeued for the surviving workers.
+    At the end the results are merged into `eval_results`, so the run is
+    resumable and comparable exactly like a sequential `EvalRunner` run.
+    """
+
+    def __init__(
+        self,
+        config: EvalConfig,
+        n_workers: int,
+        threads_per_worker: int | None = None,
+        unit_size: int = UNIT_SIZE,
+        queue_path: str | Path = QUEUE_PATH,
+        translator_factory=load_translator,
+        model_path: str = GGUF_MODEL_PATH,
+    ):
+        self.config = config
+        self.n_workers = max(1, int(n_workers))
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        self.cpus = cpus
+        self.threads_per_worker = threads_per_worker or max(1, len(cpus) // self.n_workers)
+        self.unit_size = max(1, int(unit_size))
+        self.queue_path = str(queue_path)
+        self.translator_factory = translator_factory
+        # The coordinator never loads the model: the run records the workers' model file
+        self.model_path = model_path
+        self.runner = EvalRunner(config, None, None, model_path=model_path)
+        self.plan = None
+        self.run_id: str | None = None
+        self.errors: list[tuple[int, str]] = []
+        self.corpus = CorpusStats()
+
+    def prepare(self):
+        self.plan = self.runner.prepare()
+        self.run_id = self.runner.run_id
+        return self.plan
+
+    def completed_ids(self) -> set[int]:
+        return self.runner.completed_ids()
+
+    def cpu_sets(self) -> list[list[int] | None]:
+        """
+        Disjoint cores of each worker; no pinning when the workers oversubscribe the machine.
+        """
+        t = self.threads_per_worker
+        if self.n_workers * t > len(self.cpus):
+            return [None] * self.n_workers
+        return [self.cpus[i * t : (i + 1) * t] for i in range(self.n_workers)]
+
+    def _enqueue(self, q, done_ids: set[int], restart: bool) -> set[int]:
+        """
+        Split the pending items into units. Results already in the queue (from
+        an interrupted coordinator) count as done. Returns the finished seqs.
+        """
+        q.execute(EVAL_QUEUE_SQL)
+        if restart:
+            q.execute("DELETE FROM eval_unit_results WHERE run_id = ?", [self.run_id])
+        q.execute("DELETE FROM eval_units WHERE run_id = ?", [self.run_id])
+
+        queued = {r[0] for r in q.execute("SELECT seq FROM eval_unit_results WHERE run_id = ?", [self.run_id]).fetchall()}
+        finished = {seq for seq, item in enumerate(self.plan.test_items) if item[0] in done_ids} | queued
+        pending = [seq for seq in range(len(self.plan.test_items)) if seq not in finished]
+        units = [pending[i : i + self.unit_size] for i in range(0, len(pending), self.unit_size)]
+        if units:
+            q.executemany(
+                "INSERT INTO eval_units VALUES (?, ?, ?, 'pending', NULL, NULL, NULL)",
+                [[self.run_id, unit_id, seqs] for unit_id, seqs in enumerate(units)],
+            )
+        return finished
+
+    def _claim(self, q, worker_id: int, finished: set[int]):
+        """
+        Next pending unit for `worker_id`, without the items finished meanwhile (None when empty).
+        """
+        while True:
+            row = q.execute(
+                "SELECT unit_id, seqs FROM eval_units WHERE run_id = ? AND status = 'pending' ORDER BY unit_id LIMIT 1",
+                [self.run_id],
+            ).fetchone()
+            if row is None:
+                return None
+            unit_id, seqs = row
+            seqs = [s for s in seqs if s not in finished]
+            if not seqs:
+                q.execute("UPDATE eval_units SET status = 'done', done_at = ? WHERE run_id = ? AND unit_id = ?", [datetime.now(), self.run_id, unit_id])
+                continue
+            q.execute(
+                "UPDATE eval_units SET status = 'claimed', worker = ?, claimed_at = ? WHERE run_id = ? AND unit_id = ?",
+                [worker_id, datetime.now(), self.run_id, unit_id],
+            )
+            return unit_id, seqs
+
+    def _release(self, q, worker_id: int, handled: set[int], started: bool = True) -> int | None:
+        """
+        Put the unfinished items of a dead worker's unit back in the queue.
+
+        If the worker had `started` the unit, the first of them is the item it was
+        translating when it died: it is returned (to be recorded as an error)
+        instead of being requeued, so an item that crashes the model cannot take
+        down every worker in turn.
+        """
+        row = q.execute(
+            "SELECT unit_id, seqs FROM eval_units WHERE run_id = ? AND worker = ? AND status = 'claimed'",
+            [self.run_id, worker_id],
+        ).fetchone()
+        if row is None:
+            return None
+        unit_id, seqs = row
+        remaining = [s for s in seqs if s not in handled]
+        crashed = remaining.pop(0) if started and remaining else None
+        if remaining:
+            q.execute(
+                "UPDATE eval_units SET status = 'pending', seqs = ?, worker = NULL, claimed_at = NULL "
+                "WHERE run_id = ? AND unit_id = ?",
+                [remaining, self.run_id, unit_id],
+            )
+        else:
+            q.execute("UPDATE eval_units SET status = 'done', done_at = ? WHERE run_id = ? AND unit_id = ?", [datetime.now(), self.run_id, unit_id])
+        return crashed
+
+    def _outstanding(self, q, handled: set[int]) -> list[int]:
+        """
+        Unhandled items of the units still pending or claimed.
+        """
+        rows = q.execute(
+            "SELECT seqs FROM eval_units WHERE run_id = ? AND status IN ('pending', 'claimed')", [self.run_id]
+        ).fetchall()
+        return sorted({s for (seqs,) in rows for s in seqs if s not in handled})
+
+    def _merge(self, q) -> None:
+        """
+        Copy the queued results into `eval_results`, then drop them from the queue.
+        """
+        df = q.execute("SELECT * FROM eval_unit_results WHERE run_id = ?", [self.run_id]).df()
+        if not df.empty:
+            with db_writer() as con:
+                con.register("eval_unit_batch", df)
+                try:
+                    con.execute(
+                        f"INSERT OR REPLACE INTO eval_results ({EVAL_RESULT_FIELDS}) "
+                        f"SELECT {EVAL_RESULT_FIELDS} FROM eval_unit_batch"
+                    )
+                finally:
+                    con.unregister("eval_unit_batch")
+        q.execute("DELETE FROM eval_unit_results WHERE run_id = ?", [self.run_id])
+        q.execute("DELETE FROM eval_units WHERE run_id = ?", [self.run_id])
+
+    def run(self, on_item=None, restart: bool = False) -> pd.DataFrame:
+        """
+        Translate every pending test item with the worker pool and return all
+        results of the run. `on_item` as in `EvalRunner.run`.
+        """
+        if self.plan is None:
+            self.prepare()
+        if restart:
+            self.runner.reset()
+        done_ids = self.runner.completed_ids()
+        self.corpus = CorpusStats()
+        if done_ids:
+            stored = load_run_stats(self.run_id)
+            self.corpus.add_stats(stored.bleu, stored.chrf)
+        # Release the file lock: the workers open the database read-only
+        close_db()
+
+        total = len(self.plan.test_items)
+        q = duckdb.connect(self.queue_path)
+        try:
+            finished = self._enqueue(q, done_ids, restart)
+            for n in range(len(finished)):
+                if on_item: on_item(n + 1, total, None)
+            if len(finished) < total:
+                self._run_workers(q, finished, total, on_item)
+            self._merge(q)
+        finally:
+            q.close()
+
+        # Statistics of the merged items (tokenized once, see load_run_stats)
+        load_run_stats(self.run_id)
+        if len(self.runner.completed_ids()) == total:
+            self.runner.mark_finished()
+        return load_results(self.run_id)
+
+    def _run_workers(self, q, finished: set[int], total: int, on_item) -> None:
+        ctx = mp.get_context("spawn")
+        conns = {}
+        procs = {}
+        with _read_only_children():
+            for worker_id, cpus in enumerate(self.cpu_sets()):
+                conns[worker_id], child_conn = ctx.Pipe()
+                procs[worker_id] = ctx.Process(
+                    target=_worker_main,
+                    args=(worker_id, self.config, self.run_id, self.model_path, cpus, self.threads_per_worker,
+                          self.translator_factory, child_conn),
+                    daemon=True,
+                )
+                procs[worker_id].start()
+                child_conn.close()
+        print(f"--> {self.n_workers} workers x {self.threads_per_worker} threads")
+
+        active = set(procs)  # started and not yet told to stop
+        idle = set()         # ready workers waiting for a unit
+        failed = set()       # seqs recorded as errors
+        done = len(finished)
+
+        def record(kind, seq, row):
+            nonlocal done
+            if seq in finished or seq in failed:
+                return
+            if kind == "result":
+                q.execute(
+                    f"INSERT OR REPLACE INTO eval_unit_results ({EVAL_RESULT_FIELDS}) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        self.run_id, row["ID"], seq, row["Source"], row["Ref"], row["Hyp"],
+                        row["BLEU"], row["chrF"], row["Full Context"], row["Glossary Used"], datetime.now(),
+                        json.dumps({stage: round(t, 4) for stage, t in row.get("timings", {}).items()}),
+                    ],
+                )
+                finished.add(seq)
+                self.corpus.add_stats(row["bleu_stats"], row["chrf_stats"])
+            else:
+                self.errors.append((row["ID"], row["error"]))
+                failed.add(seq)
+            done += 1
+            if on_item: on_item(done, total, row)
+
+        def lost(seq, reason):
+            record("error", seq, {"ID": self.plan.test_items[seq][0], "error": reason})
+
+        def handle(message):
+            kind, worker_id, unit_id, payload = message
+            if kind == "failed":
+                print(f"❌ Worker {worker_id} failed to start: {payload}")
+                active.discard(worker_id)
+            elif kind == "ready":
+                idle.add(worker_id)
+            elif kind == "done":
+                q.execute(
+                    "UPDATE eval_units SET status = 'done', done_at = ? WHERE run_id = ? AND unit_id = ?",
+                    [datetime.now(), self.run_id, unit_id],
+                )
+                idle.add(worker_id)
+            else:
+                record(kind, *payload)
+
+        def drain(worker_id):
+            try:
+                while worker_id in active and conns[worker_id].poll():
+                    handle(conns[worker_id].recv())
+            except (EOFError, OSError):
+                pass
+
+        try:
+            while active:
+                # Wakes up on a message or on a worker exit
+                wait([conns[w] for w in active] + [procs[w].sentinel for w in active], timeout=POLL_SECONDS)
+                for worker_id in sorted(active):
+                    drain(worker_id)
+
+                for worker_id in [w for w in active if not procs[w].is_alive()]:
+                    # Read everything the worker sent before it died
+                    drain(worker_id)
+                    if worker_id not in active:
+                        continue
+                    code = procs[worker_id].exitcode
+                    print(f"❌ Worker {worker_id} exited (code {code})")
+                    active.discard(worker_id)
+                    idle.discard(worker_id)
+                    seq = self._release(q, worker_id, finished | failed)
+                    if seq is not None:
+                        lost(seq, f"worker {worker_id} exited (code {code}) while translating this item")
+
+                # Hand out units; an idle worker is only stopped once nothing is
+                # pending or claimed, as a dead worker's unit may still be released
+                for worker_id in sorted(idle):
+                    unit = self._claim(q, worker_id, finished | failed)
+                    if unit is None and self._outstanding(q, finished | failed):
+                        break
+                    idle.discard(worker_id)
+                    try:
+                        conns[worker_id].send(unit)
+                    except OSError:
+                        # Died while idle: the unit goes back untouched, the exit is handled above
+                        if unit is not None:
+                            self._release(q, worker_id, finished | failed, started=False)
+                        continue
+                    if unit is None:
+                        active.discard(worker_id)
+
+            # Items left when no worker survived
+            for seq in self._outstanding(q, finished | failed):
+                lost(seq, "not translated: no worker left")
+        finally:
+            for worker_id, proc in procs.items():
+                if proc.is_alive() and worker_id in active:
+                    proc.terminate()
+                proc.join(timeout=30)
@@ -0,0 +1,281 @@
+import hashlib
+import os
+from functools import lru_cache
+
+import pandas as pd
+
+from src.db.duckdb_conn import get_read_cursor
+
+# Ablation steps of the paper's chrF waterfall: baseline, +dictionary, +grammar, +dynamic RAG, +glossary
+WATERFALL_STEPS = ("A", "B", "D", "F", "I")
+# Bytes hashed at each end of a model file (hashing a multi-GB GGUF in full takes too long)
+FINGERPRINT_BYTES = 4 * 1024 * 1024
+
+
+@lru_cache(maxsize=16)
+def _fingerprint(path: str, size: int, mtime: float) -> str:
+    h = hashlib.sha1(str(size).encode("utf-8"))
+    with open(path, "rb") as f:
+        h.update(f.read(FINGERPRINT_BYTES))
+        if size > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, size - FINGERPRINT_BYTES))
+            h.update(f.read(FINGERPRINT_BYTES))
+    return h.hexdigest()[:16]
+
+
+def model_fingerprint(model_path: str | None) -> str | None:
+    """
+    Short hash identifying a model file: its size and first/last bytes
+    (a directory: every file in it). None when the path does not exist.
+    """
+    if not model_path or not os.path.exists(model_path):
+        return None
+    if os.path.isdir(model_path):
+        files = sorted(
+            os.path.join(root, name) for root, _, names in os.walk(model_path) for name in names
+        )
+        parts = [f"{os.path.relpath(p, model_path)}:{model_fingerprint(p)}" for p in files]
+        return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+    stat = os.stat(model_path)
+    return _fingerprint(model_path, stat.st_size, stat.st_mtime)
+
+
+def list_runs(dataset: str | None = None) -> pd.DataFrame:
+    """
+    Stored runs with their settings and corpus scores (`eval_run_scores`), newest first.
+    """
+    sql = """
+        SELECT run_id, dataset_name, mode, seed, model_name, model_hash, sweep, n_items, n_done,
+               round(corpus_bleu, 2) AS corpus_bleu, round(corpus_chrf, 2) AS corpus_chrf,
+               round(mean_seconds, 2) AS mean_seconds, created_at, finished_at
+        FROM eval_run_scores
+    """
+    params = []
+    if dataset:
+        sql += " WHERE dataset_name = ?"
+        params.append(dataset)
+    return get_read_cursor().execute(sql + " ORDER BY created_at DESC", params).fetch_df()
+
+
+def diff_runs(run_a: str, run_b: str) -> pd.DataFrame:
+    """
+    Item-by-item comparison of two runs: both hypotheses, their sentence
+    scores and timings, and the chrF++ / BLEU change from A to B (items of
+    only one run have NULL on the other side). Largest chrF++ gains first.
+    """
+    return get_read_cursor().execute(
+        """
+        SELECT
+            coalesce(a.item_id, b.item_id) AS item_id,
+            coalesce(a.src_text, b.src_text) AS src_text,
+            coalesce(a.ref_text, b.ref_text) AS ref_text,
+            a.hyp_text AS hyp_a, b.hyp_text AS hyp_b,
+            a.bleu AS bleu_a, b.bleu AS bleu_b, round(b.bleu - a.bleu, 1) AS delta_bleu,
+            a.chrf AS chrf_a, b.chrf AS chrf_b, round(b.chrf - a.chrf, 1) AS delta_chrf,
+            round(a.seconds, 2) AS seconds_a, round(b.seconds, 2) AS seconds_b
+        FROM (SELECT * FROM eval_items WHERE run_id = ?) a
+        FULL OUTER JOIN (SELECT * FROM eval_items WHERE run_id = ?) b ON a.item_id = b.item_id
+        ORDER BY delta_chrf DESC NULLS LAST, item_id
+        """,
+        [run_a, run_b],
+    ).fetch_df()
+
+
+def stage_timings(run_id: str) -> pd.DataFrame:
+    """
+    Mean and total seconds per pipeline stage of a run (empty for sweep runs,
+    whose stages are shared by all their modes).
+    """
+    return get_read_cursor().execute(
+        """
+        SELECT stage, count(*) AS items, round(avg(seconds), 3) AS mean_seconds, round(sum(seconds), 1) AS total_seconds
+        FROM (
+            SELECT unnest(json_keys(timings_json)) AS stage, timings_json
+            FROM eval_items WHERE run_id = ? AND timings_json IS NOT NULL AND NOT sweep
+        ),
+        LATERAL (SELECT TRY_CAST(timings_json ->> stage AS DOUBLE) AS seconds)
+        GROUP BY stage ORDER BY sum(seconds) DESC
+        """,
+        [run_id],
+    ).fetch_df()
+
+
+# Modes with few-shot examples / with retrieval (the few-shot and dynamic RAG flags of runner.MODES)
+FEW_SHOT_MODES = ("E", "F", "I")
+RAG_MODES = ("F", "I")
+# Options that select the test items (and the model): runs are only compared when they are equal
+SETTING_FIELDS = ("sampling", "limit", "pool_half", "model_hash")
+# Options only some modes use (NULL for the others): runs match when equal or unused by either
+MODE_SETTING_FIELDS = ("seed", "split_strategy", "n_examples", "engine")
+
+
+def _run_settings_sql(finished_only: bool = True) -> str:
+    """
+    SQL of `eval_run_scores` with each run's comparable settings (all VARCHAR),
+    normalized from `config_json` as EvalConfig.normalized() does, so runs stored
+    before the normalization compare the same way:
+    - sampling: "all", "first" or "random"; limit: NULL for "all";
+    - pool_half: whether the test items come from the 1st half only (the
+      consistency lock, or the sequential split of a few-shot mode);
+    - seed / split_strategy / n_examples / engine: NULL when the mode ignores them.
+    """
+    few_shot = ", ".join(f"'{m}'" for m in FEW_SHOT_MODES)
+    rag = ", ".join(f"'{m}'" for m in RAG_MODES)
+    return f"""
+        WITH cfg AS (
+            SELECT run_id,
+                   coalesce(config_json ->> 'run_all', 'false') = 'true' AS run_all,
+                   config_json ->> 'sampling' AS sampling,
+                   config_json ->> 'limit' AS lim,
+                   coalesce(config_json ->> 'restrict_pool_to_half', 'false') = 'true' AS restrict_half,
+                   config_json ->> 'split_strategy' AS split_strategy,
+                   config_json ->> 'n_examples' AS n_examples,
+                   config_json ->> 'engine' AS engine
+            FROM eval_runs
+        )
+        SELECT s.* EXCLUDE (seed),
+               CASE WHEN c.run_all THEN 'all' ELSE coalesce(c.sampling, 'first') END AS sampling,
+               CASE WHEN c.run_all THEN NULL ELSE c.lim END AS "limit",
+               CAST(c.restrict_half OR (s.mode_key IN ({few_shot}) AND c.split_strategy = 'half') AS VARCHAR) AS pool_half,
+               CASE WHEN (NOT c.run_all AND c.sampling = 'random') OR s.mode_key = 'E' THEN CAST(s.seed AS VARCHAR) END AS seed,
+               CASE WHEN s.mode_key IN ({few_shot}) THEN c.split_strategy END AS split_strategy,
+               CASE WHEN s.mode_key IN ({few_shot}) THEN c.n_examples END AS n_examples,
+               CASE WHEN s.mode_key IN ({rag}) THEN c.engine END AS engine
+        FROM eval_run_scores s JOIN cfg c USING (run_id)
+        {"WHERE s.finished_at IS NOT NULL" if finished_only else ""}
+    """
+
+
+def run_settings(finished_only: bool = True) -> pd.DataFrame:
+    """
+    Settings under which runs can be compared, most (dataset, mode) pairs first:
+    one row per distinct SETTING_FIELDS, with the MODE_SETTING_FIELDS of its
+    runs. Settings whose mode options are a subset of another's are merged into it.
+    """
+    runs = get_read_cursor().execute(_run_settings_sql(finished_only)).fetch_df()
+    fields = list(SETTING_FIELDS + MODE_SETTING_FIELDS)
+    runs[fields] = runs[fields].astype(object).where(runs[fields].notna(), None)
+
+    combos = runs[fields].drop_duplicates().to_dict("records")
+
+    def covers(a: dict, b: dict) -> bool:
+        return all(a[f] == b[f] for f in SETTING_FIELDS) and all(
+            b[f] is None or a[f] == b[f] for f in MODE_SETTING_FIELDS
+        )
+
+    settings = [c for c in combos if not any(o is not c and o != c and covers(o, c) for o in combos)]
+    rows = []
+    for setting in settings:
+        matched = runs[[_matches(run, setting) for run in runs[fields].to_dict("records")]]
+        rows.append({
+            **setting,
+            "model_name": matched["model_name"].dropna().iloc[0] if matched["model_name"].notna().any() else None,
+            "datasets": matched["dataset_name"].nunique(),
+            "modes": matched["mode_key"].nunique(),
+            "pairs": len(matched[["dataset_name", "mode_key"]].drop_duplicates()),
+            "items": int(matched["n_done"].sum()),
+        })
+    if not rows:
+        return pd.DataFrame(columns=fields + ["model_name", "datasets", "modes", "pairs", "items"])
+    df = pd.DataFrame(rows).sort_values(["pairs", "items"], ascending=False, ignore_index=True)
+    df[fields] = df[fields].astype(object).where(df[fields].notna(), None)
+    return df
+
+
+def _setting_value(setting: dict, field: str) -> str | None:
+    value = setting.get(field)
+    return None if value is None or pd.isna(value) else str(value)
+
+
+def _matches(run: dict, setting: dict) -> bool:
+    return all(run[f] == setting.get(f) for f in SETTING_FIELDS) and all(
+        run[f] is None or setting.get(f) is None or run[f] == setting.get(f) for f in MODE_SETTING_FIELDS
+    )
+
+
+def latest_runs(finished_only: bool = True, setting: dict | None = None) -> tuple[str, list]:
+    """
+    SQL (and its parameters) selecting the most recent run of every (dataset,
+    mode) under one comparable setting (a row of `run_settings`; default: the
+    first one), so smoke tests or runs on other items or models never replace
+    the runs being compared.
+    """
+    if setting is None:
+        settings = run_settings(finished_only)
+        setting = settings.iloc[0].to_dict() if not settings.empty else {}
+    where, params = [], []
+    for f in SETTING_FIELDS:
+        where.append(f'"{f}" IS NOT DISTINCT FROM ?')
+        params.append(_setting_value(setting, f))
+    for f in MODE_SETTING_FIELDS:
+        where.append(f'("{f}" IS NULL OR ?::VARCHAR IS NULL OR "{f}" = ?)')
+        params += [_setting_value(setting, f)] * 2
+    sql = f"""
+        SELECT * FROM ({_run_settings_sql(finished_only)})
+        WHERE {' AND '.join(where)}
+        QUALIFY row_number() OVER (PARTITION BY dataset_name, mode ORDER BY coalesce(finished_at, created_at) DESC) = 1
+    """
+    return sql, params
+
+
+def aggregate_modes(finished_only: bool = True, setting: dict | None = None) -> pd.DataFrame:
+    """
+    Ablation table across datasets: corpus chrF++ / BLEU of the latest run of
+    each (dataset, mode) under one setting (see `latest_runs`), one column per
+    dataset plus the mean over datasets.
+    """
+    latest, params = latest_runs(finished_only, setting)
+    df = get_read_cursor().execute(
+        f"""
+        WITH latest AS ({latest})
+        SELECT mode, dataset_name, round(corpus_chrf, 2) AS corpus_chrf, round(corpus_bleu, 2) AS corpus_bleu, n_done
+        FROM latest ORDER BY mode, dataset_name
+        """,
+        params,
+    ).fetch_df()
+    if df.empty:
+        return df
+    table = df.pivot(index="mode", columns="dataset_name", values="corpus_chrf")
+    table.columns.name = None
+    table["Mean chrF++"] = table.mean(axis=1).round(2)
+    table["Mean BLEU"] = df.groupby("mode")["corpus_bleu"].mean().round(2)
+    return table.reset_index()
+
+
+def waterfall(steps: tuple[str, ...] = WATERFALL_STEPS, finished_only: bool = True, setting: dict | None = None) -> pd.DataFrame:
+    """
+    chrF++ waterfall of the ablation steps (mode letters, in order) under one
+    setting (see `latest_runs`): per dataset and averaged over the datasets
+    whose steps all ran the same number of items, the corpus chrF++ of each
+    step and its gain over the previous one.
+    """
+    steps = [s.strip().upper() for s in steps]
+    order = ", ".join(f"(?, {i})" for i in range(len(steps)))
+    latest, params = latest_runs(finished_only, setting)
+    return get_read_cursor().execute(
+        f"""
+        WITH latest AS ({latest}),
+        step_order(mode_key, step) AS (VALUES {order}),
+        per_dataset AS (
+            SELECT l.dataset_name, o.step, l.mode_key, l.mode, l.corpus_chrf, l.n_done
+            FROM latest l JOIN step_order o ON o.mode_key = l.mode_key
+        ),
+        complete AS (
+            SELECT dataset_name FROM per_dataset
+            GROUP BY dataset_name HAVING count(*) = {len(steps)} AND count(DISTINCT n_done) = 1
+        ),
+        rows AS (
+            SELECT p.* EXCLUDE (n_done) FROM per_dataset p JOIN complete USING (dataset_name)
+            UNION ALL
+            SELECT 'Average', step, mode_key, any_value(mode), avg(corpus_chrf)
+            FROM per_dataset JOIN complete USING (dataset_name)
+            GROUP BY step, mode_key
+        )
+        SELECT dataset_name, step, mode_key, mode,
+               round(corpus_chrf, 2) AS chrf,
+               round(corpus_chrf - lag(corpus_chrf) OVER (PARTITION BY dataset_name ORDER BY step), 2) AS delta
+        FROM rows
+        ORDER BY dataset_name = 'Average' DESC, dataset_name, step
+        """,
+        params + steps,
+    ).fetch_df()
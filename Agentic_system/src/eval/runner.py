@@ -0,0 +1,481 @@
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+
+import pandas as pd
+
+from src.config import RAG_ENGINE
+from src.db.duckdb_conn import get_read_cursor, db_writer, is_read_only
+from src.db.schema import EVAL_SQL
+from src.eval.run_store import model_fingerprint
+from src.eval.metrics import (
+    CorpusStats,
+    bleu_from_stats,
+    chrf_from_stats,
+    item_stats,
+    load_run_stats,
+    sentence_scores_from_stats,
+    store_item_stats,
+)
+from src.llm.prompts import BASELINE_SYSTEM, GLOSSARY_SYSTEM_ADDENDUM
+from src.retrieval.bm25 import dataset_fingerprint
+from src.retrieval.examples import missing_dense_indexes, retrieve_examples, format_examples
+from src.retrieval.neighbors import get_neighbors
+
+# Tuple: (UseAgentClass, UseGrammar, UseDict, UseFewShot, UseGlossary)
+MODES = {
+    "A: Baseline (No Tools)":    (False, False, False, False, False),
+    "B: Dict Only (MW)":         (True,  False, True,  False, False),
+    "C: Grammar Only":           (True,  True,  False, False, False),
+    "D: Full Agent (MW+Gram)":   (True,  True,  True,  False, False),
+    "E: Static Few-Shot":        (True,  True,  True,  True,  False),
+    "F: Dynamic Top-k RAG":      (True,  True,  True,  True,  False),
+    "G: Baseline + Glossary":    (False, False, False, False, True),
+    "H: Full Agent + Glossary":  (True,  True,  True,  False, True),
+    "I: Dynamic RAG + Glossary": (True,  True,  True,  True,  True),
+}
+
+
+def resolve_mode(mode: str) -> str:
+    """
+    Full MODES key from a key or its letter ("F" -> "F: Dynamic Top-k RAG").
+    """
+    for key in MODES:
+        if mode == key or mode.strip().upper() == key.split(":")[0]:
+            return key
+    raise ValueError(f"Unknown mode: {mode} (expected one of {', '.join(k.split(':')[0] for k in MODES)})")
+
+
+def clean_baseline_output(text: str) -> str:
+    if not text: return ""
+    patterns = [r'^(Here is|The translation|The meaning|Output).*?:', r'^Translation:', r'^Answer:']
+    cleaned = text
+    for p in patterns:
+        cleaned = re.sub(p, '', cleaned, flags=re.IGNORECASE | re.MULTILINE)
+    return cleaned.strip().strip('"').strip("'").strip()
+
+
+@dataclass
+class EvalConfig:
+    """
+    Options of one evaluation run (same semantics as the Evaluate page).
+    """
+    dataset: str
+    mode: str
+    run_all: bool = False
+    sampling: str = "first"              # "first" or "random" N items (ignored with run_all)
+    limit: int = 5
+    seed: int = 42                       # random sampling and static few-shot draw
+    restrict_pool_to_half: bool = False  # test only the 1st half, as the sequential RAG split does
+    split_strategy: str = "loo"          # few-shot modes: "loo" (leave-one-out) or "half" (sequential)
+    n_examples: int = 3
+    engine: str = RAG_ENGINE             # retrieval engine of the dynamic RAG modes
+
+    def __post_init__(self):
+        self.mode = resolve_mode(self.mode)
+
+    @property
+    def flags(self) -> tuple:
+        return MODES[self.mode]
+
+    @property
+    def is_dynamic_rag(self) -> bool:
+        return self.mode[0] in ("F", "I")
+
+    @property
+    def is_static_few_shot(self) -> bool:
+        return self.mode[0] == "E"
+
+    @property
+    def uses_seed(self) -> bool:
+        return (not self.run_all and self.sampling == "random") or self.is_static_few_shot
+
+    def normalized(self) -> dict:
+        """
+        Options as they affect the run: fields the mode or the selection ignores
+        are None (`seed` of a first-N or full run, `limit` of a full run, `engine`
+        and `n_examples` of modes without retrieval or few-shot examples).
+        """
+        config = asdict(self)
+        if self.run_all:
+            config.update(limit=None, sampling=None)
+        if not self.uses_seed:
+            config["seed"] = None
+        if not self.flags[3]:
+            config.update(split_strategy=None, n_examples=None)
+        if not self.is_dynamic_rag:
+            config["engine"] = None
+        return config
+
+    def run_id(self, fingerprint: str, model_hash: str | None = None) -> str:
+        """
+        Deterministic id: the same options on the same dataset contents (and model) resume the same run.
+        Options the run ignores are left out (see `normalized`).
+        """
+        key = {"config": self.normalized(), "dataset": fingerprint}
+        if model_hash:
+            key["model"] = model_hash
+        payload = json.dumps(key, sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class EvalPlan:
+    """
+    Selected test items and the few-shot search space of a run.
+    """
+    test_items: list                     # [(item_id, src, ref)]
+    search_universe: list
+    search_min_id: int = -1
+    search_max_id: int = 999999999
+    strategy: str = "loo"                # neighbour-table split of the test/search pools
+    static_few_shot_text: str | None = None
+    notes: list[str] = field(default_factory=list)
+
+
+def plan_items(config: EvalConfig, all_items: list) -> EvalPlan:
+    """
+    Test items of a run from all dataset items (ordered by item_id): the pool
+    restriction, then first/random N with the seed lock, then the static
+    few-shot draw of mode E.
+    """
+    use_few_shot = config.flags[3]
+    sequential = use_few_shot and config.split_strategy == "half"
+    mid_point = len(all_items) // 2
+
+    plan = EvalPlan(test_items=[], search_universe=[])
+    if config.restrict_pool_to_half or sequential:
+        test_universe = all_items[:mid_point]
+        plan.search_universe = all_items[mid_point:]
+        plan.strategy = "half"
+        if plan.search_universe:
+            plan.search_min_id = plan.search_universe[0][0]
+            plan.search_max_id = plan.search_universe[-1][0]
+        if sequential:
+            plan.notes.append(f"📚 Sequential Split Active: Testing indices 0-{mid_point} (1st Half)")
+        else:
+            plan.notes.append(f"🔒 Consistency Lock: Testing Restricted to indices 0-{mid_point} (1st Half)")
+    else:
+        test_universe = all_items
+        plan.search_universe = all_items
+        plan.notes.append("🌍 Global Pool: Testing on entire dataset range.")
+
+    if config.run_all:
+        plan.test_items = test_universe
+    elif len(test_universe) <= config.limit:
+        plan.notes.append("Universe smaller than requested limit. Using all available.")
+        plan.test_items = test_universe
+    elif config.sampling == "random":
+        plan.test_items = random.Random(config.seed).sample(test_universe, config.limit)
+    else:
+        plan.test_items = test_universe[:config.limit]
+
+    if config.is_static_few_shot:
+        test_ids = {item[0] for item in plan.test_items}
+        candidates = [item for item in plan.search_universe if item[0] not in test_ids]
+        if len(candidates) >= config.n_examples:
+            chosen = random.Random(config.seed).sample(candidates, config.n_examples)
+            plan.static_few_shot_text = "\n\n".join(
+                [f"Source: {ex[1].strip()}\nTarget: {ex[2].strip()}" for ex in chosen]
+            )
+        else:
+            plan.notes.append("Not enough static examples available.")
+    return plan
+
+
+def sentence_scores(hyp: str, ref: str) -> tuple[float, float]:
+    """
+    Sentence BLEU and chrF++.
+    """
+    bleu, chrf = sentence_scores_from_stats(*item_stats([hyp], [ref]))
+    return float(bleu[0]), float(chrf[0])
+
+
+def corpus_scores(hyps: list[str], refs: list[str]) -> tuple[float, float]:
+    """
+    Corpus BLEU and chrF++.
+    """
+    bleu, chrf = item_stats(hyps, refs)
+    return float(bleu_from_stats(bleu.sum(axis=0))), float(chrf_from_stats(chrf.sum(axis=0)))
+
+
+RESULT_COLUMNS = ["ID", "Source", "Ref", "Hyp", "BLEU", "chrF", "Full Context", "Glossary Used"]
+# Stored columns of a result row, in the order the runners write them
+EVAL_RESULT_FIELDS = (
+    "run_id, item_id, seq, src_text, ref_text, hyp_text, bleu, chrf, context_text, glossary_text, created_at, timings_json"
+)
+
+
+def result_row(
+    item_id: int, src: str, ref: str, hyp: str, display_ctx: str, glossary_text_display: str, timings: dict | None = None
+) -> dict:
+    """
+    Scored result row of one item (RESULT_COLUMNS keys, plus the item's
+    sufficient statistics under "bleu_stats" / "chrf_stats" and its per-stage
+    seconds under "timings").
+    """
+    bleu_stats, chrf_stats = item_stats([hyp], [ref])
+    bleu, chrf = sentence_scores_from_stats(bleu_stats, chrf_stats)
+    return {
+        "ID": item_id, "Source": src, "Ref": ref, "Hyp": hyp,
+        "BLEU": round(float(bleu[0]), 1), "chrF": round(float(chrf[0]), 1),
+        "Full Context": display_ctx,
+        "Glossary Used": glossary_text_display,
+        "bleu_stats": bleu_stats[0], "chrf_stats": chrf_stats[0],
+        "timings": timings or {},
+    }
+
+
+def load_results(run_id: str) -> pd.DataFrame:
+    """
+    Stored results of a run, in test-set order.
+    """
+    rows = get_read_cursor().execute(
+        """
+        SELECT item_id, src_text, ref_text, hyp_text, round(bleu, 1), round(chrf, 1), context_text, glossary_text
+        FROM eval_results WHERE run_id = ? ORDER BY seq
+        """,
+        [run_id],
+    ).fetchall()
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+
+class EvalRunner:
+    """
+    Headless evaluation of one EvalConfig.
+
+    Every translated item is written to `eval_results` straight away; running
+    the same config again skips the items already stored, so an interrupted
+    run (closed tab, killed job) resumes where it stopped. With a read-only
+    database results are only kept in memory. `corpus` holds the running
+    corpus scores of the stored and newly translated items.
+    """
+
+    def __init__(self, config: EvalConfig, llm, agent, glossary_tool=None, model_path: str | None = None):
+        self.config = config
+        # Recorded with the run; a different model file is a different run
+        self.model_path = model_path or getattr(llm, "model_path", None)
+        self.model_hash = model_fingerprint(self.model_path)
+        self.llm = llm
+        self.agent = agent
+        self.glossary_tool = glossary_tool or getattr(agent, "glossary_tool", None)
+        self.persist = not is_read_only()
+        self.plan: EvalPlan | None = None
+        self.run_id: str | None = None
+        self.stored_neighbors = None
+        self.errors: list[tuple[int, str]] = []
+        self.corpus = CorpusStats()
+
+    def prepare(self) -> EvalPlan:
+        """
+        Select the test items and register the run.
+        """
+        con = get_read_cursor()
+        all_items = con.execute(
+            "SELECT item_id, src_text, tgt_text FROM dataset_items WHERE dataset_name = ? ORDER BY item_id",
+            [self.config.dataset],
+        ).fetchall()
+        self.plan = plan_items(self.config, all_items)
+        self.run_id = self.config.run_id(dataset_fingerprint(con, self.config.dataset), self.model_hash)
+
+        if self.config.is_dynamic_rag:
+            if self.config.engine == "dense" and missing_dense_indexes(self.config.dataset):
+                self.plan.notes.append(
+                    "⚠️ No prebuilt embeddings for this dataset (scripts/build_embeddings.py): examples come from bm25."
+                )
+            try:
+                self.stored_neighbors = get_neighbors(
+                    self.config.dataset, self.plan.strategy, self.config.engine, self.config.n_examples
+                )
+            except Exception as e:
+                print(f"Neighbour table error: {e}")
+            if self.stored_neighbors is None:
+                self.plan.notes.append("No precomputed neighbours available: searching per item.")
+
+        if self.persist:
+            with db_writer() as writer:
+                writer.execute(EVAL_SQL)
+                writer.execute(
+                    """
+                    INSERT OR IGNORE INTO eval_runs
+                        (run_id, dataset_name, mode, config_json, n_items, created_at, seed, model_name, model_hash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    [
+                        self.run_id,
+                        self.config.dataset,
+                        self.config.mode,
+                        json.dumps(self.config.normalized()),
+                        len(self.plan.test_items),
+                        datetime.now(),
+                        self.config.seed if self.config.uses_seed else None,
+                        os.path.basename(os.path.normpath(self.model_path)) if self.model_path else None,
+                        self.model_hash,
+                    ],
+                )
+        return self.plan
+
+    def completed_ids(self) -> set[int]:
+        if not self.persist:
+            return set()
+        rows = get_read_cursor().execute("SELECT item_id FROM eval_results WHERE run_id = ?", [self.run_id]).fetchall()
+        return {r[0] for r in rows}
+
+    def reset(self) -> None:
+        """
+        Drop the stored results of this run (start over).
+        """
+        if self.persist:
+            with db_writer() as writer:
+                writer.execute("DELETE FROM eval_results WHERE run_id = ?", [self.run_id])
+                writer.execute("DELETE FROM eval_item_stats WHERE run_id = ?", [self.run_id])
+                writer.execute("UPDATE eval_runs SET finished_at = NULL WHERE run_id = ?", [self.run_id])
+
+    def few_shot_context(self, item_id: int, src: str) -> str | None:
+        if self.config.is_dynamic_rag:
+            if self.stored_neighbors is not None:
+                return format_examples(self.stored_neighbors.get(item_id, []))
+            try:
+                return format_examples(retrieve_examples(
+                    src, self.config.dataset, self.config.n_examples,
+                    exclude_id=item_id, min_id=self.plan.search_min_id, max_id=self.plan.search_max_id,
+                    engine=self.config.engine,
+                ))
+            except Exception as e:
+                print(f"RAG Error: {e}")
+                return None
+        if self.config.is_static_few_shot:
+            return self.plan.static_few_shot_text
+        return None
+
+    def display_context(self, context: str | None) -> str:
+        """
+        Few-shot context as shown and stored with the results.
+        """
+        if self.config.is_dynamic_rag:
+            return context if context else "No matches."
+        if self.config.is_static_few_shot:
+            return context
+        return "None"
+
+    def translate_item(self, item_id: int, src: str) -> tuple[str, str, str, dict]:
+        """
+        Translate one item in the configured mode.
+        Returns (hypothesis, context shown, glossary matches shown, per-stage seconds).
+        """
+        is_agent_class, use_grammar, use_dict, use_few_shot, use_glossary = self.config.flags
+        start = time.perf_counter()
+        timings: dict[str, float] = {}
+
+        t0 = time.perf_counter()
+        current_context = self.few_shot_context(item_id, src)
+        if current_context is not None:
+            timings["retrieval"] = time.perf_counter() - t0
+        display_ctx = self.display_context(current_context)
+        glossary_text_display = "None"
+
+        if not is_agent_class:
+            system = BASELINE_SYSTEM
+            if use_glossary:
+                t0 = time.perf_counter()
+                g_hits = self.glossary_tool.run(src)
+                timings["glossary"] = time.perf_counter() - t0
+                if g_hits:
+                    entries = [f"- {t}: {d}" for t, d in g_hits.items()]
+                    system += GLOSSARY_SYSTEM_ADDENDUM.format(glossary_content="\n".join(entries))
+                    glossary_text_display = str(g_hits)
+            messages = [{"role": "system", "content": system}, {"role": "user", "content": f"Translate this Sanskrit text to English:\n{src}"}]
+            t0 = time.perf_counter()
+            hyp = clean_baseline_output(self.llm.generate(messages))
+            timings["draft"] = time.perf_counter() - t0
+        else:
+            state = self.agent.run(src, use_grammar=use_grammar, use_dict=use_dict, few_shot_text=current_context, use_glossary=use_glossary)
+            hyp = state.final_translation
+            timings.update({stage: t for stage, t in state.timings.items() if stage != "total"})
+            if use_glossary:
+                g_hits = self.glossary_tool.run(src)
+                if g_hits: glossary_text_display = str(g_hits)
+
+        timings["total"] = time.perf_counter() - start
+        return hyp, display_ctx, glossary_text_display, timings
+
+    def evaluate_item(self, item_id: int, src: str, ref: str) -> dict:
+        """
+        Translate and score one item: a result row (RESULT_COLUMNS keys).
+        """
+        return result_row(item_id, src, ref, *self.translate_item(item_id, src))
+
+    def _store(self, seq: int, row: dict) -> None:
+        self.store_rows([(seq, row)])
+
+    def store_rows(self, rows: list[tuple[int, dict]]) -> None:
+        """
+        Write (seq, result row) pairs to `eval_results`.
+        """
+        with db_writer() as writer:
+            writer.executemany(
+                f"INSERT OR REPLACE INTO eval_results ({EVAL_RESULT_FIELDS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    [
+                        self.run_id, row["ID"], seq, row["Source"], row["Ref"], row["Hyp"],
+                        row["BLEU"], row["chrF"], row["Full Context"], row["Glossary Used"], datetime.now(),
+                        json.dumps({stage: round(t, 4) for stage, t in row.get("timings", {}).items()}),
+                    ]
+                    for seq, row in rows
+                ],
+            )
+            scored = [row for _, row in rows if "bleu_stats" in row]
+            if scored:
+                store_item_stats(
+                    writer, self.run_id, [row["ID"] for row in scored],
+                    [row["bleu_stats"] for row in scored], [row["chrf_stats"] for row in scored],
+                )
+
+    def mark_finished(self) -> None:
+        with db_writer() as writer:
+            writer.execute("UPDATE eval_runs SET finished_at = ? WHERE run_id = ?", [datetime.now(), self.run_id])
+
+    def run(self, on_item=None, restart: bool = False) -> pd.DataFrame:
+        """
+        Translate every pending test item and return all results of the run.
+
+        `on_item(done, total, row)` is called after each item; `row` is None for
+        items resumed from the store and holds an "error" key when translation failed.
+        """
+        if self.plan is None:
+            self.prepare()
+        if restart:
+            self.reset()
+
+        done = self.completed_ids()
+        total = len(self.plan.test_items)
+        self.corpus = CorpusStats()
+        if done:
+            stored = load_run_stats(self.run_id)
+            self.corpus.add_stats(stored.bleu, stored.chrf)
+        rows = []
+        for seq, (item_id, src, ref) in enumerate(self.plan.test_items):
+            if item_id in done:
+                if on_item: on_item(seq + 1, total, None)
+                continue
+            try:
+                row = self.evaluate_item(item_id, src, ref)
+                if self.persist:
+                    self._store(seq, row)
+                self.corpus.add_stats(row["bleu_stats"], row["chrf_stats"])
+                rows.append(row)
+            except Exception as e:
+                self.errors.append((item_id, str(e)))
+                row = {"ID": item_id, "error": str(e)}
+            if on_item: on_item(seq + 1, total, row)
+
+        if not self.persist:
+            return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+        if not self.errors:
+            self.mark_finished()
+        return load_results(self.run_id)
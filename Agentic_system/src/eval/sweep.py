@@ -0,0 +1,312 @@
+import json
+import time
+from collections import Counter
+from dataclasses import replace
+from uuid import uuid4
+
+import pandas as pd
+
+from src.agent.state import AgentState
+from src.db.duckdb_conn import db_writer
+from src.eval.metrics import RunStats, item_stats, load_run_stats, paired_bootstrap
+from src.eval.runner import (
+    MODES,
+    RESULT_COLUMNS,
+    EvalConfig,
+    EvalRunner,
+    clean_baseline_output,
+    load_results,
+    resolve_mode,
+    result_row,
+)
+
+
+class SweepRunner:
+    """
+    Evaluation of several modes (an ablation table) in one pass over the items.
+
+    Modes A-I only differ in the pipeline stages they enable, so for each item
+    every intermediate is computed once and shared by the modes that need it:
+    - the glossary lookup;
+    - the tool stage (morphology + dictionary) per (grammar, dict) setting;
+      grammar-only modes reuse the morphology of the full tool stage;
+    - the dictionary summaries of all tool stages, in one call;
+    - the few-shot context (F and I retrieve the same examples);
+    - drafts and revisions, deduplicated by prompt (mode A's output is also the
+      draft of B/C/D, mode G's the draft of H) and decoded as one batch each.
+
+    Each mode is stored as its own run, with the run_id of a single-mode
+    EvalRunner run of the same config, so sweeps resume and compare like
+    separate runs.
+    """
+
+    def __init__(self, base_config: EvalConfig, modes: list[str], llm, agent, glossary_tool=None):
+        self.llm = llm
+        self.agent = agent
+        self.glossary_tool = glossary_tool or agent.glossary_tool
+        modes = list(dict.fromkeys(resolve_mode(m) for m in modes))
+        self.runners = {
+            mode: EvalRunner(replace(base_config, mode=mode), llm, agent, self.glossary_tool)
+            for mode in modes
+        }
+        self.items: list[tuple[int, str, str]] = []
+        self.notes: list[str] = []
+        # Work done vs. work separate runs would have done ("<stage>" / "<stage>_separate")
+        self.stats: Counter = Counter()
+        self.errors: list[tuple[int, str]] = []
+
+    @property
+    def modes(self) -> list[str]:
+        return list(self.runners)
+
+    def prepare(self) -> list[tuple[int, str, str]]:
+        """
+        Plan every mode; the sweep visits the union of their test items.
+        """
+        seen = set()
+        self.items = []
+        for mode, runner in self.runners.items():
+            plan = runner.prepare()
+            self.notes.extend(note for note in plan.notes if note not in self.notes)
+            for item in plan.test_items:
+                if item[0] not in seen:
+                    seen.add(item[0])
+                    self.items.append(item)
+        return self.items
+
+    def translate_item(self, item_id: int, src: str, modes: list[str]) -> dict[str, tuple[str, str, str, dict]]:
+        """
+        Translate one item in several modes.
+        Returns {mode: (hypothesis, context shown, glossary matches shown, per-stage seconds)}.
+        Each mode gets the stages it used, but their seconds (and "total") cover the
+        whole sweep of the item: sweep runs are flagged and left out of timing views.
+        """
+        agent = self.agent
+        start = time.perf_counter()
+        timings: dict[str, float] = {}
+        flags = {mode: MODES[mode] for mode in modes}
+        agent_modes = [mode for mode in modes if flags[mode][0]]
+
+        # ----------------------------------------------------
+        # Tool stages in the background (source-only, as in SanskritAgent.run)
+        # ----------------------------------------------------
+        tool_keys = {(flags[m][1], flags[m][2]) for m in agent_modes}
+        if (True, True) in tool_keys:
+            tool_keys.discard((True, False))
+        futures = {key: agent._tool_pool.submit(agent._run_tool_stage, src, *key) for key in tool_keys}
+        self.stats["tool_stages"] += len(futures)
+        self.stats["tool_stages_separate"] += len(agent_modes)
+
+        # ----------------------------------------------------
+        # Glossary and few-shot context
+        # ----------------------------------------------------
+        glossary_matches = {}
+        if any(f[4] for f in flags.values()):
+            t0 = time.perf_counter()
+            glossary_matches = self.glossary_tool.run(src)
+            timings["glossary"] = time.perf_counter() - t0
+        glossary_text = agent.glossary_addendum(glossary_matches)
+        glossary_display = str(glossary_matches) if glossary_matches else "None"
+
+        t0 = time.perf_counter()
+        contexts: dict[tuple, str | None] = {}
+        few_shot: dict[str, str | None] = {}
+        for mode in modes:
+            runner = self.runners[mode]
+            config = runner.config
+            key = (config.is_dynamic_rag, config.is_static_few_shot, runner.plan.strategy)
+            if key not in contexts:
+                contexts[key] = runner.few_shot_context(item_id, src)
+            few_shot[mode] = contexts[key]
+        timings["retrieval"] = time.perf_counter() - t0
+
+        # ----------------------------------------------------
+        # Drafts (the baseline modes' prompt is the plain draft prompt)
+        # ----------------------------------------------------
+        draft_keys, prompts = {}, {}
+        for mode in modes:
+            messages = agent.draft_messages(
+                src,
+                few_shot[mode] if flags[mode][0] else None,
+                glossary_text if flags[mode][4] else "",
+            )
+            draft_keys[mode] = json.dumps(messages)
+            prompts.setdefault(draft_keys[mode], messages)
+        t0 = time.perf_counter()
+        drafts = dict(zip(prompts, self.llm.generate_batch(list(prompts.values()))))
+        timings["draft"] = time.perf_counter() - t0
+        self.stats["drafts"] += len(prompts)
+        self.stats["drafts_separate"] += len(modes)
+
+        # ----------------------------------------------------
+        # Join the tool stages; summarize all dictionary evidence at once
+        # ----------------------------------------------------
+        t0 = time.perf_counter()
+        tools = {key: future.result() for key, future in futures.items()}
+        timings["tools_wait"] = time.perf_counter() - t0
+
+        def tool_evidence(use_grammar: bool, use_dict: bool) -> tuple[dict, dict]:
+            if (use_grammar, use_dict) in tools:
+                morph, raw_dict, _, _ = tools[(use_grammar, use_dict)]
+                return morph, raw_dict
+            return tools[(True, True)][0], {}
+
+        raw_dict_all: dict[str, str] = {}
+        for mode in agent_modes:
+            if flags[mode][2]:
+                raw_dict_all.update(tool_evidence(flags[mode][1], True)[1])
+                self.stats["summaries_separate"] += 1
+        t0 = time.perf_counter()
+        summaries = agent.summarize_dictionary_entries(raw_dict_all) if raw_dict_all else {}
+        timings["summaries"] = time.perf_counter() - t0
+        self.stats["summaries"] += 1 if raw_dict_all else 0
+
+        # ----------------------------------------------------
+        # Revisions (branch per mode)
+        # ----------------------------------------------------
+        outputs: dict[str, tuple[str, str, str]] = {}
+        states: dict[str, tuple[AgentState, dict]] = {}
+        revision_keys, prompts = {}, {}
+        for mode in modes:
+            runner = self.runners[mode]
+            shown_glossary = glossary_display if flags[mode][4] else "None"
+            if not flags[mode][0]:
+                hyp = clean_baseline_output(drafts[draft_keys[mode]])
+                outputs[mode] = (hyp, runner.display_context(few_shot[mode]), shown_glossary)
+                continue
+
+            _, use_grammar, use_dict, _, use_glossary = flags[mode]
+            morph, raw_dict = tool_evidence(use_grammar, use_dict)
+            state = AgentState(src_text=src, draft_translation=agent._clean_response(drafts[draft_keys[mode]]))
+            state.dict_evidence = {w: summaries.get(w, raw) for w, raw in raw_dict.items()} if use_dict else {}
+            states[mode] = (state, morph)
+            outputs[mode] = (None, runner.display_context(few_shot[mode]), shown_glossary)
+
+            evidence = agent.evidence_text(morph if use_grammar else {}, state.dict_evidence)
+            if not evidence.strip():
+                state.final_translation = state.draft_translation
+                continue
+            messages = agent.revision_messages(src, state.draft_translation, evidence, glossary_text if use_glossary else "")
+            revision_keys[mode] = json.dumps(messages)
+            prompts.setdefault(revision_keys[mode], messages)
+            self.stats["revisions_separate"] += 1
+
+        t0 = time.perf_counter()
+        revisions = dict(zip(prompts, self.llm.generate_batch(list(prompts.values()))))
+        timings["revision"] = time.perf_counter() - t0
+        self.stats["revisions"] += len(prompts)
+
+        for mode, (state, morph) in states.items():
+            if mode in revision_keys:
+                state.final_translation = agent._clean_response(revisions[revision_keys[mode]])
+            _, use_grammar, use_dict, _, use_glossary = flags[mode]
+            state.logs.append("Sweep: intermediates shared across modes.")
+            agent._save_result(
+                str(uuid4()), state, morph,
+                agent.mode_name(use_grammar, use_dict, bool(few_shot[mode]), use_glossary),
+            )
+            outputs[mode] = (state.final_translation,) + outputs[mode][1:]
+        timings["total"] = time.perf_counter() - start
+
+        def used_stages(mode: str) -> dict[str, float]:
+            is_agent, _, use_dict, use_few_shot, use_glossary = flags[mode]
+            used = {"draft", "total"}
+            if use_glossary: used.add("glossary")
+            if use_few_shot: used.add("retrieval")
+            if is_agent: used.add("tools_wait")
+            if is_agent and use_dict: used.add("summaries")
+            if mode in revision_keys: used.add("revision")
+            return {stage: t for stage, t in timings.items() if stage in used}
+
+        return {mode: output + (used_stages(mode),) for mode, output in outputs.items()}
+
+    def run(self, on_item=None, restart: bool = False) -> dict[str, pd.DataFrame]:
+        """
+        Translate every pending (item, mode) pair and return all results per mode.
+
+        `on_item(done, total, rows)` is called after each item with {mode: result row}
+        (empty for items resumed from the store, or {"error": message}).
+        """
+        if not self.items:
+            self.prepare()
+
+        seq_of, done = {}, {}
+        for mode, runner in self.runners.items():
+            if restart:
+                runner.reset()
+            seq_of[mode] = {item[0]: seq for seq, item in enumerate(runner.plan.test_items)}
+            done[mode] = runner.completed_ids()
+            if done[mode]:
+                stored = load_run_stats(runner.run_id)
+                runner.corpus.add_stats(stored.bleu, stored.chrf)
+
+        # Shared stage timings: keep these runs out of the timing views
+        pending_runs = [
+            runner.run_id for mode, runner in self.runners.items()
+            if runner.persist and len(done[mode]) < len(runner.plan.test_items)
+        ]
+        if pending_runs:
+            with db_writer() as writer:
+                writer.execute("UPDATE eval_runs SET sweep = TRUE WHERE list_contains(?, run_id)", [pending_runs])
+
+        rows: dict[str, list] = {mode: [] for mode in self.runners}
+        total = len(self.items)
+        for n, (item_id, src, ref) in enumerate(self.items):
+            modes = [m for m in self.runners if item_id in seq_of[m] and item_id not in done[m]]
+            item_rows = {}
+            if modes:
+                try:
+                    outputs = self.translate_item(item_id, src, modes)
+                except Exception as e:
+                    self.errors.append((item_id, str(e)))
+                    if on_item: on_item(n + 1, total, {"error": str(e)})
+                    continue
+                for mode, (hyp, display_ctx, glossary_shown, timings) in outputs.items():
+                    row = result_row(item_id, src, ref, hyp, display_ctx, glossary_shown, timings)
+                    runner = self.runners[mode]
+                    if runner.persist:
+                        runner._store(seq_of[mode][item_id], row)
+                    runner.corpus.add_stats(row["bleu_stats"], row["chrf_stats"])
+                    rows[mode].append(row)
+                    item_rows[mode] = row
+            if on_item: on_item(n + 1, total, item_rows)
+
+        results = {}
+        for mode, runner in self.runners.items():
+            if not runner.persist:
+                results[mode] = pd.DataFrame(rows[mode], columns=RESULT_COLUMNS)
+                continue
+            if len(runner.completed_ids()) == len(runner.plan.test_items):
+                runner.mark_finished()
+            results[mode] = load_results(runner.run_id)
+        return results
+
+    def run_stats(self, mode: str, df: pd.DataFrame) -> RunStats:
+        runner = self.runners[mode]
+        if runner.persist:
+            return load_run_stats(runner.run_id)
+        bleu, chrf = item_stats(df["Hyp"].tolist(), df["Ref"].tolist())
+        return RunStats(runner.run_id, df["ID"].to_numpy(), bleu, chrf)
+
+    def summary(self, results: dict[str, pd.DataFrame], n_resamples: int = 1000) -> pd.DataFrame:
+        """
+        Ablation table: corpus scores per mode, with paired bootstrap p-values
+        against the first mode (on the items both were tested on).
+        """
+        stats = {mode: self.run_stats(mode, df) for mode, df in results.items()}
+        reference = next(iter(stats), None)
+        table = []
+        for mode, run_stats in stats.items():
+            bleu, chrf = run_stats.corpus_scores() if len(run_stats.item_ids) else (0.0, 0.0)
+            row = {"Mode": mode, "Run": self.runners[mode].run_id, "Items": len(run_stats.item_ids),
+                   "Corpus BLEU": round(bleu, 2), "Corpus chrF++": round(chrf, 2),
+                   "p BLEU": None, "p chrF++": None}
+            if mode != reference and len(run_stats.item_ids) and len(stats[reference].item_ids):
+                try:
+                    test = paired_bootstrap(stats[reference], run_stats, n_resamples)
+                    row["p BLEU"] = round(test["BLEU"].p_value, 4)
+                    row["p chrF++"] = round(test["chrF++"].p_value, 4)
+                except ValueError:
+                    pass
+            table.append(row)
+        return pd.DataFrame(table)
@@ -0,0 +1,75 @@
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import llama_cpp
+from llama_cpp import Llama
+
+from src.config import EMBED_MODEL_PATH
+
+
+class LocalEmbedder:
+    """
+    Sentence embeddings from a local GGUF model (llama.cpp embedding mode).
+
+    Token embeddings are mean-pooled and L2-normalized, so the dot product of two
+    vectors is their cosine similarity. Works with dedicated embedding models
+    (e.g. bge-m3) and with decoder-only chat models such as Qwen.
+    """
+
+    def __init__(self, model_path: str = EMBED_MODEL_PATH, n_ctx: int = 512, n_threads: int | None = None):
+        """
+        Args:
+            model_path: Path to the GGUF model file.
+            n_ctx: Longest input in tokens; longer sources are truncated
+                (dataset sentences are far shorter).
+            n_threads: CPU threads (None = llama.cpp default).
+        """
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"❌ Embedding model not found at {model_path}.")
+
+        print(f"Loading embedding model from: {model_path}")
+        self.model_path = model_path
+        # Vectors of different models are not comparable: stored indexes are keyed by this tag
+        self.model_tag = Path(model_path).stem
+        self.llm = Llama(
+            model_path=model_path,
+            embedding=True,
+            pooling_type=llama_cpp.LLAMA_POOLING_TYPE_MEAN,
+            n_gpu_layers=-1,
+            n_ctx=n_ctx,
+            n_batch=n_ctx,
+            n_ubatch=n_ctx,  # embeddings need the whole input in one micro-batch
+            n_threads=n_threads,
+            verbose=False,
+        )
+        self.dim = self.llm.n_embd()
+        # A Llama object is not thread-safe
+        self._lock = threading.Lock()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """
+        (len(texts), dim) float32 unit vectors.
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        with self._lock:
+            for i, text in enumerate(texts):
+                if text and text.strip():
+                    vectors[i] = self.llm.embed(text, normalize=True, truncate=True)
+        return vectors
+
+
+_embedder: LocalEmbedder | None = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder() -> LocalEmbedder:
+    """
+    Process-wide embedder (the model is loaded on first use).
+    """
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            _embedder = LocalEmbedder()
+        return _embedder
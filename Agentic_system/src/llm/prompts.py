@@ -74,4 +74,25 @@ The following terms appear in the input. You MUST use the provided official defi
 Do NOT use synonyms if a specific term is provided below.
 
 {glossary_content}
-"""
\ No newline at end of file
+"""
+# ==============================================================================
+# 6. Batched Dictionary Summarization Prompt (one call per sentence)
+# ==============================================================================
+DICT_SUMMARY_BATCH_SYSTEM = """You are a lexicographer helper.
+I will give you SEVERAL raw dictionary entries (often messy, XML-like, or very long) for Sanskrit words.
+Each entry starts with a line "Word: <word>" followed by "Raw Entry: <text>".
+
+For EVERY word, extract the most relevant information into a compact block like this:
+Lemma: [The dictionary headword]
+Definitions: [Top 2-3 most common English meanings, comma separated]
+Context: [Any specific religious/grammatical context if visible, else 'General']
+
+OUTPUT FORMAT:
+Return ONLY a JSON object. Each key is a word exactly as given after "Word:", each value is its block as one string.
+
+RULES:
+1. Ignore obscure, rare, or overly specific botanical/zoological meanings unless they seem primary.
+2. If an entry contains HTML/XML tags (like <b>, <L>), ignore them.
+3. Keep each block concise (under 50 words).
+4. If an entry is just a reference (e.g., "see X"), use "Reference to X".
+"""
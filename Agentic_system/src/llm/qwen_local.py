@@ -1,59 +1,254 @@
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from llama_cpp import Llama
 
-# Dynamically get the project root directory (3 levels up from this file)
-PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.config import GGUF_MODEL_PATH, LLM_N_PARALLEL
+from src.llm.response_cache import LLMResponseCache
 
 # GGUF model path
-MODEL_PATH = os.path.join(
-    PROJECT_ROOT,
-    "models/Qwen2.5-7B-GGUF",
-    "Qwen2.5-7B-Instruct-Q4_K_M.gguf",
-)
+MODEL_PATH = GGUF_MODEL_PATH
+
+
+def state_bytes(state) -> int:
+    """
+    Memory held by a saved `LlamaState`: the llama.cpp state blob (KV cache) plus
+    the copied logits buffer (n_batch x n_vocab floats, ~300MB for Qwen).
+    """
+    size = getattr(state, "llama_state_size", 0) or len(getattr(state, "llama_state", b""))
+    for name in ("scores", "input_ids"):
+        array = getattr(state, name, None)
+        size += getattr(array, "nbytes", 0)
+    return int(size)
+
+
+class PrefixStateCache:
+    """
+    LRU store of llama.cpp states, keyed by the token ids of a system prompt and
+    bounded by both entry count and total bytes.
+
+    A prefix is only stored the second time it is seen, so one-off system prompts
+    (e.g. per-sentence RAG examples) do not evict the fixed ones.
+    """
+
+    def __init__(self, max_entries: int = 8, max_bytes: int = 512 * 1024 * 1024, max_seen: int = 256):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_seen = max_seen
+        self._states: OrderedDict = OrderedDict()
+        self._sizes: dict[tuple, int] = {}
+        self.total_bytes = 0
+        self._seen: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple):
+        state = self._states.get(key)
+        if state is None:
+            self.misses += 1
+            return None
+        self._states.move_to_end(key)
+        self.hits += 1
+        return state
+
+    def should_store(self, key: tuple) -> bool:
+        """
+        Record a sighting of `key`; True once it has been seen before.
+        """
+        if key in self._seen:
+            self._seen.move_to_end(key)
+            return True
+        self._seen[key] = True
+        if len(self._seen) > self.max_seen:
+            self._seen.popitem(last=False)
+        return False
+
+    def put(self, key: tuple, state) -> None:
+        size = state_bytes(state)
+        if size > self.max_bytes:
+            return
+        if key in self._states:
+            self.total_bytes -= self._sizes.pop(key)
+        self._states[key] = state
+        self._states.move_to_end(key)
+        self._sizes[key] = size
+        self.total_bytes += size
+        while len(self._states) > self.max_entries or self.total_bytes > self.max_bytes:
+            old_key, _ = self._states.popitem(last=False)
+            self.total_bytes -= self._sizes.pop(old_key)
+
+
+class _LlamaSlot:
+    """
+    One llama.cpp context plus the lock that serializes access to it.
+    A Llama object is not thread-safe, so every call must hold the slot lock.
+    """
+
+    def __init__(self, llm: Llama, prefix_cache_size: int = 0, prefix_cache_bytes: int = 0):
+        self.llm = llm
+        self.lock = threading.Lock()
+        self.prefix_cache = (
+            PrefixStateCache(prefix_cache_size, prefix_cache_bytes)
+            if prefix_cache_size > 0 and prefix_cache_bytes > 0 else None
+        )
 
 
 class QwenLocalLLM:
-    def __init__(self, model_path: str = MODEL_PATH):
+    TOP_P = 0.9
+
+    def __init__(
+        self,
+        model_path: str = MODEL_PATH,
+        n_parallel: int = LLM_N_PARALLEL,
+        n_threads: int | None = None,
+        prefix_cache_size: int = 8,
+        prefix_cache_mb: int = 1024,
+        use_response_cache: bool = True,
+    ):
+        """
+        Args:
+            model_path: Path to the GGUF model file.
+            n_parallel: Number of llama.cpp contexts used by `generate_batch`.
+                Extra contexts share the memory-mapped weights, so each one only
+                costs its own KV cache (~0.5GB at n_ctx=8192 for a 7B Q4 model).
+            n_threads: CPU threads shared by all contexts (None = llama.cpp's
+                default of half the cores); each context gets an equal share, so
+                parallel contexts do not oversubscribe the CPU.
+            prefix_cache_size: Number of evaluated system-prompt states kept per
+                context (0 disables prefix caching).
+            prefix_cache_mb: Memory budget of all contexts' prefix caches together.
+                Each saved state copies the logits buffer (~300MB for Qwen), so this
+                is what bounds RAM use with several contexts.
+            use_response_cache: Reuse stored responses for identical requests
+                (see `LLMResponseCache`).
+        """
         print(f"Loading GGUF model from: {model_path}")
 
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"❌ Model file not found at {model_path}.")
 
+        self.model_path = model_path
+        self.n_parallel = max(1, int(n_parallel))
+        self.n_threads = n_threads
+        total_threads = n_threads or max(1, (os.cpu_count() or 1) // 2)
+        self.threads_per_context = max(1, total_threads // self.n_parallel)
+        self.prefix_cache_size = prefix_cache_size
+        self.prefix_cache_bytes = prefix_cache_mb * 1024 * 1024 // self.n_parallel
+
         try:
             # Initialize llama.cpp model
-            self.llm = Llama(
-                model_path=model_path,
-                n_gpu_layers=-1,  # Use GPU acceleration (where available, e.g., on Mac)
-                # -------------------------------------------------
-                # Key setting: increase context window
-                # If dictionary evidence is long, we need a large context.
-                # 8192 is a safe value for a 7B model; on a 16GB MacBook Air it should be OK.
-                # If you only have 8GB RAM, consider lowering to 4096 and truncating evidence harder.
-                # -------------------------------------------------
-                n_ctx=8192,
-                n_batch=512,      # Larger batch can speed up prompt processing
-                verbose=True,     # Enable logs for debugging
-                chat_format="chatml",
-            )
+            self.llm = self._load_context()
             print(f"✅ GGUF model loaded successfully! (Context window: {self.llm.n_ctx()})")
         except Exception as e:
             print(f"❌ Failed to load GGUF model: {e}")
             raise
 
-    def generate(self, messages: list, max_new_tokens: int = 512, temperature: float = 0.2) -> str:
+        # Slot 0 is the primary context used by `generate`; the others are created lazily.
+        self._slots = [self._new_slot(self.llm)]
+        self._slots_lock = threading.Lock()
+
+        self.response_cache = None
+        if use_response_cache:
+            try:
+                self.response_cache = LLMResponseCache(model_path)
+            except Exception as e:
+                print(f"⚠️ LLM response cache disabled: {e}")
+
+    def _load_context(self) -> Llama:
+        return Llama(
+            model_path=self.model_path,
+            n_gpu_layers=-1,  # Use GPU acceleration (where available, e.g., on Mac)
+            # -------------------------------------------------
+            # Key setting: increase context window
+            # If dictionary evidence is long, we need a large context.
+            # 8192 is a safe value for a 7B model; on a 16GB MacBook Air it should be OK.
+            # If you only have 8GB RAM, consider lowering to 4096 and truncating evidence harder.
+            # -------------------------------------------------
+            n_ctx=8192,
+            n_batch=512,      # Larger batch can speed up prompt processing
+            n_threads=self.threads_per_context,
+            verbose=True,     # Enable logs for debugging
+            chat_format="chatml",
+        )
+
+    def _new_slot(self, llm: Llama) -> _LlamaSlot:
+        return _LlamaSlot(llm, self.prefix_cache_size, self.prefix_cache_bytes)
+
+    def _get_slots(self, n: int) -> list:
         """
-        Generate a response from the local model.
+        Return the first `n` context slots, loading missing contexts on demand.
+        """
+        n = max(1, min(n, self.n_parallel))
+        with self._slots_lock:
+            while len(self._slots) < n:
+                try:
+                    self._slots.append(self._new_slot(self._load_context()))
+                except Exception as e:
+                    # Out of memory etc.: keep working with the contexts we already have
+                    print(f"⚠️ Could not create extra llama.cpp context ({e}); using {len(self._slots)}.")
+                    self.n_parallel = len(self._slots)
+                    break
+            return self._slots[:n]
+
+    def _prime_system_prefix(self, slot: _LlamaSlot, messages: list) -> None:
+        """
+        Make sure the KV cache of `slot` already holds the system prompt of `messages`.
+
+        llama.cpp skips every prompt token that matches the tokens already in its
+        context, so restoring a saved state for the system turn means only the user
+        turn is evaluated. Must be called with `slot.lock` held.
+        """
+        if slot.prefix_cache is None or not messages or messages[0].get("role") != "system":
+            return
+
+        # Same rendering as the chatml chat format, up to the start of the user turn
+        prefix = f"<|im_start|>system\n{messages[0]['content']}<|im_end|>\n"
+        tokens = slot.llm.tokenize(prefix.encode("utf-8"), special=True)
+        n = len(tokens)
+
+        # Already resident (e.g. the previous call used the same system prompt)
+        if slot.llm.n_tokens >= n and slot.llm.input_ids[:n].tolist() == tokens:
+            return
+
+        key = tuple(tokens)
+        state = slot.prefix_cache.get(key)
+        if state is not None:
+            slot.llm.load_state(state)
+        elif slot.prefix_cache.should_store(key):
+            slot.llm.reset()
+            slot.llm.eval(tokens)
+            slot.prefix_cache.put(key, slot.llm.save_state())
+
+    def _complete(
+        self,
+        slot: _LlamaSlot,
+        messages: list,
+        max_new_tokens: int,
+        temperature: float,
+        response_format: dict | None = None,
+    ) -> str:
+        """
+        Run a single chat completion on one context slot.
         """
         try:
             # You could add a proactive prompt-length check here if needed.
+            with slot.lock:
+                try:
+                    self._prime_system_prefix(slot, messages)
+                except Exception as e:
+                    # Prefix caching is only an optimization; fall back to a cold prompt
+                    print(f"⚠️ Prefix cache skipped: {e}")
+                    slot.llm.reset()
 
-            output = self.llm.create_chat_completion(
-                messages=messages,
-                max_tokens=max_new_tokens,
-                temperature=temperature,
-                top_p=0.9,
-                stream=False,
-            )
+                output = slot.llm.create_chat_completion(
+                    messages=messages,
+                    max_tokens=max_new_tokens,
+                    temperature=temperature,
+                    top_p=self.TOP_P,
+                    response_format=response_format,
+                    stream=False,
+                )
 
             return output["choices"][0]["message"]["content"]
 
@@ -67,6 +262,105 @@ class QwenLocalLLM:
 
             return f"Error: Model generation failed. Details: {str(e)}"
 
+    def generate(
+        self,
+        messages: list,
+        max_new_tokens: int = 512,
+        temperature: float = 0.2,
+        response_format: dict | None = None,
+    ) -> str:
+        """
+        Generate a response from the local model.
+
+        `response_format` is passed to llama.cpp, e.g. {"type": "json_object", "schema": {...}}
+        to constrain the output with a JSON grammar.
+        """
+        return self.generate_batch(
+            [messages],
+            max_new_tokens=max_new_tokens,
+            temperature=temperature,
+            response_format=response_format,
+        )[0]
+
+    def generate_batch(
+        self,
+        messages_list: list,
+        max_new_tokens: int = 512,
+        temperature: float = 0.2,
+        response_format: dict | None = None,
+    ) -> list:
+        """
+        Generate responses for several message lists at once.
+
+        Cached responses are returned directly; the remaining prompts are decoded
+        together (see `_decode_batch`). Results are in the same order as `messages_list`.
+        """
+        if not messages_list:
+            return []
+
+        if self.response_cache is None:
+            return self._decode_batch(messages_list, max_new_tokens, temperature, response_format)
+
+        keys = [
+            self.response_cache.make_key(m, max_new_tokens, temperature, self.TOP_P, response_format)
+            for m in messages_list
+        ]
+        cached = self.response_cache.get_many(keys)
+
+        # Decode each distinct missing request once, even if it repeats within the batch
+        missing: dict[str, list] = {}
+        for key, messages in zip(keys, messages_list):
+            if key not in cached and key not in missing:
+                missing[key] = messages
+
+        if missing:
+            outputs = self._decode_batch(list(missing.values()), max_new_tokens, temperature, response_format)
+            fresh = dict(zip(missing.keys(), outputs))
+            self.response_cache.put_many(fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def _decode_batch(
+        self,
+        messages_list: list,
+        max_new_tokens: int,
+        temperature: float,
+        response_format: dict | None = None,
+    ) -> list:
+        """
+        Decode several prompts on up to `n_parallel` llama.cpp contexts concurrently
+        (llama.cpp releases the GIL while evaluating), preserving input order.
+        """
+        slots = self._get_slots(len(messages_list))
+        if len(slots) == 1 or len(messages_list) == 1:
+            return [
+                self._complete(slots[0], m, max_new_tokens, temperature, response_format)
+                for m in messages_list
+            ]
+
+        # Each worker owns one slot and keeps pulling the next pending prompt,
+        # so a long generation on one context does not hold up the others.
+        results: list = [None] * len(messages_list)
+        pending = iter(range(len(messages_list)))
+        pending_lock = threading.Lock()
+
+        def _worker(slot_idx: int) -> None:
+            slot = slots[slot_idx]
+            while True:
+                with pending_lock:
+                    i = next(pending, None)
+                if i is None:
+                    return
+                results[i] = self._complete(
+                    slot, messages_list[i], max_new_tokens, temperature, response_format
+                )
+
+        with ThreadPoolExecutor(max_workers=len(slots)) as pool:
+            list(pool.map(_worker, range(len(slots))))
+
+        return results
+
 
 # Test code
 if __name__ == "__main__":
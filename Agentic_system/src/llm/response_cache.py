@@ -0,0 +1,222 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from src.config import LLM_CACHE_MAX_MB
+from src.db.duckdb_conn import get_read_cursor, db_writer, is_read_only
+from src.db.schema import LLM_CACHE_SQL
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache of LLM responses stored in the `llm_cache` DuckDB table.
+
+    Key = sha256 of (model id, messages, max_new_tokens, temperature, top_p[, response_format]),
+    so re-running the same dataset/mode returns stored responses instead of decoding again.
+
+    Lookups only read. Hit bookkeeping (hit_count, last_used_at for LRU eviction) is
+    kept in memory and written with the next `put_many`, every `hit_flush_every`
+    hit keys, or at exit; read-only processes never write it.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        max_bytes: int = LLM_CACHE_MAX_MB * 1024 * 1024,
+        evict_every: int = 200,
+        hit_flush_every: int = 200,
+    ):
+        # Hashing a multi-GB GGUF file on every start is too slow; file name + size
+        # identifies a quantized model well enough.
+        size = os.path.getsize(model_path) if os.path.exists(model_path) else 0
+        self.model_id = f"{os.path.basename(model_path)}:{size}"
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.hit_flush_every = hit_flush_every
+        self.hits = 0
+        self.misses = 0
+        self._puts_since_evict = 0
+        # {cache_key: [hits, last used]} not written to llm_cache yet
+        self._pending_hits: dict[str, list] = {}
+        self._pending_lock = threading.Lock()
+
+        if not is_read_only():
+            with db_writer() as con:
+                con.execute(LLM_CACHE_SQL)
+            atexit.register(self.flush_hits)
+
+    def make_key(
+        self,
+        messages: list,
+        max_new_tokens: int,
+        temperature: float,
+        top_p: float,
+        response_format: dict | None = None,
+    ) -> str:
+        request = {
+            "model": self.model_id,
+            "messages": messages,
+            "max_new_tokens": max_new_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+        }
+        # Only part of the key when set, so existing plain-text entries stay valid
+        if response_format is not None:
+            request["response_format"] = response_format
+
+        payload = json.dumps(
+            request,
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, str]:
+        """
+        Return {key: response} for the keys that are cached.
+        """
+        unique_keys = list(set(keys))
+        if not unique_keys:
+            return {}
+
+        found: dict[str, str] = {}
+        try:
+            placeholders = ",".join(["?"] * len(unique_keys))
+            rows = get_read_cursor().execute(
+                f"SELECT cache_key, response FROM llm_cache WHERE cache_key IN ({placeholders})",
+                unique_keys,
+            ).fetchall()
+            found = {k: v for k, v in rows}
+        except Exception as e:
+            print(f"LLM cache read error: {e}")
+
+        # Duplicate prompts in one batch are one lookup (and one generation on a miss)
+        self.hits += len(found)
+        self.misses += len(unique_keys) - len(found)
+
+        # LRU bookkeeping is a write: batch it; read-only processes just serve hits
+        if found and not is_read_only():
+            now = datetime.now()
+            with self._pending_lock:
+                for key in found:
+                    pending = self._pending_hits.setdefault(key, [0, now])
+                    pending[0] += 1
+                    pending[1] = now
+                n_pending = len(self._pending_hits)
+            if n_pending >= self.hit_flush_every:
+                self.flush_hits()
+        return found
+
+    def _take_pending_hits(self) -> list[tuple]:
+        with self._pending_lock:
+            pending, self._pending_hits = self._pending_hits, {}
+        return [(n, used, key) for key, (n, used) in pending.items()]
+
+    def _write_hits(self, con, hits: list[tuple]) -> None:
+        if hits:
+            con.executemany(
+                """
+                UPDATE llm_cache
+                SET hit_count = hit_count + ?, last_used_at = greatest(last_used_at, ?)
+                WHERE cache_key = ?
+                """,
+                hits,
+            )
+
+    def flush_hits(self) -> None:
+        """
+        Write the hit counts collected since the last write.
+        """
+        hits = self._take_pending_hits()
+        if not hits or is_read_only():
+            return
+        try:
+            with db_writer() as con:
+                self._write_hits(con, hits)
+        except Exception as e:
+            print(f"LLM cache hit-count write error: {e}")
+
+    def get(self, key: str) -> str | None:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: dict[str, str]) -> None:
+        """
+        Store {key: response}. Error responses from the model wrapper are never cached.
+        """
+        now = datetime.now()
+        rows = [
+            (k, self.model_id, v, len(v.encode("utf-8")), now, now)
+            for k, v in items.items()
+            if v is not None and not v.startswith("Error:")
+        ]
+        if not rows or is_read_only():
+            return
+
+        try:
+            with db_writer() as con:
+                con.executemany(
+                    """
+                    INSERT OR REPLACE INTO llm_cache
+                        (cache_key, model_id, response, size_bytes, created_at, last_used_at, hit_count)
+                    VALUES (?, ?, ?, ?, ?, ?, 0)
+                    """,
+                    rows,
+                )
+                self._write_hits(con, self._take_pending_hits())
+                self._puts_since_evict += len(rows)
+                if self._puts_since_evict >= self.evict_every:
+                    self._evict(con)
+                    self._puts_since_evict = 0
+        except Exception as e:
+            print(f"LLM cache write error: {e}")
+
+    def put(self, key: str, response: str) -> None:
+        self.put_many({key: response})
+
+    def _evict(self, con) -> None:
+        """
+        Drop least-recently-used entries until the table fits in `max_bytes`.
+        """
+        con.execute(
+            """
+            DELETE FROM llm_cache
+            WHERE cache_key IN (
+                SELECT cache_key FROM (
+                    SELECT cache_key,
+                           sum(size_bytes) OVER (ORDER BY last_used_at DESC, cache_key) AS running_bytes
+                    FROM llm_cache
+                )
+                WHERE running_bytes > ?
+            )
+            """,
+            [self.max_bytes],
+        )
+
+    def evict(self) -> None:
+        if is_read_only():
+            return
+        with db_writer() as con:
+            self._write_hits(con, self._take_pending_hits())
+            self._evict(con)
+
+    def stats(self) -> dict:
+        """
+        Session hit/miss counters plus the current size of the table.
+        """
+        entries, total_bytes = 0, 0
+        try:
+            entries, total_bytes = get_read_cursor().execute(
+                "SELECT count(*), coalesce(sum(size_bytes), 0) FROM llm_cache"
+            ).fetchone()
+        except Exception as e:
+            print(f"LLM cache stats error: {e}")
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "total_bytes": total_bytes,
+        }
@@ -0,0 +1,364 @@
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from src.db.duckdb_conn import get_read_cursor, db_writer, is_read_only
+from src.db.schema import RAG_INDEX_SQL
+
+# Character n-grams work for Devanagari and romanized input alike and are robust
+# to sandhi, which merges words so that whole-token matching misses most overlaps.
+NGRAM = 3
+K1 = 1.2
+B = 0.75
+# n-grams found in more than this share of a dataset carry almost no signal and
+# would make every query touch most documents; they are skipped at query time.
+MAX_DF_RATIO = 0.5
+
+
+def normalize_text(text: str) -> str:
+    return " " + re.sub(r"\s+", " ", (text or "").lower()).strip() + " "
+
+
+def char_ngrams(text: str, n: int = NGRAM) -> Counter:
+    text = normalize_text(text)
+    return Counter(text[i : i + n] for i in range(len(text) - n + 1))
+
+
+def text_md5(text: str) -> str:
+    return hashlib.md5(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Concatenation of range(s, s + c) for every (s, c), without a Python loop.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(np.asarray(starts, dtype=np.int64), counts) + offsets
+
+
+def dataset_fingerprint(con, dataset_name: str) -> str:
+    count, content_hash = con.execute(
+        "SELECT count(*), bit_xor(hash(item_id, src_text)) FROM dataset_items WHERE dataset_name = ?",
+        [dataset_name],
+    ).fetchone()
+    return f"{count}:{content_hash}"
+
+
+def build_rag_index(con, dataset_name: str) -> int:
+    """
+    (Re)build the postings of one dataset from `dataset_items`.
+    Call with the writer cursor that loaded the dataset so both commit together.
+    Returns the number of indexed items.
+    """
+    con.execute(RAG_INDEX_SQL)
+    con.execute("DELETE FROM rag_docs WHERE dataset_name = ?", [dataset_name])
+    con.execute("DELETE FROM rag_postings WHERE dataset_name = ?", [dataset_name])
+
+    items = con.execute(
+        "SELECT item_id, src_text FROM dataset_items WHERE dataset_name = ?", [dataset_name]
+    ).fetchall()
+    con.execute(
+        "INSERT OR REPLACE INTO rag_datasets VALUES (?, ?, ?, ?)",
+        [dataset_name, dataset_fingerprint(con, dataset_name), len(items), datetime.now()],
+    )
+    if not items:
+        return 0
+
+    docs = {"item_id": [], "doc_len": [], "src_md5": []}
+    postings = {"term": [], "item_id": [], "tf": []}
+    for item_id, src in items:
+        grams = char_ngrams(src)
+        docs["item_id"].append(item_id)
+        docs["doc_len"].append(sum(grams.values()))
+        docs["src_md5"].append(text_md5(src))
+        postings["term"].extend(grams.keys())
+        postings["item_id"].extend([item_id] * len(grams))
+        postings["tf"].extend(grams.values())
+
+    docs_df = pd.DataFrame(docs)
+    postings_df = pd.DataFrame(postings)
+    con.register("rag_docs_batch", docs_df)
+    con.register("rag_postings_batch", postings_df)
+    try:
+        con.execute(
+            "INSERT INTO rag_docs SELECT ?, item_id, doc_len, src_md5 FROM rag_docs_batch", [dataset_name]
+        )
+        # Sorted by term so a dataset's postings load as contiguous runs
+        con.execute(
+            "INSERT INTO rag_postings SELECT ?, term, item_id, tf FROM rag_postings_batch ORDER BY term, item_id",
+            [dataset_name],
+        )
+    finally:
+        con.unregister("rag_docs_batch")
+        con.unregister("rag_postings_batch")
+    return len(items)
+
+
+class BM25Index:
+    """
+    In-memory BM25 index of one dataset, loaded from `rag_postings`.
+
+    Postings are stored as flat numpy arrays sorted by term; each term maps to a
+    slice. Per-posting BM25 weights are precomputed, so a query only sums the
+    weights of its n-grams' postings instead of comparing against every item;
+    very common n-grams (see MAX_DF_RATIO) are skipped.
+    """
+
+    def __init__(
+        self,
+        dataset_name: str,
+        doc_ids,
+        doc_len,
+        doc_md5,
+        terms,
+        post_docs,
+        post_tf,
+        src_texts=None,
+        tgt_texts=None,
+        fingerprint: str = "",
+    ):
+        self.dataset_name = dataset_name
+        self.fingerprint = fingerprint
+        self.item_ids = np.asarray(doc_ids, dtype=np.int64)
+        self.doc_md5 = np.asarray(doc_md5, dtype=object)
+        self.n_docs = len(self.item_ids)
+        # Example texts stay in memory: a few MB per dataset, and no query per lookup
+        self.texts = dict(zip(self.item_ids.tolist(), zip(src_texts, tgt_texts))) if src_texts is not None else {}
+
+        doc_len = np.asarray(doc_len, dtype=np.float32)
+        self.doc_len = doc_len
+        self.avg_len = float(doc_len.mean()) if self.n_docs else 0.0
+
+        # item_id -> dense document index
+        order = np.argsort(self.item_ids)
+        post_items = np.asarray(post_docs, dtype=np.int64)
+        self.post_docs = order[np.searchsorted(self.item_ids[order], post_items)].astype(np.int32)
+        post_tf = np.asarray(post_tf, dtype=np.float32)
+        self.post_tf = post_tf
+
+        terms = np.asarray(terms, dtype=object)
+        unique_terms, starts, counts = np.unique(terms, return_index=True, return_counts=True)
+        self.slices = {t: (int(s), int(s + c)) for t, s, c in zip(unique_terms, starts, counts)}
+        self.idf = {
+            t: math.log(1.0 + (self.n_docs - c + 0.5) / (c + 0.5)) for t, c in zip(unique_terms, counts)
+        }
+        self.max_df = max(1, int(MAX_DF_RATIO * self.n_docs))
+        # Same per-term data as arrays, for scoring many queries at once (score_block)
+        self.term_start = starts.astype(np.int64)
+        self.term_count = counts.astype(np.int64)
+        self.term_idf = np.array([self.idf[t] for t in unique_terms], dtype=np.float32)
+        self.post_term = np.repeat(np.arange(len(unique_terms), dtype=np.int32), counts)
+        self._doc_postings = None
+
+        # BM25 weight of every posting (idf * saturated tf)
+        idf_per_posting = np.repeat(self.term_idf, counts)
+        norm = K1 * (1.0 - B + B * doc_len[self.post_docs] / max(self.avg_len, 1e-9))
+        self.post_weight = idf_per_posting * post_tf * (K1 + 1.0) / (post_tf + norm)
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def search(
+        self,
+        query: str,
+        k: int = 3,
+        exclude_id: int | None = None,
+        min_id: int | None = None,
+        max_id: int | None = None,
+        min_score: float = 0.0,
+    ) -> list[tuple[int, float]]:
+        """
+        Top-k (item_id, score) for `query`. Scores are normalized by the query's
+        score against itself (roughly 0..1), so `min_score` is independent of
+        query length. The self-score counts every n-gram of the query, those found
+        in no item with the idf of df=0, so a query that mostly misses the dataset
+        scores low. Items with exactly the query text are never returned.
+        """
+        grams = char_ngrams(query)
+        q_len = sum(grams.values())
+        q_norm = K1 * (1.0 - B + B * q_len / max(self.avg_len, 1e-9))
+        unseen_idf = math.log(1.0 + (self.n_docs + 0.5) / 0.5)
+
+        doc_parts, weight_parts = [], []
+        ideal = 0.0
+        for term, qtf in grams.items():
+            span = self.slices.get(term)
+            idf = self.idf[term] if span is not None else unseen_idf
+            ideal += qtf * idf * qtf * (K1 + 1.0) / (qtf + q_norm)
+            if span is None:
+                continue
+            start, end = span
+            if end - start > self.max_df:
+                continue
+            doc_parts.append(self.post_docs[start:end])
+            weight_parts.append(self.post_weight[start:end] * qtf)
+
+        if not doc_parts or ideal <= 0:
+            return []
+
+        # Accumulate into a dense array (one C pass, cheaper than sorting the postings)
+        dense = np.bincount(np.concatenate(doc_parts), weights=np.concatenate(weight_parts), minlength=self.n_docs)
+        candidates = np.flatnonzero(dense)
+        scores = dense[candidates] / ideal
+
+        # Dataset-scope filters (leave-one-out, search range) on the candidates only
+        ids = self.item_ids[candidates]
+        keep = scores >= min_score
+        if exclude_id is not None:
+            keep &= ids != exclude_id
+        if min_id is not None:
+            keep &= ids >= min_id
+        if max_id is not None:
+            keep &= ids <= max_id
+        keep &= self.doc_md5[candidates] != text_md5(query)
+
+        ids, scores = ids[keep], scores[keep]
+        if len(ids) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.lexsort((ids, -scores))
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+    def score_block(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Scores of the indexed documents `rows` (dense indexes) used as queries
+        against every document: (len(rows), n_docs), normalized as in `search`
+        (all n-grams of an indexed document are in the index).
+        Used to precompute all-pairs neighbour tables in one vectorized pass.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if self._doc_postings is None:
+            # Postings regrouped by document: the n-grams of each document as a query
+            order = np.argsort(self.post_docs, kind="stable")
+            bounds = np.searchsorted(self.post_docs[order], np.arange(self.n_docs + 1))
+            self._doc_postings = (order, bounds)
+        order, bounds = self._doc_postings
+
+        # (query, term, qtf) triples of the block
+        n_terms = bounds[rows + 1] - bounds[rows]
+        q_post = order[expand_ranges(bounds[rows], n_terms)]
+        q_local = np.repeat(np.arange(len(rows)), n_terms)
+        q_term = self.post_term[q_post]
+        qtf = self.post_tf[q_post]
+
+        q_len = self.doc_len[rows][q_local]
+        ideal_terms = qtf * self.term_idf[q_term] * qtf * (K1 + 1.0) / (
+            qtf + K1 * (1.0 - B + B * q_len / max(self.avg_len, 1e-9))
+        )
+        ideal = np.bincount(q_local, weights=ideal_terms, minlength=len(rows))
+
+        # Per distinct term of the block: add the outer product of the queries' tf
+        # and the term's posting weights (very common n-grams skipped)
+        keep = self.term_count[q_term] <= self.max_df
+        by_term = np.argsort(q_term[keep], kind="stable")
+        q_local, q_term, qtf = q_local[keep][by_term], q_term[keep][by_term], qtf[keep][by_term]
+        terms, starts = np.unique(q_term, return_index=True)
+        ends = np.append(starts[1:], len(q_term))
+
+        dense = np.zeros((len(rows), self.n_docs), dtype=np.float32)
+        for term, start, end in zip(terms.tolist(), starts.tolist(), ends.tolist()):
+            p_start = self.term_start[term]
+            p_end = p_start + self.term_count[term]
+            dense[q_local[start:end, None], self.post_docs[None, p_start:p_end]] += (
+                qtf[start:end, None] * self.post_weight[None, p_start:p_end]
+            )
+        return dense / np.maximum(ideal, 1e-12)[:, None].astype(np.float32)
+
+
+def _stored_fingerprint(con, dataset_name: str) -> str | None:
+    try:
+        row = con.execute(
+            "SELECT fingerprint FROM rag_datasets WHERE dataset_name = ?", [dataset_name]
+        ).fetchone()
+    except duckdb.CatalogException:
+        return None
+    return row[0] if row else None
+
+
+def _load_index(con, dataset_name: str, fingerprint: str) -> BM25Index | None:
+    docs = con.execute(
+        """
+        SELECT r.item_id, r.doc_len, r.src_md5, d.src_text, d.tgt_text
+        FROM rag_docs r
+        JOIN dataset_items d USING (dataset_name, item_id)
+        WHERE r.dataset_name = ?
+        """,
+        [dataset_name],
+    ).fetchnumpy()
+    if len(docs["item_id"]) == 0:
+        return None
+    postings = con.execute(
+        "SELECT term, item_id, tf FROM rag_postings WHERE dataset_name = ? ORDER BY term, item_id",
+        [dataset_name],
+    ).fetchnumpy()
+    return BM25Index(
+        dataset_name,
+        docs["item_id"],
+        docs["doc_len"],
+        docs["src_md5"],
+        postings["term"],
+        postings["item_id"],
+        postings["tf"],
+        docs["src_text"],
+        docs["tgt_text"],
+        fingerprint,
+    )
+
+
+_indexes: dict[str, BM25Index] = {}
+_checked_at: dict[str, float] = {}
+_indexes_lock = threading.Lock()
+
+# How often (seconds) a cached index re-checks its dataset for changes
+RECHECK_SECONDS = 30.0
+
+
+def get_bm25_index(dataset_name: str) -> BM25Index | None:
+    """
+    Process-wide index of one dataset. Reloaded when the dataset's rows change;
+    built on first use for datasets ingested before the index existed.
+    """
+    with _indexes_lock:
+        now = time.monotonic()
+        index = _indexes.get(dataset_name)
+        if index is not None and now - _checked_at.get(dataset_name, 0.0) < RECHECK_SECONDS:
+            return index
+
+        con = get_read_cursor()
+        fingerprint = dataset_fingerprint(con, dataset_name)
+        if index is None or index.fingerprint != fingerprint:
+            # Postings missing or built from older rows: rebuild them
+            if _stored_fingerprint(con, dataset_name) != fingerprint:
+                if is_read_only():
+                    print(f"RAG index for '{dataset_name}' is missing or stale (database is read-only).")
+                    return None
+                with db_writer() as writer:
+                    build_rag_index(writer, dataset_name)
+            index = _load_index(con, dataset_name, fingerprint)
+            if index is None:
+                return None
+            _indexes[dataset_name] = index
+        _checked_at[dataset_name] = now
+        return index
+
+
+def invalidate_bm25_index(dataset_name: str | None = None) -> None:
+    """
+    Drop cached indexes (all of them, or one dataset's) after re-ingesting data.
+    """
+    with _indexes_lock:
+        if dataset_name is None:
+            _indexes.clear()
+            _checked_at.clear()
+        else:
+            _indexes.pop(dataset_name, None)
+            _checked_at.pop(dataset_name, None)
@@ -0,0 +1,365 @@
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+from src.config import EMBED_MODEL_PATH, PROJECT_ROOT
+from src.db.duckdb_conn import get_read_cursor, db_writer
+from src.db.schema import RAG_VECTORS_SQL
+from src.retrieval.bm25 import text_md5, dataset_fingerprint
+
+EMBEDDINGS_DIR = Path(PROJECT_ROOT) / "outputs" / "embeddings"
+EMBED_BATCH = 32
+# Brute force scores this many float16 rows per step (bounded float32 scratch memory)
+SCAN_ROWS = 4096
+# Matrices whose float32 copy fits this budget are held in RAM: converting float16
+# on every query costs ~15x the dot products themselves
+PRELOAD_MAX_MB = 512
+# Datasets at least this large are served through an HNSW graph (if hnswlib is installed)
+HNSW_MIN_ITEMS = 20000
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 128
+
+
+def _embedder():
+    # Imported lazily: loading llama.cpp is only needed when vectors are computed
+    from src.llm.embedder import get_embedder
+
+    return get_embedder()
+
+
+def _model_tag() -> str:
+    # Same tag as LocalEmbedder.model_tag, known without loading the model
+    return Path(EMBED_MODEL_PATH).stem
+
+
+def _vector_set(con, dataset_name: str, model: str):
+    try:
+        return con.execute(
+            "SELECT path, dim, fingerprint FROM rag_vector_sets WHERE dataset_name = ? AND model = ?",
+            [dataset_name, model],
+        ).fetchone()
+    except duckdb.CatalogException:
+        return None
+
+
+def update_dense_index(dataset_name: str, embedder=None, show_progress: bool = False) -> int:
+    """
+    Embed one dataset's sources into a new float16 matrix and register it.
+
+    Vectors of unchanged sources (same md5) are copied from the previous matrix,
+    so only new or edited items are embedded. Embedding runs outside the database
+    lock; only the final swap of `rag_vectors` is a write transaction. Returns the
+    number of items embedded.
+    """
+    embedder = embedder or _embedder()
+    model = embedder.model_tag
+    con = get_read_cursor()
+    fingerprint = dataset_fingerprint(con, dataset_name)
+    items = con.execute(
+        "SELECT item_id, src_text FROM dataset_items WHERE dataset_name = ? ORDER BY item_id", [dataset_name]
+    ).fetchall()
+
+    previous = _vector_set(con, dataset_name, model)
+    old_rows, old_matrix = {}, None
+    if previous is not None and os.path.exists(Path(PROJECT_ROOT) / previous[0]):
+        old_matrix = np.load(Path(PROJECT_ROOT) / previous[0], mmap_mode="r")
+        old_rows = dict(
+            con.execute(
+                "SELECT src_md5, vec_row FROM rag_vectors WHERE dataset_name = ? AND model = ?",
+                [dataset_name, model],
+            ).fetchall()
+        )
+
+    EMBEDDINGS_DIR.mkdir(parents=True, exist_ok=True)
+    path = EMBEDDINGS_DIR / f"{dataset_name}.{model}.{uuid.uuid4().hex[:8]}.npy"
+    matrix = np.lib.format.open_memmap(path, mode="w+", dtype=np.float16, shape=(len(items), embedder.dim))
+
+    md5s = [text_md5(src) for _, src in items]
+    todo = []
+    for row, md5 in enumerate(md5s):
+        if md5 in old_rows and old_matrix is not None and old_matrix.shape[1] == embedder.dim:
+            matrix[row] = old_matrix[old_rows[md5]]
+        else:
+            todo.append(row)
+
+    starts = range(0, len(todo), EMBED_BATCH)
+    if show_progress:
+        starts = tqdm(starts, desc=f"Embedding {dataset_name}")
+    try:
+        for start in starts:
+            rows = todo[start : start + EMBED_BATCH]
+            matrix[rows] = embedder.embed([items[r][1] for r in rows])
+        matrix.flush()
+        del matrix
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+    vectors_df = pd.DataFrame({
+        "item_id": [item_id for item_id, _ in items],
+        "vec_row": np.arange(len(items), dtype=np.int32),
+        "src_md5": md5s,
+    })
+    with db_writer() as writer:
+        writer.execute(RAG_VECTORS_SQL)
+        writer.execute("DELETE FROM rag_vectors WHERE dataset_name = ? AND model = ?", [dataset_name, model])
+        writer.register("rag_vectors_batch", vectors_df)
+        try:
+            writer.execute(
+                "INSERT INTO rag_vectors SELECT ?, ?, item_id, vec_row, src_md5 FROM rag_vectors_batch",
+                [dataset_name, model],
+            )
+        finally:
+            writer.unregister("rag_vectors_batch")
+        writer.execute(
+            "INSERT OR REPLACE INTO rag_vector_sets VALUES (?, ?, ?, ?, ?, ?)",
+            [dataset_name, model, path.relative_to(PROJECT_ROOT).as_posix(), embedder.dim, fingerprint, datetime.now()],
+        )
+
+    # Processes that still map the old matrix keep reading it until they reload
+    if previous is not None and previous[0] != path.relative_to(PROJECT_ROOT).as_posix():
+        old_path = Path(PROJECT_ROOT) / previous[0]
+        old_path.unlink(missing_ok=True)
+        old_path.with_suffix(".hnsw").unlink(missing_ok=True)
+    return len(todo)
+
+
+class DenseIndex:
+    """
+    Dense-vector index of one dataset: a float16 matrix of unit vectors (memory-
+    mapped; converted to float32 in RAM when small), scored against the query
+    embedding by cosine similarity.
+
+    Small datasets are scanned exactly (chunked matrix-vector products); large
+    ones go through an HNSW graph when hnswlib is installed, built on first load
+    and saved next to the matrix.
+    """
+
+    def __init__(
+        self,
+        dataset_name: str,
+        item_ids,
+        doc_md5,
+        vectors: np.ndarray,
+        src_texts,
+        tgt_texts,
+        embedder=None,
+        fingerprint: str = "",
+        hnsw_path: Path | None = None,
+    ):
+        self.dataset_name = dataset_name
+        self.fingerprint = fingerprint
+        self.item_ids = np.asarray(item_ids, dtype=np.int64)
+        self.doc_md5 = np.asarray(doc_md5, dtype=object)
+        if vectors.size * 4 <= PRELOAD_MAX_MB * 1024 * 1024:
+            vectors = np.asarray(vectors, dtype=np.float32)
+        self.vectors = vectors
+        self.texts = dict(zip(self.item_ids.tolist(), zip(src_texts, tgt_texts)))
+        self.embedder = embedder
+        self.hnsw = None
+        if hnswlib is not None and len(self.item_ids) >= HNSW_MIN_ITEMS:
+            self.hnsw = self._load_hnsw(hnsw_path)
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+    def _load_hnsw(self, path: Path | None):
+        graph = hnswlib.Index(space="ip", dim=self.vectors.shape[1])
+        if path is not None and path.exists():
+            graph.load_index(str(path), max_elements=len(self.item_ids))
+        else:
+            print(f"Building HNSW graph for '{self.dataset_name}' ({len(self.item_ids)} vectors)...")
+            graph.init_index(max_elements=len(self.item_ids), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+            for start in range(0, len(self.item_ids), SCAN_ROWS):
+                chunk = np.asarray(self.vectors[start : start + SCAN_ROWS], dtype=np.float32)
+                graph.add_items(chunk, np.arange(start, start + len(chunk)))
+            if path is not None:
+                try:
+                    graph.save_index(str(path))
+                except OSError as e:
+                    print(f"⚠️ HNSW graph not saved: {e}")
+        graph.set_ef(HNSW_EF_SEARCH)
+        return graph
+
+    def _allowed(self, rows: np.ndarray, query_md5: str, exclude_id, min_id, max_id) -> np.ndarray:
+        ids = self.item_ids[rows]
+        keep = self.doc_md5[rows] != query_md5
+        if exclude_id is not None:
+            keep &= ids != exclude_id
+        if min_id is not None:
+            keep &= ids >= min_id
+        if max_id is not None:
+            keep &= ids <= max_id
+        return keep
+
+    def _scan(self, query_vec: np.ndarray) -> np.ndarray:
+        scores = np.empty(len(self.item_ids), dtype=np.float32)
+        for start in range(0, len(scores), SCAN_ROWS):
+            chunk = np.asarray(self.vectors[start : start + SCAN_ROWS], dtype=np.float32)
+            scores[start : start + len(chunk)] = chunk @ query_vec
+        return scores
+
+    def score_block(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of the indexed documents `rows` against every document:
+        (len(rows), n_docs). The stored vectors serve as query embeddings, so no
+        model call is needed (all-pairs neighbour tables).
+        """
+        queries = np.asarray(self.vectors[np.asarray(rows, dtype=np.int64)], dtype=np.float32)
+        scores = np.empty((len(queries), len(self.item_ids)), dtype=np.float32)
+        for start in range(0, len(self.item_ids), SCAN_ROWS):
+            chunk = np.asarray(self.vectors[start : start + SCAN_ROWS], dtype=np.float32)
+            scores[:, start : start + len(chunk)] = queries @ chunk.T
+        return scores
+
+    def search(
+        self,
+        query: str,
+        k: int = 3,
+        exclude_id: int | None = None,
+        min_id: int | None = None,
+        max_id: int | None = None,
+        min_score: float = 0.0,
+    ) -> list[tuple[int, float]]:
+        """
+        Top-k (item_id, cosine) for `query`, same filters as BM25Index.search.
+        """
+        if not query or not query.strip():
+            return []
+        query_vec = (self.embedder or _embedder()).embed([query])[0]
+        query_md5 = text_md5(query)
+
+        if self.hnsw is not None:
+            # Over-fetch so the id filters still leave k results; fall back to the exact scan otherwise
+            n = min(len(self.item_ids), max(4 * k, 32))
+            labels, distances = self.hnsw.knn_query(query_vec, k=n)
+            rows, scores = labels[0].astype(np.int64), 1.0 - distances[0]
+            keep = self._allowed(rows, query_md5, exclude_id, min_id, max_id) & (scores >= min_score)
+            if keep.sum() >= k:
+                rows, scores = rows[keep], scores[keep]
+                order = np.lexsort((self.item_ids[rows], -scores))[:k]
+                return [(int(self.item_ids[rows[i]]), float(scores[i])) for i in order]
+
+        scores = self._scan(query_vec)
+        rows = np.flatnonzero(scores >= min_score)
+        rows = rows[self._allowed(rows, query_md5, exclude_id, min_id, max_id)]
+        scores = scores[rows]
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.lexsort((self.item_ids[rows], -scores))
+        return [(int(self.item_ids[rows[i]]), float(scores[i])) for i in order]
+
+
+def _load_index(con, dataset_name: str, model: str, fingerprint: str) -> DenseIndex | None:
+    vector_set = _vector_set(con, dataset_name, model)
+    if vector_set is None:
+        return None
+    path = Path(PROJECT_ROOT) / vector_set[0]
+    if not path.exists():
+        print(f"Embedding matrix missing for '{dataset_name}': {path}")
+        return None
+
+    docs = con.execute(
+        """
+        SELECT v.vec_row, v.item_id, v.src_md5, d.src_text, d.tgt_text
+        FROM rag_vectors v
+        JOIN dataset_items d USING (dataset_name, item_id)
+        WHERE v.dataset_name = ? AND v.model = ?
+        ORDER BY v.vec_row
+        """,
+        [dataset_name, model],
+    ).fetchnumpy()
+    if len(docs["item_id"]) == 0:
+        return None
+    vectors = np.load(path, mmap_mode="r")
+    hnsw_path = path.with_suffix(".hnsw")
+    if len(docs["vec_row"]) != len(vectors):
+        # Items deleted since the build: keep the surviving rows (in memory); the saved graph does not apply
+        vectors, hnsw_path = np.asarray(vectors[docs["vec_row"]]), None
+    return DenseIndex(
+        dataset_name,
+        docs["item_id"],
+        docs["src_md5"],
+        vectors,
+        docs["src_text"],
+        docs["tgt_text"],
+        None,
+        fingerprint,
+        hnsw_path,
+    )
+
+
+_indexes: dict[str, DenseIndex] = {}
+_checked_at: dict[str, float] = {}
+_indexes_lock = threading.Lock()
+
+# How often (seconds) a cached index re-checks its dataset for changes
+RECHECK_SECONDS = 30.0
+
+
+def dense_index_ready(dataset_name: str) -> bool:
+    """
+    Whether up-to-date embeddings of the dataset exist for the configured model.
+    """
+    con = get_read_cursor()
+    vector_set = _vector_set(con, dataset_name, _model_tag())
+    return (
+        vector_set is not None
+        and vector_set[2] == dataset_fingerprint(con, dataset_name)
+        and (Path(PROJECT_ROOT) / vector_set[0]).exists()
+    )
+
+
+def get_dense_index(dataset_name: str) -> DenseIndex | None:
+    """
+    Process-wide dense index of one dataset, loaded from the embeddings built
+    by scripts/build_embeddings.py. Returns None when they are missing or stale:
+    embedding a dataset takes minutes and is never done on a query. The
+    embedding model itself is loaded on the first search.
+    """
+    with _indexes_lock:
+        now = time.monotonic()
+        index = _indexes.get(dataset_name)
+        if index is not None and now - _checked_at.get(dataset_name, 0.0) < RECHECK_SECONDS:
+            return index
+
+        model = _model_tag()
+        con = get_read_cursor()
+        fingerprint = dataset_fingerprint(con, dataset_name)
+        if index is None or index.fingerprint != fingerprint:
+            _indexes.pop(dataset_name, None)
+            vector_set = _vector_set(con, dataset_name, model)
+            if vector_set is None or vector_set[2] != fingerprint:
+                print(f"Embeddings for '{dataset_name}' ({model}) are missing or stale: run scripts/build_embeddings.py")
+                return None
+            index = _load_index(con, dataset_name, model, fingerprint)
+            if index is None:
+                return None
+            _indexes[dataset_name] = index
+        _checked_at[dataset_name] = now
+        return index
+
+
+def invalidate_dense_index(dataset_name: str | None = None) -> None:
+    with _indexes_lock:
+        if dataset_name is None:
+            _indexes.clear()
+            _checked_at.clear()
+        else:
+            _indexes.pop(dataset_name, None)
+            _checked_at.pop(dataset_name, None)
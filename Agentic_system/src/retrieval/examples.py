@@ -0,0 +1,103 @@
+from src.config import RAG_ENGINE
+from src.db.duckdb_conn import get_read_cursor
+from src.retrieval.bm25 import build_rag_index, get_bm25_index, invalidate_bm25_index
+from src.retrieval.minhash import update_minhash_index, get_minhash_index, invalidate_minhash_index
+from src.retrieval.dense import dense_index_ready, get_dense_index, invalidate_dense_index
+
+# name -> getter of a per-dataset index exposing `.search(...)` and `.texts`
+ENGINES = {
+    "bm25": get_bm25_index,
+    "minhash": get_minhash_index,
+    "dense": get_dense_index,
+}
+
+
+def list_datasets() -> list[str]:
+    rows = get_read_cursor().execute(
+        "SELECT DISTINCT dataset_name FROM dataset_items ORDER BY dataset_name"
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def index_dataset(con, dataset_name: str) -> None:
+    """
+    Update the lexical retrieval indexes of a dataset after (re)loading its rows.
+    Call with the writer cursor used for the load. Dense vectors need the
+    embedding model and are computed by scripts/build_embeddings.py.
+    """
+    build_rag_index(con, dataset_name)
+    update_minhash_index(con, dataset_name)
+
+
+def missing_dense_indexes(dataset_scope: str | None = None) -> list[str]:
+    """
+    Datasets of `dataset_scope` (None or "All": every dataset) that the dense
+    engine would search with bm25 instead, for lack of prebuilt embeddings.
+    """
+    datasets = list_datasets() if dataset_scope in (None, "All") else [dataset_scope]
+    return [d for d in datasets if not dense_index_ready(d)]
+
+
+def invalidate_indexes(dataset_name: str | None = None) -> None:
+    invalidate_bm25_index(dataset_name)
+    invalidate_minhash_index(dataset_name)
+    invalidate_dense_index(dataset_name)
+
+
+def retrieve_examples(
+    src_text: str,
+    dataset_scope: str | None = None,
+    k: int = 3,
+    exclude_id: int | None = None,
+    min_id: int | None = None,
+    max_id: int | None = None,
+    min_score: float = 0.1,
+    engine: str | None = None,
+) -> list[tuple[str, str, float]]:
+    """
+    Few-shot examples most similar to `src_text`: [(src, tgt, score)], best first.
+
+    `dataset_scope` None (or "All") searches every dataset; `exclude_id` and the
+    `min_id`/`max_id` range apply to item ids (leave-one-out and split rules of
+    the evaluation). Items whose source equals the query are skipped.
+
+    `engine` selects the index (default: config.RAG_ENGINE):
+    - "bm25": character n-gram BM25, exact ranking over the postings touched;
+    - "minhash": LSH candidates re-ranked by exact n-gram Jaccard, flat latency on large corpora;
+    - "dense": cosine similarity of sentence embeddings, finds paraphrased and inflected matches.
+      Datasets without prebuilt embeddings (scripts/build_embeddings.py) are searched with bm25.
+    """
+    if not src_text or k <= 0:
+        return []
+    get_index = ENGINES[engine or RAG_ENGINE]
+
+    datasets = list_datasets() if dataset_scope in (None, "All") else [dataset_scope]
+    hits = []
+    for dataset_name in datasets:
+        index = get_index(dataset_name)
+        if index is None and get_index is get_dense_index:
+            index = get_bm25_index(dataset_name)
+        if index is None:
+            continue
+        for item_id, score in index.search(src_text, k, exclude_id, min_id, max_id, min_score):
+            src, tgt = index.texts[item_id]
+            hits.append((src, tgt, score))
+
+    hits.sort(key=lambda h: -h[2])
+    return hits[:k]
+
+
+def format_examples(examples: list[tuple[str, str, float]]) -> str | None:
+    """
+    Render examples as the few-shot block used in the prompts.
+    """
+    if not examples:
+        return None
+
+    builder = []
+    for src, tgt, _ in examples:
+        s_clean = src.replace('\n', ' ').strip()
+        t_clean = tgt.replace('\n', ' ').strip()
+        builder.append(f"Source: {s_clean}\nTarget: {t_clean}")
+
+    return "\n\n".join(builder)
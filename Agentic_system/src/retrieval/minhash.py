@@ -0,0 +1,343 @@
+import hashlib
+import threading
+import time
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from src.db.duckdb_conn import get_read_cursor, db_writer, is_read_only
+from src.db.schema import RAG_MINHASH_SQL
+from src.retrieval.bm25 import char_ngrams, text_md5, dataset_fingerprint
+
+NUM_PERM = 64
+# 32 bands x 2 rows: items with shingle Jaccard above ~0.18 collide in at least one
+# band with high probability, loose enough for few-shot neighbours, not only duplicates.
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+# Re-ranking is bounded: only the items sharing the most bands are scored (exact Jaccard)
+MAX_CANDIDATES = 200
+
+_SEEDS = np.random.RandomState(20240501).randint(0, 2**63 - 1, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_BAND_SALT = np.arange(1, BANDS + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+
+_shingle_hashes: dict[str, int] = {}
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """
+    splitmix64 finalizer, vectorized (uint64 arithmetic wraps around).
+    """
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _shingle_hash(shingle: str) -> int:
+    # Stable across processes (unlike hash()), memoized: the n-gram vocabulary is small
+    h = _shingle_hashes.get(shingle)
+    if h is None:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        _shingle_hashes[shingle] = h
+    return h
+
+
+def minhash_signatures(texts: list[str]) -> np.ndarray:
+    """
+    (len(texts), NUM_PERM) uint64 MinHash signatures over character n-gram shingles.
+    """
+    signatures = np.full((len(texts), NUM_PERM), np.iinfo(np.uint64).max, dtype=np.uint64)
+    for i, text in enumerate(texts):
+        shingles = list(char_ngrams(text))
+        if not shingles:
+            continue
+        hashes = np.fromiter((_shingle_hash(s) for s in shingles), dtype=np.uint64, count=len(shingles))
+        signatures[i] = _mix64(hashes[:, None] ^ _SEEDS[None, :]).min(axis=0)
+    return signatures
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """
+    (n, BANDS) int64 LSH bucket keys; the band number is mixed in, so keys of
+    different bands never collide and all bands can share one sorted array.
+    """
+    keys = np.empty((len(signatures), BANDS), dtype=np.uint64)
+    for band in range(BANDS):
+        acc = np.full(len(signatures), _BAND_SALT[band], dtype=np.uint64)
+        for row in range(ROWS):
+            acc = _mix64(acc ^ signatures[:, band * ROWS + row])
+        keys[:, band] = acc
+    return keys.view(np.int64)
+
+
+def update_minhash_index(con, dataset_name: str) -> int:
+    """
+    Bring one dataset's LSH buckets in line with `dataset_items`, computing
+    signatures only for new or changed items. Call with the writer cursor that
+    loaded the dataset. Returns the number of items (re)hashed.
+    """
+    con.execute(RAG_MINHASH_SQL)
+    items = con.execute(
+        "SELECT item_id, src_text FROM dataset_items WHERE dataset_name = ?", [dataset_name]
+    ).fetchall()
+    current = {item_id: (src, text_md5(src)) for item_id, src in items}
+    stored = dict(
+        con.execute(
+            "SELECT item_id, src_md5 FROM rag_minhash_docs WHERE dataset_name = ?", [dataset_name]
+        ).fetchall()
+    )
+
+    stale = [i for i, md5 in stored.items() if current.get(i, (None, None))[1] != md5]
+    fresh = [i for i, (_, md5) in current.items() if stored.get(i) != md5]
+
+    if stale:
+        con.execute(
+            "DELETE FROM rag_minhash WHERE dataset_name = ? AND item_id IN (SELECT unnest(?::INTEGER[]))",
+            [dataset_name, stale],
+        )
+        con.execute(
+            "DELETE FROM rag_minhash_docs WHERE dataset_name = ? AND item_id IN (SELECT unnest(?::INTEGER[]))",
+            [dataset_name, stale],
+        )
+    if not fresh:
+        return 0
+
+    signatures = minhash_signatures([current[i][0] for i in fresh])
+    keys = band_keys(signatures)
+    docs_df = pd.DataFrame({
+        "item_id": fresh,
+        "src_md5": [current[i][1] for i in fresh],
+        "signature": [sig.astype("<u8").tobytes() for sig in signatures],
+    })
+    buckets_df = pd.DataFrame({"item_id": np.repeat(fresh, BANDS), "bucket": keys.ravel()})
+    con.register("minhash_docs_batch", docs_df)
+    con.register("minhash_batch", buckets_df)
+    try:
+        con.execute("INSERT INTO rag_minhash_docs SELECT ?, item_id, src_md5, signature FROM minhash_docs_batch", [dataset_name])
+        con.execute("INSERT INTO rag_minhash SELECT ?, bucket, item_id FROM minhash_batch ORDER BY bucket", [dataset_name])
+    finally:
+        con.unregister("minhash_docs_batch")
+        con.unregister("minhash_batch")
+    return len(fresh)
+
+
+class MinHashIndex:
+    """
+    In-memory LSH index of one dataset: one sorted array of bucket keys with the
+    document of each entry. A query looks up its BANDS keys with binary search, so
+    candidate generation costs the same however large the corpus is; the (at most
+    MAX_CANDIDATES) candidates are then re-ranked by their exact character n-gram
+    Jaccard similarity with the query, so estimation noise of the 64-value
+    signatures does not decide the examples.
+    """
+
+    def __init__(
+        self,
+        dataset_name: str,
+        buckets,
+        bucket_items,
+        item_ids,
+        doc_md5,
+        signatures: np.ndarray,
+        src_texts,
+        tgt_texts,
+        fingerprint: str = "",
+    ):
+        self.dataset_name = dataset_name
+        self.fingerprint = fingerprint
+        self.item_ids = np.asarray(item_ids, dtype=np.int64)
+        self.doc_md5 = np.asarray(doc_md5, dtype=object)
+        self.signatures = signatures
+        self._doc_keys = None
+        self._doc_grams: dict[int, frozenset] = {}
+        self.texts = dict(zip(self.item_ids.tolist(), zip(src_texts, tgt_texts)))
+
+        # item_id -> dense document index, then bucket entries sorted by key
+        by_id = np.argsort(self.item_ids)
+        bucket_items = np.asarray(bucket_items, dtype=np.int64)
+        bucket_docs = by_id[np.searchsorted(self.item_ids[by_id], bucket_items)]
+        order = np.argsort(buckets, kind="stable")
+        self.buckets = np.asarray(buckets, dtype=np.int64)[order]
+        self.bucket_docs = bucket_docs[order].astype(np.int32)
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+    def candidates(
+        self,
+        query: str,
+        exclude_id: int | None = None,
+        min_id: int | None = None,
+        max_id: int | None = None,
+    ) -> np.ndarray:
+        """
+        Item ids sharing at least one band with the query that pass the id filters,
+        most shared bands first (at most MAX_CANDIDATES).
+        """
+        keys = band_keys(minhash_signatures([query]))[0]
+        return self.item_ids[self._candidates(keys, exclude_id, min_id, max_id)]
+
+    def _candidates(self, keys, exclude_id, min_id, max_id) -> np.ndarray:
+        left = np.searchsorted(self.buckets, keys, side="left")
+        right = np.searchsorted(self.buckets, keys, side="right")
+        hits = [self.bucket_docs[l:r] for l, r in zip(left, right) if r > l]
+        if not hits:
+            return np.empty(0, dtype=np.int64)
+        docs, counts = np.unique(np.concatenate(hits), return_counts=True)
+
+        ids = self.item_ids[docs]
+        keep = np.ones(len(docs), dtype=bool)
+        if exclude_id is not None:
+            keep &= ids != exclude_id
+        if min_id is not None:
+            keep &= ids >= min_id
+        if max_id is not None:
+            keep &= ids <= max_id
+        docs, counts = docs[keep], counts[keep]
+        return docs[np.argsort(-counts, kind="stable")][:MAX_CANDIDATES]
+
+    def _grams(self, doc: int) -> frozenset:
+        grams = self._doc_grams.get(doc)
+        if grams is None:
+            grams = frozenset(char_ngrams(self.texts[int(self.item_ids[doc])][0]))
+            self._doc_grams[doc] = grams
+        return grams
+
+    def jaccard(self, query_grams: frozenset, docs: np.ndarray) -> np.ndarray:
+        """
+        Exact character n-gram Jaccard similarity of a query's n-grams with `docs`.
+        """
+        scores = np.zeros(len(docs), dtype=np.float64)
+        for i, doc in enumerate(docs.tolist()):
+            grams = self._grams(doc)
+            union = len(query_grams | grams)
+            if union:
+                scores[i] = len(query_grams & grams) / union
+        return scores
+
+    def search(
+        self,
+        query: str,
+        k: int = 3,
+        exclude_id: int | None = None,
+        min_id: int | None = None,
+        max_id: int | None = None,
+        min_score: float = 0.0,
+    ) -> list[tuple[int, float]]:
+        """
+        Top-k (item_id, jaccard) among the LSH candidates, re-ranked by exact
+        n-gram Jaccard; same filters as BM25Index.search.
+        """
+        query_grams = frozenset(char_ngrams(query))
+        if not query_grams:
+            return []
+        docs = self._candidates(band_keys(minhash_signatures([query]))[0], exclude_id, min_id, max_id)
+        if len(docs) == 0:
+            return []
+
+        scores = self.jaccard(query_grams, docs)
+        keep = (scores >= min_score) & (self.doc_md5[docs] != text_md5(query))
+        ids, scores = self.item_ids[docs[keep]], scores[keep]
+        order = np.lexsort((ids, -scores))[:k]
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+    def score_block(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Exact n-gram Jaccard of the indexed documents `rows` against their LSH
+        candidates (the MAX_CANDIDATES documents sharing the most bands, as in
+        `search`): (len(rows), n_docs), 0 for every other document. Used to
+        precompute all-pairs neighbour tables.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if self._doc_keys is None:
+            self._doc_keys = band_keys(self.signatures)
+        scores = np.zeros((len(rows), len(self.item_ids)), dtype=np.float32)
+        # (queries x docs x BANDS) key comparisons in slices of ~16M bytes
+        step = max(1, (1 << 24) // (len(self.item_ids) * BANDS))
+        for start in range(0, len(rows), step):
+            block = rows[start : start + step]
+            shared = (self._doc_keys[block][:, None, :] == self._doc_keys[None, :, :]).sum(axis=2)
+            for q, row in enumerate(block.tolist()):
+                docs = np.flatnonzero(shared[q])
+                docs = docs[np.argsort(-shared[q, docs], kind="stable")][:MAX_CANDIDATES]
+                scores[start + q, docs] = self.jaccard(self._grams(row), docs)
+        return scores
+
+
+def _load_index(con, dataset_name: str, fingerprint: str) -> MinHashIndex | None:
+    try:
+        docs = con.execute(
+            """
+            SELECT m.item_id, m.src_md5, m.signature, d.src_text, d.tgt_text
+            FROM rag_minhash_docs m
+            JOIN dataset_items d USING (dataset_name, item_id)
+            WHERE m.dataset_name = ?
+            """,
+            [dataset_name],
+        ).fetchall()
+        buckets = con.execute(
+            "SELECT bucket, item_id FROM rag_minhash WHERE dataset_name = ?", [dataset_name]
+        ).fetchnumpy()
+    except duckdb.CatalogException:
+        print(f"MinHash index for '{dataset_name}' has not been built (database is read-only).")
+        return None
+    if not docs:
+        return None
+    item_ids, doc_md5, signatures, src_texts, tgt_texts = zip(*docs)
+    return MinHashIndex(
+        dataset_name,
+        buckets["bucket"],
+        buckets["item_id"],
+        item_ids,
+        doc_md5,
+        np.frombuffer(b"".join(signatures), dtype="<u8").reshape(len(docs), NUM_PERM),
+        src_texts,
+        tgt_texts,
+        fingerprint,
+    )
+
+
+_indexes: dict[str, MinHashIndex] = {}
+_checked_at: dict[str, float] = {}
+_indexes_lock = threading.Lock()
+
+# How often (seconds) a cached index re-checks its dataset for changes
+RECHECK_SECONDS = 30.0
+
+
+def get_minhash_index(dataset_name: str) -> MinHashIndex | None:
+    """
+    Process-wide LSH index of one dataset, reloaded (and its buckets brought up to
+    date) when the dataset's rows change.
+    """
+    with _indexes_lock:
+        now = time.monotonic()
+        index = _indexes.get(dataset_name)
+        if index is not None and now - _checked_at.get(dataset_name, 0.0) < RECHECK_SECONDS:
+            return index
+
+        con = get_read_cursor()
+        fingerprint = dataset_fingerprint(con, dataset_name)
+        if index is None or index.fingerprint != fingerprint:
+            # Incremental: only new or changed items are hashed (a no-op when up to date)
+            if not is_read_only():
+                with db_writer() as writer:
+                    update_minhash_index(writer, dataset_name)
+            index = _load_index(con, dataset_name, fingerprint)
+            if index is None:
+                return None
+            _indexes[dataset_name] = index
+        _checked_at[dataset_name] = now
+        return index
+
+
+def invalidate_minhash_index(dataset_name: str | None = None) -> None:
+    with _indexes_lock:
+        if dataset_name is None:
+            _indexes.clear()
+            _checked_at.clear()
+        else:
+            _indexes.pop(dataset_name, None)
+            _checked_at.pop(dataset_name, None)
@@ -0,0 +1,154 @@
+from datetime import datetime
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from src.db.duckdb_conn import get_read_cursor, db_writer, is_read_only
+from src.db.schema import RAG_NEIGHBORS_SQL
+from src.retrieval.bm25 import dataset_fingerprint
+from src.retrieval.examples import ENGINES
+
+# Split strategies of the evaluation page:
+# - "loo": every item is a query, searched against all other items (leave-one-out);
+# - "half": items of the 1st half (by item_id) are queries, searched in the 2nd half.
+STRATEGIES = ("loo", "half")
+# Neighbours stored per item (the evaluation page offers k up to 10)
+NEIGHBORS_K = 10
+# Query rows are scored in blocks of at most this many (query, document) pairs
+BLOCK_PAIRS = 2_000_000
+
+
+def strategy_split(item_ids: np.ndarray, strategy: str) -> tuple[np.ndarray, int | None, int | None]:
+    """
+    Query item ids and the (min_id, max_id) search range of a split strategy,
+    as the evaluation page defines them.
+    """
+    ids = np.sort(np.asarray(item_ids, dtype=np.int64))
+    if strategy == "loo":
+        return ids, None, None
+    if strategy == "half":
+        mid = len(ids) // 2
+        if mid == len(ids):
+            return ids[:mid], None, None
+        return ids[:mid], int(ids[mid]), int(ids[-1])
+    raise ValueError(f"Unknown split strategy: {strategy}")
+
+
+def compute_neighbors(index, strategy: str, k: int = NEIGHBORS_K) -> pd.DataFrame:
+    """
+    Top-k neighbours of every query item of `strategy`, with the filters of an
+    online search (the query itself and items with the same source are skipped).
+    The index scores blocks of queries against all items at once (`score_block`).
+    """
+    query_ids, min_id, max_id = strategy_split(index.item_ids, strategy)
+    dense_of = {item_id: i for i, item_id in enumerate(index.item_ids.tolist())}
+    query_rows = np.array([dense_of[i] for i in query_ids.tolist()], dtype=np.int64)
+
+    # Documents outside the search range never qualify; exact duplicates are masked per query
+    allowed = np.ones(len(index.item_ids), dtype=bool)
+    if min_id is not None:
+        allowed &= (index.item_ids >= min_id) & (index.item_ids <= max_id)
+    _, md5_codes = np.unique(index.doc_md5.astype(str), return_inverse=True)
+
+    out = {"item_id": [], "nb_rank": [], "neighbor_id": [], "score": []}
+    k = min(k, len(index.item_ids))
+    block = max(1, BLOCK_PAIRS // max(1, len(index.item_ids)))
+    for start in range(0, len(query_rows), block):
+        rows = query_rows[start : start + block]
+        scores = np.asarray(index.score_block(rows), dtype=np.float64)
+
+        mask = allowed[None, :] & (md5_codes[None, :] != md5_codes[rows][:, None]) & (scores > 0)
+        scores = np.where(mask, scores, -np.inf)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < scores.shape[1] else np.argsort(-scores, axis=1)
+
+        for r, row in enumerate(rows):
+            cols = top[r][np.isfinite(scores[r, top[r]])]
+            ids = index.item_ids[cols]
+            order = np.lexsort((ids, -scores[r, cols]))
+            for rank, c in enumerate(order):
+                out["item_id"].append(int(index.item_ids[row]))
+                out["nb_rank"].append(rank)
+                out["neighbor_id"].append(int(ids[c]))
+                out["score"].append(float(scores[r, cols[c]]))
+    return pd.DataFrame(out)
+
+
+def build_neighbors(dataset_name: str, engine: str, k: int = NEIGHBORS_K) -> int:
+    """
+    (Re)compute the neighbour tables of one dataset and engine for every split
+    strategy. Returns the number of stored rows.
+    """
+    index = ENGINES[engine](dataset_name)
+    if index is None:
+        return 0
+
+    frames = {strategy: compute_neighbors(index, strategy, k) for strategy in STRATEGIES}
+    with db_writer() as con:
+        con.execute(RAG_NEIGHBORS_SQL)
+        for strategy, df in frames.items():
+            con.execute(
+                "DELETE FROM rag_neighbors WHERE dataset_name = ? AND strategy = ? AND engine = ?",
+                [dataset_name, strategy, engine],
+            )
+            con.register("rag_neighbors_batch", df)
+            try:
+                con.execute(
+                    "INSERT INTO rag_neighbors SELECT ?, ?, ?, item_id, nb_rank, neighbor_id, score "
+                    "FROM rag_neighbors_batch ORDER BY item_id, nb_rank",
+                    [dataset_name, strategy, engine],
+                )
+            finally:
+                con.unregister("rag_neighbors_batch")
+            con.execute(
+                "INSERT OR REPLACE INTO rag_neighbor_sets VALUES (?, ?, ?, ?, ?, ?)",
+                [dataset_name, strategy, engine, k, index.fingerprint, datetime.now()],
+            )
+    return sum(len(df) for df in frames.values())
+
+
+def _neighbor_set(con, dataset_name: str, strategy: str, engine: str):
+    try:
+        return con.execute(
+            "SELECT k, fingerprint FROM rag_neighbor_sets WHERE dataset_name = ? AND strategy = ? AND engine = ?",
+            [dataset_name, strategy, engine],
+        ).fetchone()
+    except duckdb.CatalogException:
+        return None
+
+
+def get_neighbors(
+    dataset_name: str,
+    strategy: str,
+    engine: str,
+    k: int = 3,
+    min_score: float = 0.1,
+) -> dict[int, list[tuple[str, str, float]]] | None:
+    """
+    Stored few-shot examples of every query item: {item_id: [(src, tgt, score)]},
+    best first, as `retrieve_examples` would return them. Missing or stale tables
+    are rebuilt when the database is writable; otherwise None (query online).
+    """
+    con = get_read_cursor()
+    stored = _neighbor_set(con, dataset_name, strategy, engine)
+    if stored is None or stored[0] < k or stored[1] != dataset_fingerprint(con, dataset_name):
+        if is_read_only():
+            return None
+        print(f"Computing {engine} neighbours of '{dataset_name}'...")
+        if not build_neighbors(dataset_name, engine, max(k, NEIGHBORS_K)):
+            return None
+
+    rows = con.execute(
+        """
+        SELECT n.item_id, d.src_text, d.tgt_text, n.score
+        FROM rag_neighbors n
+        JOIN dataset_items d ON d.dataset_name = n.dataset_name AND d.item_id = n.neighbor_id
+        WHERE n.dataset_name = ? AND n.strategy = ? AND n.engine = ? AND n.nb_rank < ? AND n.score >= ?
+        ORDER BY n.item_id, n.nb_rank
+        """,
+        [dataset_name, strategy, engine, k, min_score],
+    ).fetchall()
+    neighbors: dict[int, list] = {}
+    for item_id, src, tgt, score in rows:
+        neighbors.setdefault(item_id, []).append((src, tgt, score))
+    return neighbors
@@ -0,0 +1,61 @@
+from collections import deque
+
+
+class AhoCorasick:
+    """
+    Minimal Aho–Corasick automaton: finds all occurrences of many patterns in
+    one linear pass over the text.
+
+    Patterns map to arbitrary payloads; `find` yields (start, end, payload).
+    """
+
+    def __init__(self, patterns: dict[str, object]):
+        # Trie as parallel lists: goto[state] = {char: next_state}
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[tuple[int, object]]] = [[]]  # (pattern length, payload)
+
+        for pattern, payload in patterns.items():
+            if pattern:
+                self._add(pattern, payload)
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def _add(self, pattern: str, payload: object) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(pattern), payload))
+
+    def _build(self) -> None:
+        """
+        Breadth-first computation of failure links; outputs are merged along them.
+        """
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str):
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for length, payload in self._out[state]:
+                yield i - length + 1, i + 1, payload
@@ -1,4 +1,8 @@
-from src.db.duckdb_conn import get_db_connection
+import re
+
+from src.db.duckdb_conn import get_read_cursor
+from src.tools.lemma_index import get_lemma_index
+from src.tools.transliteration import normalize_tokens, slp1_to_iast, to_slp1_key
 from indic_transliteration import sanscript
 
 
@@ -10,11 +14,8 @@ class DictionaryLookupTool:
         self.TRUNCATE_LIMIT = 2000
 
     def _to_iast(self, text: str) -> str:
-        """Transliterate Devanagari -> IAST."""
-        try:
-            return sanscript.transliterate(text, sanscript.DEVANAGARI, sanscript.IAST)
-        except Exception:
-            return text
+        """Transliterate any supported input (Devanagari / IAST / SLP1) -> IAST."""
+        return slp1_to_iast(to_slp1_key(text))
 
     def _generate_heuristic_candidates(self, word: str) -> list[str]:
         """
@@ -73,7 +74,35 @@ class DictionaryLookupTool:
 
         return list(candidates)
 
-    def run(self, words: list[str]) -> dict[str, str]:
+    def format_entry(self, lemma_found: str, gloss: str, raw: str) -> str:
+        """
+        Render a matched MW row as the raw evidence string used by the agent.
+        """
+        content = gloss if gloss else raw
+        if not content:
+            content = "Entry found but empty."
+
+        # Truncate to avoid huge outputs (later steps can compress/summarize)
+        if len(content) > self.TRUNCATE_LIMIT:
+            content = content[: self.TRUNCATE_LIMIT] + "... [truncated]"
+
+        # Indicate which lemma variant matched
+        return f"[Matched Lemma: {lemma_found}]\n{content}"
+
+    @staticmethod
+    def matched_lemma(entry: str) -> str | None:
+        """
+        Extract the headword from a string produced by `format_entry`.
+        """
+        m = re.match(r"^\[Matched Lemma: (.*?)\]", entry or "")
+        return m.group(1) if m else None
+
+    def run(self, words: list[str], scheme: str | None = None) -> dict[str, str]:
+        """
+        Look up each word's MW entry: {word: formatted entry or "No entry found"}.
+        Pass `scheme=sanscript.SLP1` for morphology lemmas, whose scheme is known
+        and would not always be detected ('Darma', 'BU').
+        """
         if not words:
             return {}
 
@@ -81,69 +110,56 @@ class DictionaryLookupTool:
         if not unique_words:
             return {}
 
-        con = get_db_connection()
         results: dict[str, str] = {}
 
         try:
-            for w in unique_words:
-                # 1) Preprocess: transliterate to IAST if input is Devanagari
-                iast_word = w
-                if any("\u0900" <= ch <= "\u097F" for ch in w):
-                    iast_word = self._to_iast(w)
-
-                # 2) Generate candidate lemmas (heuristics)
-                candidates = self._generate_heuristic_candidates(iast_word)
-                found_entry = None
-
-                # 3) Strategy A: Exact match over all candidates via a single IN query
-                placeholders = ",".join(["?"] * len(candidates))
-                query = f"""
-                    SELECT lemma, gloss, raw_xml
-                    FROM mw_lexicon
-                    WHERE lemma IN ({placeholders})
-                    ORDER BY length(lemma) ASC
-                    LIMIT 1
-                """
-                res = con.execute(query, candidates).fetchone()
-                if res:
-                    found_entry = res
+            index = get_lemma_index()
+
+            # Resolve every word to a headword in memory (no DB round-trips)
+            matched: dict[str, str] = {}
+            for w, slp1_word in normalize_tokens(unique_words, scheme).items():
+                # 1) Preprocess: the stemmer works on IAST suffixes
+                iast_word = slp1_to_iast(slp1_word)
+
+                # 2) Generate candidate lemmas (heuristics), as canonical SLP1 keys
+                candidates = [
+                    to_slp1_key(c, sanscript.IAST)
+                    for c in self._generate_heuristic_candidates(iast_word)
+                ]
+                candidates.append(slp1_word)
+
+                # 3) Strategy A: Exact match over all candidates (shortest wins)
+                key_found = index.exact(candidates)
 
                 # 4) Strategy B: If still not found, try a prefix match (very light fuzzy)
-                # Example: if 'dharmasya' is not found, try 'dharma%'
-                if not found_entry and len(iast_word) > 3:
-                    prefix = iast_word[:5]  # use first 4–5 chars for fuzzy search
-                    fuzzy_res = con.execute(
-                        """
-                        SELECT lemma, gloss, raw_xml
-                        FROM mw_lexicon
-                        WHERE lemma ILIKE ?
-                        LIMIT 1
-                        """,
-                        [f"{prefix}%"],
-                    ).fetchone()
-                    if fuzzy_res:
-                        found_entry = fuzzy_res
-
-                # 5) Format output
-                if found_entry:
-                    lemma_found, gloss, raw = found_entry
-                    content = gloss if gloss else raw
-                    if not content:
-                        content = "Entry found but empty."
-
-                    # Truncate to avoid huge outputs (later steps can compress/summarize)
-                    if len(content) > self.TRUNCATE_LIMIT:
-                        content = content[: self.TRUNCATE_LIMIT] + "... [truncated]"
-
-                    # Indicate which lemma variant matched
-                    results[w] = f"[Matched Lemma: {lemma_found}]\n{content}"
+                # Example: if 'Darmasya' is not found, try 'Darma%'
+                if not key_found and len(slp1_word) > 3:
+                    key_found = index.prefix(slp1_word[:5])  # use first 4–5 chars for fuzzy search
+
+                if key_found:
+                    matched[w] = key_found
+
+            # Fetch all matched entries with a single query by rowid
+            entries: dict[int, tuple] = {}
+            if matched:
+                rowids = list({index.rowids[key] for key in matched.values()})
+                placeholders = ",".join(["?"] * len(rowids))
+                rows = get_read_cursor().execute(
+                    f"SELECT rowid, lemma, gloss, raw_xml FROM mw_lexicon WHERE rowid IN ({placeholders})",
+                    rowids,
+                ).fetchall()
+                entries = {row[0]: row[1:] for row in rows}
+
+            # 5) Format output
+            for w in unique_words:
+                entry = entries.get(index.rowids[matched[w]]) if w in matched else None
+                if entry:
+                    results[w] = self.format_entry(*entry)
                 else:
                     results[w] = "No entry found"
 
         except Exception as e:
             print(f"Error in dictionary lookup: {e}")
             results["error"] = str(e)
-        finally:
-            con.close()
 
         return results
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from src.db.duckdb_conn import get_read_cursor, db_writer, is_read_only
+from src.db.schema import MW_SUMMARY_SQL
+
+
+class DictSummaryStore:
+    """
+    Read/write access to the precomputed `mw_summary` table
+    (lemma -> DICT_SUMMARY_SYSTEM summary of its Monier-Williams entry).
+    """
+
+    def __init__(self):
+        self.name = "DictSummaryStore"
+        if is_read_only():
+            return
+        try:
+            with db_writer() as con:
+                con.execute(MW_SUMMARY_SQL)
+        except Exception as e:
+            print(f"mw_summary init error: {e}")
+
+    def get_many(self, lemmas: list[str]) -> dict[str, str]:
+        """
+        Return {lemma: summary} for the lemmas that already have a stored summary.
+        """
+        unique_lemmas = list({l for l in lemmas if l})
+        if not unique_lemmas:
+            return {}
+
+        try:
+            placeholders = ",".join(["?"] * len(unique_lemmas))
+            rows = get_read_cursor().execute(
+                f"SELECT lemma, summary FROM mw_summary WHERE lemma IN ({placeholders})",
+                unique_lemmas,
+            ).fetchall()
+            return {lemma: summary for lemma, summary in rows}
+        except Exception as e:
+            print(f"mw_summary read error: {e}")
+            return {}
+
+    def put_many(self, summaries: dict[str, str], source: str = "online") -> None:
+        """
+        Store {lemma: summary}. `source` records who produced it ('offline' job or 'online' fallback).
+        """
+        now = datetime.now()
+        rows = [
+            (lemma, summary, source, now)
+            for lemma, summary in summaries.items()
+            if lemma and summary and not summary.startswith("Error:")
+        ]
+        if not rows or is_read_only():
+            return
+
+        try:
+            with db_writer() as con:
+                con.executemany(
+                    "INSERT OR REPLACE INTO mw_summary (lemma, summary, source, created_at) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+        except Exception as e:
+            print(f"mw_summary write error: {e}")
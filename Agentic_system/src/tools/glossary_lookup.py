@@ -1,5 +1,115 @@
-from src.db.duckdb_conn import get_db_connection
 import re
+import threading
+import time
+
+from src.db.duckdb_conn import get_read_cursor
+from src.tools.aho_corasick import AhoCorasick
+from src.tools.transliteration import loose_key
+from indic_transliteration import sanscript
+
+
+def glossary_term_key(term: str) -> str:
+    """
+    Key stored in `glossary.term_key`: parenthetical notes are dropped
+    ("Achit Sakti (of Brahman)" -> "Achit Sakti") and the anglicized spelling is
+    folded with `loose_key`.
+    """
+    term = re.sub(r"\(.*?\)", " ", term or "")
+    return loose_key(term.lower(), sanscript.IAST)
+
+
+def _input_key(word: str) -> str:
+    """
+    Loose key for one input token. Plain ASCII words are English-style spellings
+    ("Dharma", "Rishi"), so they are read as lower-case IAST, never as SLP1.
+    """
+    if word.isascii():
+        return loose_key(word.lower(), sanscript.IAST)
+    return loose_key(word)
+
+
+class GlossaryMatcher:
+    """
+    Aho–Corasick automaton over normalized glossary terms.
+
+    Terms and input text are reduced to space-separated loose keys, and every
+    pattern is wrapped in spaces, so a single linear scan finds all single- and
+    multi-word terms on word boundaries, whatever the input script.
+
+    Keys are recomputed from `term` rather than read from `glossary.term_key`, so
+    a change to the folding rules never leaves the automaton with stale keys.
+    """
+
+    def __init__(self, rows: list[tuple[str, str]], fingerprint: str = ""):
+        self.fingerprint = fingerprint
+        entries: dict[str, list[tuple[str, str]]] = {}
+        for term, definition in rows:
+            key = glossary_term_key(term)
+            if key:
+                entries.setdefault(key, []).append((term, (definition or "").strip()))
+        self.n_terms = len(entries)
+        self._automaton = AhoCorasick({f" {key} ": defs for key, defs in entries.items()})
+
+    def match(self, text: str) -> dict[str, str]:
+        keys = [_input_key(w) for w in text.split()]
+        normalized = " " + " ".join(k for k in keys if k) + " "
+
+        results: dict[str, str] = {}
+        for _, _, defs in self._automaton.find(normalized):
+            for term, definition in defs:
+                results[term] = definition
+        return results
+
+
+def _glossary_fingerprint(con) -> str:
+    count, content_hash = con.execute(
+        "SELECT count(*), bit_xor(hash(term, definition)) FROM glossary"
+    ).fetchone()
+    return f"{count}:{content_hash}"
+
+
+_matcher: GlossaryMatcher | None = None
+_matcher_checked_at = 0.0
+_matcher_lock = threading.Lock()
+
+# How often (seconds) the cached matcher re-checks the glossary table for changes
+RECHECK_SECONDS = 30.0
+
+
+def get_glossary_matcher() -> GlossaryMatcher | None:
+    """
+    Process-wide matcher, rebuilt when the glossary table fingerprint changes.
+    Returns None if the glossary table does not exist yet.
+    """
+    global _matcher, _matcher_checked_at
+    with _matcher_lock:
+        now = time.monotonic()
+        if _matcher is not None and now - _matcher_checked_at < RECHECK_SECONDS:
+            return _matcher
+
+        con = get_read_cursor()
+        try:
+            fingerprint = _glossary_fingerprint(con)
+            if _matcher is None or _matcher.fingerprint != fingerprint:
+                rows = con.execute("SELECT term, definition FROM glossary").fetchall()
+                _matcher = GlossaryMatcher(rows, fingerprint)
+            _matcher_checked_at = now
+        except Exception as e:
+            # If the table doesn't exist yet, treat it as "no data" rather than a hard error.
+            if "glossary" not in str(e).lower():
+                print(f"Glossary lookup error: {e}")
+            return None
+
+        return _matcher
+
+
+def invalidate_glossary_matcher() -> None:
+    """
+    Force a rebuild on next use (call after reloading the glossary table).
+    """
+    global _matcher
+    with _matcher_lock:
+        _matcher = None
 
 
 class GlossaryLookupTool:
@@ -12,46 +122,16 @@ class GlossaryLookupTool:
         Output: A dict mapping {sanskrit_term: official_english_definition}
 
         Logic:
-        1) Simple tokenization.
-        2) Look up tokens in the `glossary` table (case-insensitive).
+        1) Normalize the text (any script: Devanagari, IAST, plain Latin) to loose keys.
+        2) Scan it once with the in-memory Aho–Corasick automaton over glossary terms,
+           which also finds multi-word terms (e.g., "Abhava padartha").
         3) Return mandatory / canonical definitions (preferred translations).
         """
         if not text:
             return {}
 
-        # Simple preprocessing: extract words and remove punctuation.
-        # We allow extended Latin characters (e.g., ā, ī, ū) commonly used in Sanskrit transliteration.
-        words = set(re.findall(r"\b[a-zA-Z\u00C0-\u00FF]+\b", text))
-        if not words:
+        matcher = get_glossary_matcher()
+        if matcher is None:
             return {}
 
-        con = get_db_connection()
-        results: dict[str, str] = {}
-
-        try:
-            # Build a query that matches all candidate terms.
-            # Glossary entries are typically exact headword matches.
-            placeholders = ",".join(["?"] * len(words))
-
-            # Use COLLATE NOCASE to ignore case in matching.
-            query = f"""
-                SELECT term, definition
-                FROM glossary
-                WHERE term COLLATE NOCASE IN ({placeholders})
-            """
-
-            rows = con.execute(query, list(words)).fetchall()
-
-            for term, definition in rows:
-                # Keep definitions as-is (you can add trimming/shortening if needed).
-                results[term] = (definition or "").strip()
-
-        except Exception as e:
-            # If the table doesn't exist yet, treat it as "no data" rather than a hard error.
-            if "Table with name glossary does not exist" not in str(e):
-                print(f"Glossary lookup error: {e}")
-
-        finally:
-            con.close()
-
-        return results
+        return matcher.match(text)
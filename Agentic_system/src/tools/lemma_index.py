@@ -0,0 +1,129 @@
+import bisect
+import os
+import threading
+
+from src.config import PROJECT_ROOT
+from src.db.duckdb_conn import get_read_cursor
+
+SNAPSHOT_PATH = os.path.join(PROJECT_ROOT, "outputs", "mw_lemma_index.tsv")
+
+
+class LemmaIndex:
+    """
+    In-process index of Monier-Williams headwords, keyed by canonical SLP1 `lemma_key`.
+
+    - Exact matches: dict key -> rowid of its first `mw_lexicon` record.
+    - Prefix matches: sorted key list searched with bisect, equivalent to
+      `lemma_key LIKE 'prefix%'` but deterministic (smallest match wins).
+      SLP1 is case-sensitive ('a' vs 'A'), so the comparison is too.
+
+    Only headwords and rowids are held in memory; entry text is fetched by rowid
+    in one query per lookup batch.
+    """
+
+    def __init__(self, rows: list[tuple[str, int]], fingerprint: str = ""):
+        self.fingerprint = fingerprint
+        self.rowids: dict[str, int] = {}
+        for key, rowid in rows:
+            # Keep the first record for homonyms
+            if key not in self.rowids or rowid < self.rowids[key]:
+                self.rowids[key] = rowid
+        self._sorted_keys = sorted(self.rowids)
+
+    def __len__(self) -> int:
+        return len(self.rowids)
+
+    def exact(self, candidates: list[str]) -> str | None:
+        """
+        Shortest candidate key that is a headword (ties broken alphabetically).
+        """
+        hits = [c for c in candidates if c in self.rowids]
+        if not hits:
+            return None
+        return min(hits, key=lambda c: (len(c), c))
+
+    def prefix(self, prefix: str) -> str | None:
+        """
+        First headword key starting with `prefix`.
+        """
+        if not prefix:
+            return None
+        i = bisect.bisect_left(self._sorted_keys, prefix)
+        if i < len(self._sorted_keys) and self._sorted_keys[i].startswith(prefix):
+            return self._sorted_keys[i]
+        return None
+
+    # -----------------------------------------------------
+    # Snapshot (one "key<TAB>rowid" per line, fingerprint on the first line)
+    # -----------------------------------------------------
+    def save(self, path: str = SNAPSHOT_PATH) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(f"#fingerprint\t{self.fingerprint}\n")
+            for key, rowid in self.rowids.items():
+                f.write(f"{key}\t{rowid}\n")
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, fingerprint: str, path: str = SNAPSHOT_PATH) -> "LemmaIndex | None":
+        """
+        Load a snapshot if it exists and was built from the same table contents.
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            header = f.readline().rstrip("\n").split("\t")
+            if len(header) != 2 or header[1] != fingerprint:
+                return None
+            rows = []
+            for line in f:
+                key, _, rowid = line.rstrip("\n").rpartition("\t")
+                rows.append((key, int(rowid)))
+        return cls(rows, fingerprint)
+
+
+def _table_fingerprint(con) -> str:
+    count, max_rowid, lemma_hash = con.execute(
+        "SELECT count(*), max(rowid), bit_xor(hash(lemma_key)) FROM mw_lexicon"
+    ).fetchone()
+    return f"{count}:{max_rowid}:{lemma_hash}"
+
+
+_index: LemmaIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_lemma_index() -> LemmaIndex:
+    """
+    Process-wide lemma index: loaded from the snapshot when it matches `mw_lexicon`,
+    otherwise rebuilt from the table (and the snapshot refreshed).
+    """
+    global _index
+    with _index_lock:
+        if _index is not None:
+            return _index
+
+        con = get_read_cursor()
+        fingerprint = _table_fingerprint(con)
+        index = LemmaIndex.load(fingerprint)
+        if index is None:
+            rows = con.execute(
+                "SELECT lemma_key, rowid FROM mw_lexicon WHERE lemma_key IS NOT NULL"
+            ).fetchall()
+            index = LemmaIndex(rows, fingerprint)
+            try:
+                index.save()
+            except OSError as e:
+                print(f"Could not write lemma index snapshot: {e}")
+
+        _index = index
+        return _index
+
+
+def invalidate_lemma_index() -> None:
+    """
+    Drop the cached index (call after re-ingesting mw_lexicon).
+    """
+    global _index
+    with _index_lock:
+        _index = None
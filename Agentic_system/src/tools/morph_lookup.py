@@ -1,21 +1,98 @@
-from src.db.duckdb_conn import get_db_connection
+import threading
+import time
+
+from src.db.duckdb_conn import get_read_cursor, db_writer, is_read_only
+from src.db.schema import MORPH_INDEX_SQL
+from src.tools.transliteration import normalize_tokens
+
+
+_has_morph_index: bool | None = None
+_checked_at = 0.0
+_warned = False
+_morph_index_lock = threading.Lock()
+
+# How often (seconds) the cached answer re-checks whether `morph_index` exists
+RECHECK_SECONDS = 30.0
+
+
+def _table_exists(name: str) -> bool:
+    return bool(
+        get_read_cursor().execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [name]
+        ).fetchone()[0]
+    )
+
+
+def has_morph_index() -> bool:
+    """
+    Whether the materialized `morph_index` table exists (process-wide, re-checked
+    every RECHECK_SECONDS so a running app picks up a new ingest).
+
+    Databases ingested before the table existed get it built on first use when
+    they are writable; read-only ones fall back to aggregating `morph_analysis`
+    on every lookup, with a one-time warning.
+    """
+    global _has_morph_index, _checked_at, _warned
+    with _morph_index_lock:
+        now = time.monotonic()
+        if _has_morph_index is None or now - _checked_at >= RECHECK_SECONDS:
+            _has_morph_index = _table_exists("morph_index")
+            if not _has_morph_index and not is_read_only() and _table_exists("morph_analysis"):
+                print("⚠️ morph_index is missing: building it now (scripts/ingest_all.py builds it after each Ambuda ingest).")
+                try:
+                    with db_writer() as con:
+                        con.execute(MORPH_INDEX_SQL)
+                    _has_morph_index = True
+                except Exception as e:
+                    print(f"Could not build morph_index: {e}")
+            if not _has_morph_index and not _warned:
+                print("⚠️ morph_index is missing: every morphology lookup scans morph_analysis. Run scripts/ingest_all.py to build it.")
+                _warned = True
+            _checked_at = now
+        return _has_morph_index
+
+
+def invalidate_morph_index() -> None:
+    """
+    Re-check on next use (call after building or dropping morph_index).
+    """
+    global _has_morph_index
+    with _morph_index_lock:
+        _has_morph_index = None
 
 
 class MorphAnalysisTool:
+    # Max distinct analyses returned per word
+    MAX_ANALYSES = 5
+
     def __init__(self):
         self.name = "MorphologicalAnalysis"
 
+    def _source(self) -> str:
+        """
+        SQL relation with (word_key, lemma, pos_tag, freq): the materialized
+        `morph_index`, or the same aggregate over `morph_analysis` for databases
+        ingested before it existed.
+        """
+        if has_morph_index():
+            return "morph_index"
+        return """(
+            SELECT word_key, lemma, pos_tag, count(*) AS freq
+            FROM morph_analysis
+            GROUP BY word_key, lemma, pos_tag
+        )"""
+
     def run(self, word: str) -> dict:
         """
         Input: A single Sanskrit word (e.g., "sPuratu")
         Output: Lemma and POS/morph tags.
 
-        Example output:
+        Example output (analyses ranked by corpus frequency, most frequent first):
         {
             "found": True,
             "word": "sPuratu",
             "analyses": [
-                {"lemma": "sPur", "tags": "pos=v,p=3..."},
+                {"lemma": "sPur", "tags": "pos=v,p=3...", "freq": 12},
                 ...
             ]
         }
@@ -24,32 +101,49 @@ class MorphAnalysisTool:
             return {"found": False, "error": "Empty input word."}
 
         word = word.strip()
-        con = get_db_connection()
-
-        try:
-            # Look up analysis records for this word in the corpus.
-            # We search both exact match and case-insensitive match.
-            rows = con.execute(
-                """
-                SELECT lemma, pos_tag
-                FROM morph_analysis
-                WHERE word = ? OR word ILIKE ?
-                LIMIT 5
-                """,
-                [word, word],
-            ).fetchall()
-
-        finally:
-            con.close()
-
-        if not rows:
-            return {"found": False, "word": word}
-
-        # Deduplicate: a word may have multiple analyses; also avoid duplicates.
-        unique_results = list({(lemma, tag) for lemma, tag in rows})
-
-        return {
-            "found": True,
-            "word": word,
-            "analyses": [{"lemma": lemma, "tags": tag} for lemma, tag in unique_results],
-        }
+        return self.run_many([word])[word]
+
+    def run_many(self, words: list[str]) -> dict[str, dict]:
+        """
+        Input: All tokens of a sentence (or of a whole batch).
+        Output: {token: result} with the same result shape as `run`.
+
+        Tokens are normalized once to canonical SLP1 keys (any input script)
+        and resolved with one join against the `word_key` column built at ingest
+        time, instead of one `word = ? OR word ILIKE ?` scan per token. Analyses
+        come from the materialized `morph_index` table, ranked by corpus frequency.
+        """
+        tokens = list(dict.fromkeys(w.strip() for w in words if w and w.strip()))
+        if not tokens:
+            return {}
+        keys = normalize_tokens(tokens)
+
+        rows = get_read_cursor().execute(
+            f"""
+            WITH tokens AS (
+                SELECT unnest(?::VARCHAR[]) AS token, unnest(?::VARCHAR[]) AS token_key
+            ),
+            matches AS (
+                SELECT t.token, m.lemma, m.pos_tag, m.freq
+                FROM tokens t
+                JOIN {self._source()} m ON m.word_key = t.token_key
+            )
+            SELECT token, lemma, pos_tag, freq
+            FROM matches
+            QUALIFY row_number() OVER (PARTITION BY token ORDER BY freq DESC, lemma, pos_tag) <= ?
+            ORDER BY token, freq DESC, lemma, pos_tag
+            """,
+            [list(keys.keys()), list(keys.values()), self.MAX_ANALYSES],
+        ).fetchall()
+
+        analyses: dict[str, list] = {}
+        for token, lemma, tag, freq in rows:
+            analyses.setdefault(token, []).append({"lemma": lemma, "tags": tag, "freq": freq})
+
+        results: dict[str, dict] = {}
+        for token in tokens:
+            if token in analyses:
+                results[token] = {"found": True, "word": token, "analyses": analyses[token]}
+            else:
+                results[token] = {"found": False, "word": token}
+        return results
@@ -0,0 +1,119 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+from indic_transliteration import sanscript
+
+# Punctuation stripped from token edges. The apostrophe is kept: it is the SLP1 avagraha.
+_EDGE_PUNCT = "|,.;:!?-–—()[]{}\"“”‘’।॥\u200c\u200d"
+
+# Letters that occur in SLP1 but never in ASCII IAST or Harvard-Kyoto Sanskrit text.
+# Upper-case ones only count after the first character, so Title-case words
+# ("Rama", "Bhagavad") are not mistaken for SLP1.
+_SLP1_ONLY_LOWER = set("fqwxz")
+_SLP1_ONLY_UPPER = set("BCEFKOPQWXY")
+
+# Folds applied by `loose_key` after diacritics are removed, so anglicized spellings
+# ("Achit", "Sakti") meet their transliterated forms ("acit", "śakti").
+_LOOSE_FOLDS = [("ch", "c"), ("sh", "s")]
+
+# Vocalic r is spelled "ri" before diacritics are removed, so "Rishi" and "Prakriti"
+# meet "ṛṣi" and "prakṛti" without merging real words such as "hari" and "har".
+_LOOSE_VOWELS = str.maketrans({"ṛ": "ri", "ṝ": "ri"})
+
+
+def detect_scheme(token: str) -> str:
+    """
+    Guess the script/scheme of a single token.
+
+    - any Devanagari character        -> DEVANAGARI
+    - any other non-ASCII character   -> IAST (ā, ṣ, ṇ, ḥ, ...)
+    - ASCII with letters only SLP1 uses (f, q, w, x, z anywhere; B, C, E, F, K, O,
+      P, Q, W, X, Y after the first character)
+                                      -> SLP1 (e.g. 'sPur', 'kfzRa', 'jYAna')
+    - any other ASCII                 -> IAST, lower-cased ('bhavati', 'Rishi', 'DHARMA')
+
+    Letters shared with Title-case or Harvard-Kyoto spellings ('Rama', 'rAma') are
+    not enough to call a token SLP1. Ambuda/MW keys and morphology lemmas, which
+    are known to be SLP1 ('Darma', 'BU'), are keyed with an explicit
+    `scheme=sanscript.SLP1` instead.
+    """
+    if any("\u0900" <= ch <= "\u097F" for ch in token):
+        return sanscript.DEVANAGARI
+    if any(ord(ch) > 127 for ch in token):
+        return sanscript.IAST
+    if token.isupper():
+        return sanscript.IAST
+    if any(ch in _SLP1_ONLY_LOWER for ch in token) or any(
+        ch in _SLP1_ONLY_UPPER for ch in token[1:]
+    ):
+        return sanscript.SLP1
+    return sanscript.IAST
+
+
+def clean_token(token: str) -> str:
+    return token.strip().strip(_EDGE_PUNCT).strip()
+
+
+@lru_cache(maxsize=65536)
+def to_slp1_key(token: str, scheme: str | None = None) -> str:
+    """
+    Canonical SLP1 lookup key for one token (memoized per process).
+
+    This is the key stored in `mw_lexicon.lemma_key` and `morph_analysis.word_key`,
+    so every tool can match input in any script with an exact, indexable comparison.
+    """
+    token = clean_token(token)
+    if not token:
+        return ""
+
+    scheme = scheme or detect_scheme(token)
+    if scheme == sanscript.SLP1:
+        return token
+    if scheme == sanscript.IAST:
+        token = token.lower()
+
+    try:
+        return sanscript.transliterate(token, scheme, sanscript.SLP1)
+    except Exception:
+        return token
+
+
+@lru_cache(maxsize=65536)
+def slp1_to_iast(key: str) -> str:
+    try:
+        return sanscript.transliterate(key, sanscript.SLP1, sanscript.IAST)
+    except Exception:
+        return key
+
+
+@lru_cache(maxsize=65536)
+def loose_key(text: str, scheme: str | None = None) -> str:
+    """
+    Diacritic-insensitive key for a word or phrase (used for glossary terms, whose
+    spellings are anglicized and carry no diacritics).
+
+    Each token goes through `to_slp1_key`, back to IAST, then is stripped of
+    diacritics and folded (ṛ->ri, ch->c, sh->s). Tokens are joined by single spaces.
+    """
+    keys = []
+    for token in re.split(r"[\s\-_/]+", text):
+        slp1 = to_slp1_key(token, scheme)
+        if not slp1:
+            continue
+        folded = unicodedata.normalize("NFD", slp1_to_iast(slp1).translate(_LOOSE_VOWELS))
+        folded = "".join(ch for ch in folded if not unicodedata.combining(ch)).lower()
+        folded = re.sub(r"[^a-z]", "", folded)
+        for a, b in _LOOSE_FOLDS:
+            folded = folded.replace(a, b)
+        if folded:
+            keys.append(folded)
+    return " ".join(keys)
+
+
+def normalize_tokens(words: list[str], scheme: str | None = None) -> dict[str, str]:
+    """
+    Map each input token to its SLP1 key once per sentence: {token: key}.
+    `scheme` skips detection for tokens whose scheme is known.
+    """
+    return {w: to_slp1_key(w, scheme) for w in dict.fromkeys(words) if w and clean_token(w)}
@@ -0,0 +1,54 @@
+import duckdb
+import pytest
+from indic_transliteration import sanscript
+
+from src.agent.orchestrator import SanskritAgent
+from src.tools import dict_lookup
+from src.tools.dict_lookup import DictionaryLookupTool
+from src.tools.lemma_index import LemmaIndex
+
+# (headword, gloss): "band" is a real MW headword that 'banD' used to be mis-keyed to
+HEADWORDS = [
+    ("band", "to shine"),
+    ("banD", "to bind"),
+    ("Darma", "law, duty"),
+    ("kzip", "to throw"),
+    ("BU", "to become"),
+    ("aMSu", "a ray"),
+]
+
+
+@pytest.fixture
+def tool(monkeypatch):
+    con = duckdb.connect()
+    con.execute("CREATE TABLE mw_lexicon (lemma VARCHAR, gloss VARCHAR, raw_xml VARCHAR, lemma_key VARCHAR)")
+    con.executemany("INSERT INTO mw_lexicon VALUES (?, ?, '', ?)", [(h, g, h) for h, g in HEADWORDS])
+    index = LemmaIndex(con.execute("SELECT lemma_key, rowid FROM mw_lexicon").fetchall())
+    monkeypatch.setattr(dict_lookup, "get_lemma_index", lambda: index)
+    monkeypatch.setattr(dict_lookup, "get_read_cursor", lambda: con)
+    yield DictionaryLookupTool()
+    con.close()
+
+
+@pytest.mark.parametrize("lemma", ["banD", "Darma", "kzip", "BU", "aMSu"])
+def test_slp1_lemmas_resolve_to_their_headwords(tool, lemma):
+    entry = tool.run([lemma], scheme=sanscript.SLP1)[lemma]
+    assert tool.matched_lemma(entry) == lemma
+
+
+class _StubMorph:
+    def run_many(self, words):
+        lemmas = {"banDanam": "banD", "Darmam": "Darma", "BavataH": "BU"}
+        return {
+            w: {"found": True, "analyses": [{"lemma": lemmas[w], "tags": "pos=n"}]} if w in lemmas else {"found": False}
+            for w in words
+        }
+
+
+def test_tool_stage_looks_up_morph_lemmas_as_slp1(tool):
+    agent = SanskritAgent.__new__(SanskritAgent)
+    agent.morph_tool, agent.dict_tool = _StubMorph(), tool
+    _, raw_dict, _, _ = agent._run_tool_stage("banDanam Darmam BavataH kzip", True, True)
+    assert {w: tool.matched_lemma(e) for w, e in raw_dict.items()} == {
+        "banD": "banD", "Darma": "Darma", "BU": "BU", "kzip": "kzip",
+    }
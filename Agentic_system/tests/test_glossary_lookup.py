@@ -0,0 +1,49 @@
+import pytest
+
+from src.tools.glossary_lookup import GlossaryMatcher
+from src.tools.transliteration import loose_key
+
+ROWS = [
+    ("Dharma", "righteous duty"),
+    ("Rishi", "seer"),
+    ("Prakriti", "primordial nature"),
+    ("Brahman", "the Absolute"),
+    ("Abhava padartha", "the category of non-existence"),
+    ("Hari", "a name of Vishnu"),
+]
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return GlossaryMatcher(ROWS)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Dharma is here", {"Dharma"}),
+        ("Rishi said", {"Rishi"}),
+        ("Prakriti and Brahman", {"Prakriti", "Brahman"}),
+        ("The RISHI spoke of DHARMA.", {"Rishi", "Dharma"}),
+    ],
+)
+def test_capitalized_and_sentence_initial_terms(matcher, text, expected):
+    assert set(matcher.match(text)) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("ṛṣi uvāca", {"Rishi"}),
+        ("prakṛti", {"Prakriti"}),
+        ("धर्म", {"Dharma"}),
+        ("abhāva padārtha", {"Abhava padartha"}),
+    ],
+)
+def test_transliterated_input(matcher, text, expected):
+    assert set(matcher.match(text)) == expected
+
+
+def test_vocalic_r_fold_does_not_merge_words(matcher):
+    assert loose_key("hari") != loose_key("har")
+    assert matcher.match("har") == {}
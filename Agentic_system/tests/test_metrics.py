@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import sacrebleu
+
+from src.eval import metrics
+from src.eval.metrics import (
+    RunStats,
+    bleu_from_stats,
+    chrf_from_stats,
+    item_stats,
+    paired_bootstrap,
+    sentence_scores_from_stats,
+)
+
+HYPS = [
+    "The king spoke to his son in the forest.",
+    "Arjuna saw his teachers and kinsmen standing in both armies.",
+    "",
+    "Dharma protects those who protect it.",
+    "He went.",
+    "In the beginning was the Word, and the Word was with God.",
+    "the the the the",
+    "O Krishna, seeing my own people eager to fight, my limbs fail.",
+]
+REFS = [
+    "The king said to his son in the forest:",
+    "There Arjuna saw, standing in both armies, fathers, grandfathers, teachers and uncles.",
+    "Nothing was said.",
+    "Dharma, when protected, protects.",
+    "He went away to the city.",
+    "In the beginning was the Word, and the Word was with God.",
+    "The cat sat on the mat.",
+    "Seeing these kinsmen, O Krishna, assembled and eager to fight, my limbs give way.",
+]
+
+
+def test_corpus_scores_match_sacrebleu():
+    bleu, chrf = item_stats(HYPS, REFS)
+    expected_bleu = sacrebleu.corpus_bleu(HYPS, [REFS]).score
+    expected_chrf = sacrebleu.corpus_chrf(HYPS, [REFS], word_order=2).score
+    assert float(bleu_from_stats(bleu.sum(axis=0))) == pytest.approx(expected_bleu, abs=1e-9)
+    assert float(chrf_from_stats(chrf.sum(axis=0))) == pytest.approx(expected_chrf, abs=1e-9)
+
+
+def test_sentence_scores_match_sacrebleu():
+    bleu, chrf = sentence_scores_from_stats(*item_stats(HYPS, REFS))
+    for i, (hyp, ref) in enumerate(zip(HYPS, REFS)):
+        assert bleu[i] == pytest.approx(sacrebleu.sentence_bleu(hyp, [ref]).score, abs=1e-9)
+        assert chrf[i] == pytest.approx(sacrebleu.sentence_chrf(hyp, [ref], word_order=2).score, abs=1e-9)
+
+
+def test_bootstrap_does_not_depend_on_chunk_size(monkeypatch):
+    bleu, chrf = item_stats(HYPS, REFS)
+    a = RunStats("a", np.arange(len(HYPS)), bleu, chrf)
+    b_bleu, b_chrf = item_stats(REFS, REFS)
+    b = RunStats("b", np.arange(len(HYPS)), b_bleu, b_chrf)
+
+    whole = paired_bootstrap(a, b, n_resamples=200, seed=7)
+    monkeypatch.setattr(metrics, "BOOTSTRAP_CHUNK", 3 * len(HYPS))
+    chunked = paired_bootstrap(a, b, n_resamples=200, seed=7)
+    assert whole == chunked
+    assert whole["chrF++"].delta > 0
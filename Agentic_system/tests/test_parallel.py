@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from src.db import duckdb_conn
+from src.db.duckdb_conn import close_db, db_writer, get_read_cursor
+from src.db.schema import EVAL_SQL, INIT_SQL
+from src.eval.parallel import ParallelEvalRunner
+from src.eval.runner import EvalConfig, EvalRunner
+
+N_ITEMS = 20
+CRASH_ID = 6
+
+
+class StubLLM:
+    """
+    Baseline-mode translator: echoes the source, and kills its process on `crash_on`.
+    """
+
+    def __init__(self, crash_on: str | None = None):
+        self.crash_on = crash_on
+
+    def generate(self, messages):
+        src = messages[-1]["content"].split("\n")[-1]
+        if src == self.crash_on:
+            os._exit(3)
+        return f"translation of {src}"
+
+
+def crashing_translator(n_threads):
+    # Module level, so spawned workers can unpickle it
+    return StubLLM(crash_on=f"verse {CRASH_ID}"), None
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    path = str(tmp_path / "translation.duckdb")
+    close_db()
+    # The parent reads the patched module value, spawned workers the environment
+    monkeypatch.setattr(duckdb_conn, "DB_PATH", path)
+    monkeypatch.setenv("DB_PATH", path)
+    with db_writer() as con:
+        con.execute(INIT_SQL)
+        con.execute(EVAL_SQL)
+        con.executemany(
+            "INSERT INTO dataset_items (dataset_name, item_id, src_text, tgt_text) VALUES ('toy', ?, ?, ?)",
+            [[i, f"verse {i}", f"translation of verse {i}" if i % 3 else f"a translation of verse {i}"] for i in range(N_ITEMS)],
+        )
+    yield tmp_path
+    close_db()
+
+
+def stored_results(run_id: str) -> dict:
+    rows = get_read_cursor().execute(
+        "SELECT item_id, seq, hyp_text, bleu, chrf FROM eval_results WHERE run_id = ? ORDER BY item_id", [run_id]
+    ).fetchall()
+    return {row[0]: row[1:] for row in rows}
+
+
+def test_crashed_worker_item_is_an_error_and_results_match_sequential(database):
+    model_path = database / "stub.gguf"
+    model_path.write_bytes(b"stub model")
+    config = EvalConfig("toy", "A", run_all=True)
+
+    sequential = EvalRunner(config, StubLLM(), None, model_path=str(model_path))
+    sequential.run(restart=True)
+    expected = stored_results(sequential.run_id)
+    assert len(expected) == N_ITEMS
+
+    runner = ParallelEvalRunner(
+        config, n_workers=3, threads_per_worker=1, unit_size=4,
+        queue_path=database / "queue.duckdb", translator_factory=crashing_translator, model_path=str(model_path),
+    )
+    results = runner.run(restart=True)
+
+    # Same run: the crashed item is an error, the rest of its unit was requeued and finished
+    assert runner.run_id == sequential.run_id
+    assert [item_id for item_id, _ in runner.errors] == [CRASH_ID]
+    assert "exited" in runner.errors[0][1]
+    assert sorted(results["ID"]) == [i for i in range(N_ITEMS) if i != CRASH_ID]
+    expected.pop(CRASH_ID)
+    assert stored_results(runner.run_id) == expected